@@ -1,6 +1,7 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 import os
+import sys
 
 db = SQLAlchemy()
 
@@ -15,27 +16,57 @@ def create_app():
     # Charger la configuration
     app.config.from_object('config.Config')
     
-    # Initialiser la base de données
+    # Initialiser la base de données avec le profil SQLite configuré
+    from app import sqlite_profil
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_profil.options_moteur(app.config)
     db.init_app(app)
+    with app.app_context():
+        sqlite_profil.configurer(db.engine, app.config)
+        
+        # Compter et chronométrer les requêtes SQL de chaque requête HTTP
+        from app import instrumentation
+        instrumentation.installer(app, db.engine)
+        
+        # Métriques Prometheus (requêtes HTTP, SQL, rendus PDF)
+        from app import metriques
+        metriques.installer(app, db.engine)
+    
+    # Paquets statiques compilés (/assets/) et fonction statiques() des templates
+    from app import statiques
+    statiques.installer(app)
+    
+    # Suivre les écritures sur le catalogue
+    from app import catalogue  # noqa: F401
     
     # Enregistrer les blueprints
     from app import routes
     app.register_blueprint(routes.bp)
     
-    # Créer les tables si elles n'existent pas
-    with app.app_context():
-        try:
-            # Utiliser inspect pour vérifier si les tables existent avant de les créer
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            existing_tables = inspector.get_table_names()
-            
-            if not existing_tables:
-                # Base de données vide, créer toutes les tables
-                db.create_all()
-        except Exception as e:
-            # En cas d'erreur, logger et continuer
-            # Les tables existent probablement déjà
-            print(f"Info: Tables probablement déjà créées - {str(e)[:100]}")
+    # Enregistrer les commandes CLI
+    from app import commands
+    app.cli.add_command(commands.recalculer_equilibre_command)
+    app.cli.add_command(commands.reconstruire_recherche_command)
+    app.cli.add_command(commands.reconstruire_statistiques_command)
+    app.cli.add_command(commands.export_ndjson_command)
+    app.cli.add_command(commands.import_ndjson_command)
+    app.cli.add_command(commands.migrer_command)
+    app.cli.add_command(commands.sauvegarder_command)
+    app.cli.add_command(commands.mesurer_demarrage_command)
+    app.cli.add_command(commands.construire_statiques_command)
+    
+    # Créer les tables manquantes puis appliquer les migrations en attente;
+    # une base à jour ne coûte qu'une lecture de PRAGMA user_version.
+    # `flask migrer` s'en charge lui-même (avec ses options): rien ici
+    if sys.argv[1:2] != ['migrer']:
+        with app.app_context():
+            from app import migrations
+            try:
+                if not migrations.schema_a_jour():
+                    db.create_all()
+                    migrations.migrer()
+            except Exception as e:
+                # Pas de démarrage sur un schéma à moitié migré
+                app.logger.error("Migration du schéma impossible: %s", e)
+                raise RuntimeError(f"Migration du schéma impossible: {e}") from e
     
     return app
@@ -0,0 +1,219 @@
+"""
+Planification automatique d'une semaine équilibrée.
+
+Les cases vides de la semaine reçoivent une recette choisie par niveau de
+préférence, dans la limite de temps de préparation de chaque case et sans
+reprendre une recette déjà prévue dans la semaine. Le niveau est le score
+d'équilibre (3 groupes alimentaires, puis 2, puis 1), pénalisé pour une
+recette servie dans les N semaines autour de celle-ci: une recette
+récente n'est proposée qu'à défaut de toute recette non récente.
+Un petit catalogue remplit donc quand même la semaine, en répétant le
+moins possible.
+
+Les candidates d'un score sont lues par lots (TAILLE_LOT recettes,
+parcours de la clé primaire à partir d'un id tiré au hasard): la requête
+SQL filtre déjà score et temps trop long pour les cases restantes, puis
+le lot est rangé, récentes à part, dans des tableaux triés par temps de
+préparation. Pour une case, les candidates admissibles forment un préfixe
+(bisect sur la limite de temps) où la recette est tirée au hasard: ni
+parcours des recettes par case, ni appel à analyser_equilibre. La lecture s'arrête dès
+que toutes les cases sont remplies; le score suivant n'est lu que pour
+les cases qu'aucune candidate du score courant ne peut remplir.
+"""
+from array import array
+from bisect import bisect_right
+from datetime import timedelta
+import random
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Menu, Recette
+
+# Semaines sans répétition d'une recette, de part et d'autre de la semaine planifiée
+SANS_REPETITION_DEFAUT = 3
+SANS_REPETITION_MAX = 52
+
+# Candidates lues par requête
+TAILLE_LOT = 512
+
+# Scores d'équilibre par ordre de préférence (recettes non récentes, puis récentes)
+SCORES = (3, 2, 1)
+
+# Tirages aléatoires avant de parcourir le préfixe à la recherche d'une recette libre
+TIRAGES = 32
+
+_SANS_LIMITE = float('inf')
+
+
+def lire_temps_max(valeur):
+    """
+    Limites de temps de préparation (minutes) par case {(jour, moment): limite}.
+    `valeur` est un entier (toutes les cases) ou un dict dont les clés sont
+    un moment ('soir') ou une case ('lundi-midi'); la case l'emporte.
+    Lève ValueError si une limite est invalide.
+    """
+    def limite(brute):
+        if brute is None:
+            return None
+        if isinstance(brute, bool) or not isinstance(brute, int) or brute < 0:
+            raise ValueError('Temps de préparation maximal invalide')
+        return brute
+
+    limites = {(jour, moment): None for jour in Menu.JOURS for moment in Menu.MOMENTS}
+    if valeur is None:
+        return limites
+    if not isinstance(valeur, dict):
+        return dict.fromkeys(limites, limite(valeur))
+
+    for cle in valeur:
+        if cle not in Menu.MOMENTS and tuple(cle.split('-', 1)) not in limites:
+            raise ValueError(f'Case inconnue: {cle}')
+    for jour, moment in limites:
+        brute = valeur.get(f'{jour}-{moment}', valeur.get(moment))
+        limites[(jour, moment)] = limite(brute)
+    return limites
+
+
+class _Reserve:
+    """Candidates déjà lues d'un niveau: (temps triés, ids) en tableaux"""
+
+    def __init__(self):
+        self._lignes = []
+        self.temps = array('d')
+        self.ids = array('q')
+
+    def ajouter(self, lignes):
+        for recette_id, temps in lignes:
+            self._lignes.append((_SANS_LIMITE if temps is None else temps, recette_id))
+        self._lignes.sort()
+        self.temps = array('d', [temps for temps, _ in self._lignes])
+        self.ids = array('q', [recette_id for _, recette_id in self._lignes])
+
+
+def _lots(requete, depart, taille, temps_max):
+    """
+    Lots de candidates en parcourant les ids à partir de `depart`, en boucle.
+    `temps_max()` donne avant chaque lot le temps de préparation maximal
+    encore utile (None: sans limite).
+    """
+    for condition in (Recette.id >= depart, Recette.id < depart):
+        dernier = None
+        while True:
+            lot_requete = requete.where(condition)
+            limite = temps_max()
+            if limite is not None:
+                lot_requete = lot_requete.where(Recette.temps_preparation <= limite)
+            if dernier is not None:
+                lot_requete = lot_requete.where(Recette.id > dernier)
+            lot = db.session.execute(lot_requete.order_by(Recette.id).limit(taille)).all()
+            if lot:
+                yield lot
+            if len(lot) < taille:
+                break
+            dernier = lot[-1][0]
+
+
+def _tirer(temps, ids, limite, prises, alea):
+    """Recette libre au hasard parmi celles dont le temps respecte la limite"""
+    fin = len(temps) if limite is None else bisect_right(temps, limite)
+    if not fin:
+        return None
+    for _ in range(TIRAGES):
+        recette_id = ids[alea.randrange(fin)]
+        if recette_id not in prises:
+            return recette_id
+    # Préfixe presque entièrement pris: parcours à partir d'un point au hasard
+    depart = alea.randrange(fin)
+    for decalage in range(fin):
+        recette_id = ids[(depart + decalage) % fin]
+        if recette_id not in prises:
+            return recette_id
+    return None
+
+
+def planifier_semaine(semaine, sans_repetition=SANS_REPETITION_DEFAUT, temps_max=None, graine=None):
+    """
+    Propose une recette pour chaque case vide de la semaine du lundi
+    `semaine`. `temps_max` vient de lire_temps_max. Ne modifie pas la base.
+    Retourne (propositions [{jour, moment, recette_id, score, recente}], cases non
+    remplies [{jour, moment}]). `recente` indique une recette servie dans
+    les `sans_repetition` semaines autour (proposée faute de mieux).
+    """
+    if not 0 <= sans_repetition <= SANS_REPETITION_MAX:
+        raise ValueError(f'Semaines sans répétition: entre 0 et {SANS_REPETITION_MAX}')
+    limites = temps_max or lire_temps_max(None)
+
+    menus_semaine = db.session.execute(
+        select(Menu.jour, Menu.moment, Menu.recette_id).where(Menu.semaine == semaine)
+    ).all()
+    occupees = {(jour, moment) for jour, moment, _ in menus_semaine}
+    cases = [(jour, moment) for jour in Menu.JOURS for moment in Menu.MOMENTS
+             if (jour, moment) not in occupees]
+    if not cases:
+        return [], []
+
+    alea = random.Random(graine)
+    id_max = db.session.scalar(select(func.max(Recette.id)))
+    if id_max is None:
+        return [], [{'jour': jour, 'moment': moment} for jour, moment in cases]
+
+    # Recettes servies autour de la semaine (pénalisées); celles de la
+    # semaine elle-même ne sont jamais reprises
+    ecart = timedelta(weeks=sans_repetition)
+    recentes = (
+        select(Menu.recette_id)
+        .where(Menu.semaine.between(semaine - ecart, semaine + ecart))
+        .where(Menu.recette_id.is_not(None))
+    )
+    prises = {recette_id for _, _, recette_id in menus_semaine if recette_id is not None}
+
+    # Les cases les plus contraintes (limite la plus courte) sont servies d'abord
+    ordre = sorted(cases, key=lambda case: _SANS_LIMITE if limites[case] is None else limites[case])
+    propositions = {}
+
+    def temps_utile():
+        """Plus grande limite des cases encore vides (None si l'une n'en a pas)"""
+        restantes = [limites[case] for case in cases if case not in propositions]
+        return None if None in restantes else max(restantes)
+
+    def attribuer(reserve, score, recente):
+        """Tire une recette de `reserve` pour chaque case vide; vrai si la semaine est remplie"""
+        for case in ordre:
+            if case in propositions:
+                continue
+            recette_id = _tirer(reserve.temps, reserve.ids, limites[case], prises, alea)
+            if recette_id is not None:
+                prises.add(recette_id)
+                propositions[case] = {'jour': case[0], 'moment': case[1], 'recette_id': recette_id,
+                                      'score': score, 'recente': recente}
+        return len(propositions) == len(cases)
+
+    # Un parcours par score, arrêté dès que la semaine est remplie; les
+    # recettes récentes lues au passage servent aux niveaux pénalisés (un
+    # score n'est parcouru jusqu'au bout que s'il n'a pas suffi)
+    recentes_lues = []
+    rempli = False
+    for score in SCORES:
+        fraiches, recentes_score = _Reserve(), _Reserve()
+        recentes_lues.append((score, recentes_score))
+        requete = (
+            select(Recette.id, Recette.temps_preparation, Recette.id.in_(recentes))
+            .where(Recette.score_equilibre == score)
+        )
+        for lot in _lots(requete, alea.randint(1, id_max), TAILLE_LOT, temps_utile):
+            fraiches.ajouter([(recette_id, temps) for recette_id, temps, recente in lot if not recente])
+            recentes_score.ajouter([(recette_id, temps) for recette_id, temps, recente in lot if recente])
+            rempli = attribuer(fraiches, score, False)
+            if rempli:
+                break
+        if rempli:
+            break
+    for score, recentes_score in recentes_lues if not rempli else ():
+        if attribuer(recentes_score, score, True):
+            break
+
+    return (
+        [propositions[case] for case in cases if case in propositions],
+        [{'jour': jour, 'moment': moment} for jour, moment in cases if (jour, moment) not in propositions],
+    )
@@ -0,0 +1,95 @@
+"""
+Version du catalogue et requêtes conditionnelles.
+
+Toute écriture sur Recette, Ingredient ou RecetteIngredient incrémente
+la ligne unique de catalogue_version dans la même transaction. Les API
+du catalogue s'en servent comme ETag fort et Last-Modified: un client
+à jour reçoit 304 après une simple lecture de cette ligne, sans charger
+ni sérialiser le catalogue.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models import Recette, Ingredient, RecetteIngredient, CatalogueVersion
+
+MODELES_CATALOGUE = (Recette, Ingredient, RecetteIngredient)
+
+_table = CatalogueVersion.__table__
+
+
+def incrementer_version(connection):
+    """Incrémente la version du catalogue sur la connexion donnée"""
+    maintenant = datetime.utcnow()
+    connection.execute(
+        insert(_table)
+        .values(id=1, version=1, updated_at=maintenant)
+        .on_conflict_do_update(
+            index_elements=[_table.c.id],
+            set_={'version': _table.c.version + 1, 'updated_at': maintenant}
+        )
+    )
+
+
+def lire_version(connection):
+    """Retourne (version, date de modification) du catalogue"""
+    ligne = connection.execute(
+        select(_table.c.version, _table.c.updated_at).where(_table.c.id == 1)
+    ).first()
+    if ligne is None:
+        return 0, None
+    return ligne.version, ligne.updated_at
+
+
+@event.listens_for(Session, 'after_flush')
+def _incrementer_si_catalogue_modifie(session, flush_context):
+    """Incrémente la version si le flush a touché le catalogue"""
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, MODELES_CATALOGUE):
+            incrementer_version(session.connection())
+            return
+
+
+def conditionnel(vue):
+    """
+    Décorateur pour les API du catalogue: répond 304 si le client possède
+    déjà la version courante (If-None-Match, ou à défaut If-Modified-Since),
+    sinon ajoute ETag et Last-Modified à la réponse. Last-Modified n'est
+    envoyé qu'une fois la seconde de la dernière écriture écoulée.
+    """
+    @wraps(vue)
+    def wrapper(*args, **kwargs):
+        from app import db
+        version, modifie_le = lire_version(db.session.connection())
+        etag = f'catalogue-{version}'
+        if modifie_le is not None:
+            # Last-Modified est à la seconde: tant que la seconde de la
+            # dernière écriture n'est pas close, une autre écriture pourrait
+            # porter la même date, donc seul l'ETag fait foi
+            modifie_le = modifie_le.replace(microsecond=0, tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) < modifie_le + timedelta(seconds=1):
+                modifie_le = None
+
+        if request.if_none_match:
+            a_jour = request.if_none_match.contains(etag)
+        else:
+            a_jour = (modifie_le is not None and request.if_modified_since is not None
+                      and modifie_le <= request.if_modified_since)
+
+        if a_jour:
+            response = make_response('', 304)
+        else:
+            response = make_response(vue(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        if modifie_le is not None:
+            response.last_modified = modifie_le
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,194 @@
+"""Commandes CLI de maintenance (flask <commande>)"""
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db, migrations, recherche, sauvegarde, statiques, statistiques
+from app.echange import exporter_ndjson, importer_ndjson
+from app.models import Recette
+
+
+@click.command('recalculer-equilibre')
+@with_appcontext
+def recalculer_equilibre_command():
+    """Recalcule le masque de catégories et le score d'équilibre des recettes"""
+    total = Recette.recalculer_equilibre()
+    db.session.commit()
+    click.echo(f"✅ Équilibre recalculé pour {total} recette(s)")
+
+
+@click.command('reconstruire-recherche')
+@with_appcontext
+def reconstruire_recherche_command():
+    """Reconstruit les index de recherche plein texte"""
+    recherche.creer_index()
+    recherche.reconstruire_index()
+    db.session.commit()
+    click.echo("✅ Index de recherche reconstruits")
+
+
+@click.command('reconstruire-statistiques')
+@with_appcontext
+def reconstruire_statistiques_command():
+    """Recalcule les agrégats d'usage par semaine à partir du planning"""
+    statistiques.reconstruire_agregats()
+    db.session.commit()
+    click.echo("✅ Statistiques d'usage reconstruites")
+
+
+@click.command('export-ndjson')
+@click.argument('fichier', type=click.File('w', encoding='utf-8'), default='-')
+@with_appcontext
+def export_ndjson_command(fichier):
+    """Exporte le catalogue et les menus en NDJSON (sortie standard par défaut)"""
+    for ligne in exporter_ndjson():
+        fichier.write(ligne)
+
+
+@click.command('import-ndjson')
+@click.argument('fichier', type=click.File('rb'))
+@with_appcontext
+def import_ndjson_command(fichier):
+    """Importe un fichier NDJSON (ingrédients, recettes, menus)"""
+    rapport = importer_ndjson(fichier)
+    for type_objet, total in rapport['importes'].items():
+        click.echo(f"✅ {total} {type_objet}(s) importé(s)")
+    if rapport['existants']:
+        click.echo(f"ℹ️  {rapport['existants']} ingrédient(s) déjà existant(s) ignoré(s)")
+    if rapport['menus_fusionnes']:
+        click.echo(f"ℹ️  {rapport['menus_fusionnes']} menu(s) d'une case déjà importée fusionné(s)")
+    for erreur in rapport['erreurs']:
+        click.echo(f"❌ Ligne {erreur['ligne']}: {erreur['message']}", err=True)
+    if rapport['nb_erreurs'] > len(rapport['erreurs']):
+        click.echo(f"❌ ... {rapport['nb_erreurs'] - len(rapport['erreurs'])} autre(s) erreur(s)", err=True)
+
+
+@click.command('migrer')
+@click.option('--dedoublonner', is_flag=True,
+              help="Supprime les menus en double d'une même case (après sauvegarde) avant de migrer")
+@with_appcontext
+def migrer_command(dedoublonner):
+    """Applique les migrations de schéma en attente"""
+    # Pas de migration automatique au démarrage pour cette commande (create_app)
+    if not migrations.schema_a_jour():
+        db.create_all()
+    if dedoublonner:
+        doublons = migrations.compter_menus_en_double()
+        if doublons:
+            config = current_app.config
+            try:
+                rapport = sauvegarde.sauvegarder(
+                    sauvegarde.chemin_base(db.engine), config['BACKUP_DIR'],
+                    pages=config['BACKUP_PAGES'], pause=config['BACKUP_PAUSE'], retention_jours=0,
+                )
+            except (ValueError, sqlite3.Error) as e:
+                raise click.ClickException(f'Sauvegarde impossible, aucun menu supprimé: {e}')
+            click.echo(f"💾 Sauvegarde avant dédoublonnage: {rapport['fichier']}")
+            supprimes = migrations.dedoublonner_menus()
+            db.session.commit()
+            click.echo(f"🗑️  {supprimes} menu(s) en double supprimé(s) (le plus ancien de chaque case est gardé)")
+    try:
+        appliquees = migrations.migrer()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for version, description in appliquees:
+        click.echo(f"✅ Migration {version}: {description}")
+    if not appliquees:
+        click.echo("ℹ️  Schéma à jour")
+
+
+@click.command('sauvegarder')
+@click.option('--compresser', is_flag=True, help="Instantané VACUUM INTO compressé (gzip)")
+@click.option('--pages', type=int, help="Pages copiées par étape (défaut: BACKUP_PAGES)")
+@click.option('--pause', type=float, help="Pause entre deux étapes en secondes (défaut: BACKUP_PAUSE)")
+@click.option('--retention', type=int, help="Rétention en jours, 0 = aucune suppression (défaut: BACKUP_RETENTION_JOURS)")
+@with_appcontext
+def sauvegarder_command(compresser, pages, pause, retention):
+    """Sauvegarde la base à chaud dans BACKUP_DIR et applique la rétention"""
+    config = current_app.config
+    try:
+        rapport = sauvegarde.sauvegarder(
+            sauvegarde.chemin_base(db.engine),
+            config['BACKUP_DIR'],
+            compresser=compresser,
+            pages=pages or config['BACKUP_PAGES'],
+            pause=config['BACKUP_PAUSE'] if pause is None else pause,
+            retention_jours=config['BACKUP_RETENTION_JOURS'] if retention is None else retention,
+        )
+    except (ValueError, sqlite3.Error) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ {rapport['fichier']} ({rapport['taille']} octets, {rapport['duree']} s)")
+    for nom in rapport['supprimees']:
+        click.echo(f"🗑️  {nom} supprimée (rétention)")
+
+
+@click.command('construire-statiques')
+@with_appcontext
+def construire_statiques_command():
+    """Compile les CSS et JS en paquets minifiés, empreintés et précompressés (static/dist/)"""
+    for ligne in statiques.construire(current_app.static_folder):
+        compresse = f"gzip {ligne['gzip']}"
+        if ligne['brotli'] is not None:
+            compresse += f", brotli {ligne['brotli']}"
+        click.echo(f"✅ {ligne['fichier']:<28} {ligne['source']} -> {ligne['minifie']} octets ({compresse})")
+    if statiques.brotli is None:
+        click.echo("ℹ️  Module brotli absent: variantes .gz seulement")
+
+
+# Exécuté dans un interpréteur neuf: les modules ne sont pas déjà en mémoire
+_SCRIPT_DEMARRAGE = """
+import json, sys, time
+debut = time.perf_counter()
+import app
+import_app = time.perf_counter()
+application = app.create_app()
+factory = time.perf_counter()
+reportlab_charge = 'reportlab' in sys.modules
+from datetime import date
+from app.export_pdf import rendre_liste_courses
+avant_pdf = time.perf_counter()
+rendre_liste_courses(date.today(), date.today(), [])
+premier_pdf = time.perf_counter()
+print(json.dumps({
+    'import_ms': (import_app - debut) * 1000,
+    'create_app_ms': (factory - import_app) * 1000,
+    'premier_pdf_ms': (premier_pdf - avant_pdf) * 1000,
+    'reportlab_au_demarrage': reportlab_charge,
+}))
+"""
+
+
+@click.command('mesurer-demarrage')
+@click.option('--repetitions', default=5, show_default=True, help="Nombre de démarrages mesurés")
+@click.option('--json', 'format_json', is_flag=True, help="Sortie JSON")
+@with_appcontext
+def mesurer_demarrage_command(repetitions, format_json):
+    """Mesure le temps d'import et de create_app() d'un worker à froid"""
+    racine = os.path.dirname(current_app.root_path)
+    mesures = []
+    for _ in range(repetitions):
+        resultat = subprocess.run([sys.executable, '-c', _SCRIPT_DEMARRAGE], cwd=racine,
+                                  capture_output=True, text=True, check=True)
+        mesures.append(json.loads(resultat.stdout.strip().splitlines()[-1]))
+
+    rapport = {
+        cle: {'min': min(m[cle] for m in mesures), 'mediane': statistics.median(m[cle] for m in mesures)}
+        for cle in ('import_ms', 'create_app_ms', 'premier_pdf_ms')
+    }
+    rapport['reportlab_au_demarrage'] = any(m['reportlab_au_demarrage'] for m in mesures)
+    rapport['repetitions'] = repetitions
+
+    if format_json:
+        click.echo(json.dumps(rapport))
+        return
+    libelles = {'import_ms': 'import app', 'create_app_ms': 'create_app()', 'premier_pdf_ms': 'premier PDF'}
+    for cle, libelle in libelles.items():
+        click.echo(f"⏱️  {libelle:<14} médiane {rapport[cle]['mediane']:7.1f} ms   min {rapport[cle]['min']:7.1f} ms")
+    if rapport['reportlab_au_demarrage']:
+        click.echo("⚠️  ReportLab est chargé au démarrage", err=True)
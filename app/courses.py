@@ -0,0 +1,73 @@
+"""
+Liste de courses agrégée côté SQL.
+
+Une seule requête GROUP BY sur menu ⋈ recette ⋈ recette_ingredient ⋈
+ingredient calcule, pour une plage de semaines, la quantité totale par
+(ingrédient, unité) et le nombre d'occurrences dans les menus; une passe
+sur ces lignes (app.unites) les ramène ensuite aux unités canoniques,
+pour que "500 g" et "1 kg" d'un même ingrédient s'additionnent.
+
+Avec `personnes`, les quantités de chaque recette sont mises à l'échelle
+de ce nombre de convives au lieu de ses propres portions.
+"""
+from sqlalchemy import func
+from app import db, unites
+from app.models import Menu, Recette, RecetteIngredient, Ingredient
+
+# Nombre maximal de convives pour la mise à l'échelle
+MAX_PERSONNES = 100
+
+
+def agreger_courses(debut, fin=None, personnes=None):
+    """
+    Agrège les ingrédients des menus des semaines de `debut` à `fin`
+    (lundis inclus), en unités canoniques, pour `personnes` convives (ou
+    les portions de chaque recette). Retourne des tuples
+    (categorie, nom, unite, quantite, count) triés par catégorie et nom.
+    """
+    fin = fin or debut
+    quantite = RecetteIngredient.quantite
+    if personnes:
+        quantite = quantite * personnes / func.coalesce(func.nullif(Recette.portions, 0), personnes)
+    lignes = db.session.query(
+        Ingredient.categorie,
+        Ingredient.id,
+        Ingredient.nom,
+        RecetteIngredient.unite,
+        func.sum(quantite),
+        func.count(RecetteIngredient.id)
+    ).select_from(Menu).join(
+        Recette, Recette.id == Menu.recette_id
+    ).join(
+        RecetteIngredient, RecetteIngredient.recette_id == Menu.recette_id
+    ).join(
+        Ingredient, Ingredient.id == RecetteIngredient.ingredient_id
+    ).filter(
+        Menu.semaine >= debut,
+        Menu.semaine <= fin
+    ).group_by(
+        Ingredient.id,
+        Ingredient.categorie,
+        Ingredient.nom,
+        RecetteIngredient.unite
+    ).order_by(
+        Ingredient.categorie,
+        Ingredient.nom,
+        Ingredient.id
+    ).all()
+    return unites.agreger(lignes)
+
+
+def liste_courses(debut, fin=None, personnes=None):
+    """Liste de courses regroupée par catégorie, au format de /api/shopping-list"""
+    result = []
+    for categorie, nom, unite, quantite, count in agreger_courses(debut, fin, personnes):
+        if not result or result[-1]['categorie'] != categorie:
+            result.append({'categorie': categorie, 'ingredients': []})
+        result[-1]['ingredients'].append({
+            'nom': nom,
+            'unite': unite,
+            'quantite': quantite,
+            'count': count
+        })
+    return result
@@ -0,0 +1,374 @@
+"""
+Import et export en masse au format NDJSON (un objet JSON par ligne).
+
+Chaque ligne porte un champ "type":
+- ingredient: {"nom", "categorie", "unite"}
+- recette: {"id", "nom", "description", "temps_preparation", "portions",
+  "ingredients": [{"nom", "quantite", "unite"}]}
+- menu: {"semaine", "jour", "moment", "recette_id", "description"}
+
+L'export est un générateur qui lit la base par lots: sa mémoire ne
+dépend pas de la taille du catalogue. L'import lit le flux ligne par
+ligne, accumule des lots homogènes insérés par executemany et commités
+un par un; une ligne invalide est signalée avec son numéro et ignorée.
+Les ingrédients des recettes sont résolus par nom et le champ
+"recette_id" d'un menu désigne l'"id" d'une recette du même fichier
+(ou, à défaut, une recette déjà en base).
+"""
+from datetime import datetime
+import json
+
+from sqlalchemy import insert, select, update
+
+from app import db, unites
+from app.models import Ingredient, Recette, RecetteIngredient, Menu
+from app.catalogue import incrementer_version
+
+TYPES = ('ingredient', 'recette', 'menu')
+
+TAILLE_LOT = 1000
+
+# Nombre maximal d'erreurs détaillées dans le rapport d'import
+MAX_ERREURS = 1000
+
+
+def _ligne(objet):
+    return json.dumps(objet, ensure_ascii=False) + '\n'
+
+
+def _par_lots(requete, cle, taille):
+    """Parcourt une requête triée par `cle` par lots de `taille` lignes (keyset)"""
+    dernier = None
+    while True:
+        lot_requete = requete
+        if dernier is not None:
+            lot_requete = lot_requete.where(cle > dernier)
+        lot = db.session.execute(lot_requete.order_by(cle).limit(taille)).all()
+        if not lot:
+            return
+        yield lot
+        dernier = lot[-1][0]
+
+
+def exporter_ndjson(types=TYPES, taille_lot=TAILLE_LOT):
+    """Génère les lignes NDJSON du catalogue et de l'historique des menus"""
+    if 'ingredient' in types:
+        requete = select(Ingredient.id, Ingredient.nom, Ingredient.categorie, Ingredient.unite)
+        for lot in _par_lots(requete, Ingredient.id, taille_lot):
+            for _, nom, categorie, unite in lot:
+                yield _ligne({'type': 'ingredient', 'nom': nom, 'categorie': categorie, 'unite': unite})
+
+    if 'recette' in types:
+        requete = select(Recette.id, Recette.nom, Recette.description,
+                         Recette.temps_preparation, Recette.portions)
+        for lot in _par_lots(requete, Recette.id, taille_lot):
+            # Ingrédients de tout le lot en une requête
+            ingredients = {}
+            for recette_id, nom, quantite, unite in db.session.execute(
+                select(RecetteIngredient.recette_id, Ingredient.nom,
+                       RecetteIngredient.quantite, RecetteIngredient.unite)
+                .join(Ingredient, Ingredient.id == RecetteIngredient.ingredient_id)
+                .where(RecetteIngredient.recette_id.in_([ligne[0] for ligne in lot]))
+                .order_by(RecetteIngredient.id)
+            ):
+                ingredients.setdefault(recette_id, []).append(
+                    {'nom': nom, 'quantite': quantite, 'unite': unite})
+
+            for id, nom, description, temps_preparation, portions in lot:
+                yield _ligne({
+                    'type': 'recette',
+                    'id': id,
+                    'nom': nom,
+                    'description': description,
+                    'temps_preparation': temps_preparation,
+                    'portions': portions,
+                    'ingredients': ingredients.get(id, [])
+                })
+
+    if 'menu' in types:
+        requete = select(Menu.id, Menu.semaine, Menu.jour, Menu.moment,
+                         Menu.recette_id, Menu.description)
+        for lot in _par_lots(requete, Menu.id, taille_lot):
+            for _, semaine, jour, moment, recette_id, description in lot:
+                yield _ligne({
+                    'type': 'menu',
+                    'semaine': semaine.isoformat(),
+                    'jour': jour,
+                    'moment': moment,
+                    'recette_id': recette_id,
+                    'description': description
+                })
+
+
+class _Import:
+    """État d'un import: correspondances de noms et d'ids, lot en cours, rapport"""
+
+    def __init__(self, taille_lot):
+        self.taille_lot = taille_lot
+        self.lot = []
+        self.type_lot = None
+        # nom -> (id, catégorie) des ingrédients connus
+        self.ingredients = {}
+        for id, nom, categorie in db.session.execute(
+            select(Ingredient.id, Ingredient.nom, Ingredient.categorie).order_by(Ingredient.id)
+        ):
+            self.ingredients.setdefault(nom, (id, categorie))
+        self.recettes_fichier = {}
+        self._recettes_en_base = None
+        # Cases du planning déjà écrites par cet import
+        self.cases_menus = set()
+        self.rapport = {
+            'importes': dict.fromkeys(TYPES, 0),
+            'existants': 0,
+            'menus_fusionnes': 0,
+            'nb_erreurs': 0,
+            'erreurs': []
+        }
+
+    def erreur(self, numero, message):
+        self.rapport['nb_erreurs'] += 1
+        if len(self.rapport['erreurs']) < MAX_ERREURS:
+            self.rapport['erreurs'].append({'ligne': numero, 'message': message})
+
+    def ajouter(self, numero, texte):
+        """Valide une ligne et l'ajoute au lot de son type"""
+        if not texte.strip():
+            return
+        try:
+            objet = json.loads(texte)
+            if not isinstance(objet, dict):
+                raise ValueError('Objet JSON attendu')
+            type_ligne = objet.get('type')
+            if not isinstance(type_ligne, str) or type_ligne not in TYPES:
+                raise ValueError('Type invalide')
+        except ValueError as e:
+            self.erreur(numero, str(e))
+            return
+
+        # Un lot ne contient qu'un type: les lignes d'avant sont écrites d'abord
+        if type_ligne != self.type_lot:
+            self.vider()
+            self.type_lot = type_ligne
+        try:
+            enregistrement = getattr(self, f'_valider_{type_ligne}')(objet)
+        except ValueError as e:
+            self.erreur(numero, str(e))
+            return
+        except (TypeError, AttributeError):
+            # Filet de sécurité: un champ d'un type inattendu invalide la
+            # ligne, pas l'import entier
+            self.erreur(numero, 'Champ de type invalide')
+            return
+
+        if enregistrement is not None:
+            self.lot.append(enregistrement)
+        if len(self.lot) >= self.taille_lot:
+            self.vider()
+
+    def vider(self):
+        """Écrit et commite le lot en cours"""
+        if self.lot:
+            ecrits = getattr(self, f'_inserer_{self.type_lot}')(self.lot)
+            db.session.commit()
+            self.rapport['importes'][self.type_lot] += ecrits
+        self.lot = []
+
+    # Validation (mêmes règles que les API de création)
+
+    @staticmethod
+    def _texte(objet, cle, defaut=''):
+        """Champ texte de `objet` (`defaut` s'il est absent ou vide); ValueError si ce n'est pas un texte"""
+        valeur = objet.get(cle)
+        if valeur is None or valeur == '':
+            return defaut
+        if not isinstance(valeur, str):
+            raise ValueError(f'Champ "{cle}" invalide (texte attendu)')
+        return valeur
+
+    def _valider_ingredient(self, objet):
+        nom = self._texte(objet, 'nom').strip()
+        if not nom or len(nom) > 100:
+            raise ValueError("Nom d'ingrédient invalide")
+        categorie = self._texte(objet, 'categorie', 'Autre')
+        if categorie not in Ingredient.CATEGORIES:
+            raise ValueError('Catégorie invalide')
+        unite = self._texte(objet, 'unite', 'g')
+        if unite not in Ingredient.UNITES:
+            raise ValueError('Unité invalide')
+        if nom in self.ingredients:
+            self.rapport['existants'] += 1
+            return None
+        # Réserver le nom pour dédoublonner le fichier lui-même
+        self.ingredients[nom] = None
+        return {'nom': nom, 'categorie': categorie, 'unite': unite}
+
+    def _valider_recette(self, objet):
+        nom = self._texte(objet, 'nom').strip()
+        if not nom or len(nom) > 200:
+            raise ValueError('Nom de recette invalide')
+        temps_preparation = objet.get('temps_preparation')
+        if temps_preparation is not None:
+            if isinstance(temps_preparation, bool) or not isinstance(temps_preparation, int) \
+                    or not 0 <= temps_preparation <= 1440:
+                raise ValueError('Temps de préparation invalide')
+        portions = objet.get('portions') or 4
+        if isinstance(portions, bool) or not isinstance(portions, int) or not 1 <= portions <= 100:
+            raise ValueError('Nombre de portions invalide')
+
+        description = self._texte(objet, 'description')
+        liste = objet.get('ingredients') or []
+        if not isinstance(liste, list) or not all(isinstance(ing, dict) for ing in liste):
+            raise ValueError('Ingrédients invalides (liste d\'objets attendue)')
+
+        ingredients = []
+        masque = 0
+        for ing in liste:
+            ingredient = self.ingredients.get(self._texte(ing, 'nom').strip())
+            if ingredient is None:
+                raise ValueError(f"Ingrédient inconnu: {ing.get('nom')}")
+            ingredient_id, categorie = ingredient
+            masque |= Ingredient.MASQUES_CATEGORIES.get(categorie, 0)
+            quantite = ing.get('quantite', 1)
+            if isinstance(quantite, bool) or not isinstance(quantite, (int, float, str)):
+                raise ValueError('Quantité invalide')
+            try:
+                quantite = float(quantite)
+            except ValueError:
+                raise ValueError('Quantité invalide')
+            if not 0 < quantite < 1e6:
+                raise ValueError('Quantité invalide')
+            ingredients.append({
+                'ingredient_id': ingredient_id,
+                'quantite': quantite,
+                'unite': unites.normaliser(self._texte(ing, 'unite', 'pièce'))
+            })
+
+        id_fichier = objet.get('id')
+        if id_fichier is not None and (isinstance(id_fichier, bool) or not isinstance(id_fichier, int)):
+            raise ValueError('Identifiant de recette invalide (entier attendu)')
+        return {
+            'id_fichier': id_fichier,
+            'ligne': {
+                'nom': nom,
+                'description': description,
+                'temps_preparation': temps_preparation,
+                'portions': portions,
+                # Équilibre calculé ici plutôt que par Recette.recalculer_equilibre
+                'categories_masque': masque,
+                'score_equilibre': Menu.score_masque(masque)
+            },
+            'ingredients': ingredients
+        }
+
+    def _valider_menu(self, objet):
+        if self._texte(objet, 'jour') not in Menu.JOURS or self._texte(objet, 'moment') not in Menu.MOMENTS:
+            raise ValueError('Jour ou moment invalide')
+        try:
+            semaine = datetime.strptime(self._texte(objet, 'semaine'), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Format de date invalide')
+
+        recette_id = objet.get('recette_id')
+        if recette_id is not None and (isinstance(recette_id, bool) or not isinstance(recette_id, int)):
+            raise ValueError('Identifiant de recette invalide (entier attendu)')
+        if recette_id is not None:
+            if recette_id in self.recettes_fichier:
+                recette_id = self.recettes_fichier[recette_id]
+            elif recette_id not in self._recettes_existantes():
+                raise ValueError(f'Recette inconnue: {recette_id}')
+
+        return {
+            'semaine': semaine,
+            'jour': objet['jour'],
+            'moment': objet['moment'],
+            'recette_id': recette_id,
+            'description': self._texte(objet, 'description', None)
+        }
+
+    def _recettes_existantes(self):
+        if self._recettes_en_base is None:
+            self._recettes_en_base = set(db.session.scalars(select(Recette.id)))
+        return self._recettes_en_base
+
+    # Écriture groupée (Core: sans le coût de l'unité de travail de l'ORM)
+
+    def _inserer_ingredient(self, lot):
+        ids = db.session.scalars(
+            insert(Ingredient.__table__).returning(Ingredient.id, sort_by_parameter_order=True),
+            lot
+        ).all()
+        for ligne, id in zip(lot, ids):
+            self.ingredients[ligne['nom']] = (id, ligne['categorie'])
+        incrementer_version(db.session.connection())
+        return len(lot)
+
+    def _inserer_recette(self, lot):
+        ids = db.session.scalars(
+            insert(Recette.__table__).returning(Recette.id, sort_by_parameter_order=True),
+            [enregistrement['ligne'] for enregistrement in lot]
+        ).all()
+
+        lignes_ingredients = []
+        for enregistrement, id in zip(lot, ids):
+            if enregistrement['id_fichier'] is not None:
+                self.recettes_fichier[enregistrement['id_fichier']] = id
+            for ing in enregistrement['ingredients']:
+                lignes_ingredients.append({'recette_id': id, **ing})
+        if lignes_ingredients:
+            db.session.execute(insert(RecetteIngredient.__table__), lignes_ingredients)
+
+        incrementer_version(db.session.connection())
+        return len(lot)
+
+    def _inserer_menu(self, lot):
+        # Les cases déjà occupées sont mises à jour, les autres créées. Des
+        # lignes d'une même case n'écrivent qu'un menu (la dernière l'emporte):
+        # seules les cases nouvelles pour cet import sont comptées importées
+        semaines = {ligne['semaine'] for ligne in lot}
+        existants = {}
+        for id, semaine, jour, moment in db.session.execute(
+            select(Menu.id, Menu.semaine, Menu.jour, Menu.moment)
+            .where(Menu.semaine.in_(semaines)).order_by(Menu.id)
+        ):
+            existants.setdefault((semaine, jour, moment), id)
+
+        a_inserer = {}
+        a_modifier = {}
+        for ligne in lot:
+            case = (ligne['semaine'], ligne['jour'], ligne['moment'])
+            if case in existants:
+                a_modifier[case] = {'id': existants[case], 'recette_id': ligne['recette_id'],
+                                    'description': ligne['description']}
+            else:
+                a_inserer[case] = ligne
+
+        if a_modifier:
+            db.session.execute(update(Menu), list(a_modifier.values()))
+        if a_inserer:
+            db.session.execute(insert(Menu.__table__), list(a_inserer.values()))
+
+        nouvelles = (a_inserer.keys() | a_modifier.keys()) - self.cases_menus
+        self.cases_menus.update(nouvelles)
+        self.rapport['menus_fusionnes'] += len(lot) - len(nouvelles)
+        return len(nouvelles)
+
+
+def importer_ndjson(lignes, taille_lot=TAILLE_LOT):
+    """
+    Importe un flux de lignes NDJSON (str ou bytes).
+    Retourne le rapport: nombre d'objets importés par type (cases du
+    planning distinctes pour les menus), ingrédients déjà existants
+    ignorés, lignes de menu fusionnées dans une case déjà importée et
+    erreurs par numéro de ligne.
+    """
+    etat = _Import(taille_lot)
+    for numero, texte in enumerate(lignes, start=1):
+        if isinstance(texte, bytes):
+            try:
+                texte = texte.decode('utf-8')
+            except UnicodeDecodeError:
+                etat.erreur(numero, 'Encodage invalide (UTF-8 attendu)')
+                continue
+        etat.ajouter(numero, texte)
+    etat.vider()
+    return etat.rapport
@@ -0,0 +1,55 @@
+"""
+Analyse d'équilibre nutritionnel par lot.
+
+Lit en une seule requête le masque de catégories précalculé de la recette
+de chaque menu (Recette.categories_masque), puis applique
+Menu.evaluer_masque. Le résultat est identique à celui de
+Menu.analyser_equilibre tant que les ingrédients portent une catégorie de
+Ingredient.CATEGORIES, seules à avoir un bit dans le masque: les API et
+l'import n'en acceptent pas d'autres, et la migration 7 ramène les
+catégories libres héritées à une catégorie connue.
+"""
+from app import db
+from app.models import Menu, Recette
+
+
+def _analyser(filtre):
+    """Analyse tous les menus correspondant au filtre, indexés par id"""
+    lignes = db.session.query(
+        Menu.id,
+        Recette.id,
+        Recette.categories_masque
+    ).outerjoin(
+        Recette, Recette.id == Menu.recette_id
+    ).filter(filtre).all()
+
+    resultats = {}
+    for menu_id, recette_id, masque in lignes:
+        if recette_id is None:
+            resultats[menu_id] = Menu.analyse_vide()
+        else:
+            resultats[menu_id] = Menu.evaluer_masque(masque or 0)
+    return resultats
+
+
+def analyser_menus(menu_ids):
+    """
+    Analyse l'équilibre d'une liste de menus.
+    Retourne un dict {menu_id: analyse}; les ids inconnus sont ignorés.
+    """
+    ids = set()
+    for menu_id in menu_ids:
+        try:
+            ids.add(int(menu_id))
+        except (ValueError, TypeError):
+            continue
+
+    if not ids:
+        return {}
+
+    return _analyser(Menu.id.in_(ids))
+
+
+def analyser_semaine(semaine):
+    """Analyse l'équilibre de tous les menus d'une semaine (date du lundi)"""
+    return _analyser(Menu.semaine == semaine)
@@ -0,0 +1,124 @@
+"""
+Export PDF de la liste de courses avec cache adressé par contenu.
+
+La clé du cache est une empreinte SHA-256 des lignes agrégées de la liste
+(et de la période affichée dans le titre): tant que les menus de la
+période ne changent pas, le même PDF est resservi sans nouveau rendu.
+L'empreinte sert aussi d'ETag pour répondre 304 aux clients à jour.
+
+ReportLab n'est importé qu'au premier rendu: les workers et commandes
+CLI qui ne génèrent jamais de PDF n'en paient pas le chargement.
+"""
+from collections import OrderedDict
+import hashlib
+import io
+import json
+import threading
+
+from app import unites
+
+
+class CachePDF:
+    """Cache LRU de documents PDF borné par leur taille totale en octets"""
+
+    def __init__(self, max_octets):
+        self.max_octets = max_octets
+        self.taille = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cle):
+        with self._lock:
+            document = self._documents.get(cle)
+            if document is not None:
+                self._documents.move_to_end(cle)
+            return document
+
+    def set(self, cle, document):
+        if len(document) > self.max_octets:
+            return
+        with self._lock:
+            ancien = self._documents.pop(cle, None)
+            if ancien is not None:
+                self.taille -= len(ancien)
+            self._documents[cle] = document
+            self.taille += len(document)
+            # Évincer les documents les moins récemment utilisés
+            while self.taille > self.max_octets:
+                _, evince = self._documents.popitem(last=False)
+                self.taille -= len(evince)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.taille = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(max_octets):
+    """Cache partagé par les requêtes du processus"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CachePDF(max_octets)
+    return _cache
+
+
+def lignes_pdf(lignes_courses):
+    """
+    Convertit les lignes agrégées (categorie, nom, unite, quantite, count)
+    en lignes du tableau PDF (nom, unite, quantite), triées par nom et unité.
+    """
+    quantites = {}
+    for _, nom, unite, quantite, _ in lignes_courses:
+        quantites[(nom, unite)] = quantites.get((nom, unite), 0) + (quantite or 0)
+    return [(nom, unite, quantite) for (nom, unite), quantite in sorted(quantites.items())]
+
+
+def empreinte(debut, fin, lignes):
+    """Empreinte SHA-256 du contenu d'une liste de courses"""
+    contenu = json.dumps([debut.isoformat(), fin.isoformat(), lignes], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def rendre_liste_courses(debut, fin, lignes):
+    """Génère le PDF de la liste de courses du lundi `debut` au dimanche `fin`"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    title = Paragraph(f"<b>Liste de Courses</b><br/>Semaine du {debut.strftime('%d/%m/%Y')} au {fin.strftime('%d/%m/%Y')}", styles['Title'])
+    elements.append(title)
+    elements.append(Spacer(1, 20))
+
+    # Créer le tableau des ingrédients
+    data = [['Ingrédient', 'Quantité', 'Unité']]
+    for nom, unite, quantite in lignes:
+        data.append([nom, unites.formater(quantite), unite])
+
+    table = Table(data, colWidths=[300, 100, 100])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    elements.append(table)
+    doc.build(elements)
+
+    return buffer.getvalue()
@@ -0,0 +1,115 @@
+"""
+Instrumentation SQL par requête HTTP.
+
+Les événements du moteur SQLAlchemy comptent et chronomètrent chaque
+instruction exécutée pendant une requête; les hooks Flask ajoutent à la
+réponse un en-tête Server-Timing (db, render, total) lisible dans les
+outils de développement du navigateur.
+
+- Une instruction plus lente que SQL_LENTE_MS est journalisée avec
+  l'endpoint qui l'a émise.
+- Si N_PLUS_1_SEUIL > 0, une même forme d'instruction (paramètres et
+  listes IN normalisés) répétée plus de N_PLUS_1_SEUIL fois dans une
+  requête est signalée: symptôme typique d'un chargement paresseux en
+  boucle (N+1).
+"""
+from collections import Counter
+import re
+import time
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+_NOMBRE = re.compile(r'\b\d+\b')
+_LISTE = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_ESPACES = re.compile(r'\s+')
+
+
+def forme(instruction):
+    """Forme normalisée d'une instruction SQL (littéraux et listes IN effacés)"""
+    instruction = _ESPACES.sub(' ', instruction.strip())
+    instruction = _LISTE.sub('(?)', instruction)
+    return _NOMBRE.sub('?', instruction)
+
+
+def _stats():
+    """Statistiques SQL de la requête HTTP en cours (None hors requête)"""
+    if not has_request_context():
+        return None
+    stats = g.get('_instrumentation')
+    if stats is None:
+        stats = g._instrumentation = {
+            'debut': time.perf_counter(),
+            'requetes': 0,
+            'db': 0.0,
+            'rendu': 0.0,
+            'formes': Counter(),
+        }
+    return stats
+
+
+def installer(app, engine):
+    """Branche l'instrumentation sur l'application et son moteur"""
+    if not app.config['INSTRUMENTATION']:
+        return
+    seuil_lente = app.config['SQL_LENTE_MS']
+    seuil_n_plus_1 = app.config['N_PLUS_1_SEUIL']
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_debuts_instruction', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+        duree = (time.perf_counter() - conn.info['_debuts_instruction'].pop()) * 1000
+        stats = _stats()
+        if stats is not None:
+            stats['requetes'] += 1
+            stats['db'] += duree
+            if seuil_n_plus_1:
+                stats['formes'][forme(statement)] += 1
+        if duree >= seuil_lente:
+            endpoint = request.endpoint if has_request_context() else 'hors requête'
+            app.logger.warning('Requête SQL lente (%.1f ms) dans %s: %s',
+                               duree, endpoint, _ESPACES.sub(' ', statement)[:500])
+
+    @event.listens_for(engine, 'handle_error')
+    def _erreur_execution(exception_context):
+        connexion = exception_context.connection
+        if connexion is not None and connexion.info.get('_debuts_instruction'):
+            connexion.info['_debuts_instruction'].pop()
+
+    def _avant_rendu(sender, template, context, **extra):
+        stats = _stats()
+        if stats is not None:
+            stats['debut_rendu'] = time.perf_counter()
+
+    def _apres_rendu(sender, template, context, **extra):
+        stats = _stats()
+        if stats is not None and 'debut_rendu' in stats:
+            stats['rendu'] += (time.perf_counter() - stats.pop('debut_rendu')) * 1000
+
+    before_render_template.connect(_avant_rendu, app, weak=False)
+    template_rendered.connect(_apres_rendu, app, weak=False)
+
+    @app.before_request
+    def _debut_requete():
+        _stats()
+
+    @app.after_request
+    def _server_timing(response):
+        stats = _stats()
+        total = (time.perf_counter() - stats['debut']) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats["db"]:.2f};desc="{stats["requetes"]} SQL", '
+            f'render;dur={stats["rendu"]:.2f}, total;dur={total:.2f}'
+        )
+
+        if seuil_n_plus_1:
+            for instruction, nombre in stats['formes'].items():
+                if nombre > seuil_n_plus_1:
+                    app.logger.warning('N+1 probable dans %s: %d exécutions de %s',
+                                       request.endpoint, nombre, instruction[:300])
+        return response
@@ -0,0 +1,308 @@
+"""
+Métriques opérationnelles au format texte Prometheus (GET /metrics).
+
+Chaque processus agrège ses compteurs et histogrammes en mémoire (un
+verrou par processus, tenu le temps d'une addition). Avec plusieurs
+workers gunicorn, METRICS_DIR désigne un répertoire partagé: chaque
+worker y écrit son instantané dans son propre fichier (depuis un thread
+d'arrière-plan, toutes les METRICS_FLUSH_SECONDES s'il a changé, et à sa
+sortie), et /metrics additionne les
+fichiers de tous les workers, y compris ceux déjà recyclés, pour que les
+compteurs ne reculent jamais.
+
+Quand un worker se termine (recyclage après MAX_REQUESTS requêtes), le
+master ajoute son instantané à un fichier d'archive unique puis le
+supprime (hook child_exit de gunicorn): le nombre de fichiers, et donc le
+coût d'un relevé, reste borné par le nombre de workers vivants.
+"""
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BUCKETS_PDF = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# nom -> (type, aide, buckets)
+METRIQUES = {
+    'routinerie_http_requests_total': (
+        'counter', 'Requêtes HTTP par endpoint, méthode et statut', None),
+    'routinerie_http_request_duration_seconds': (
+        'histogram', 'Durée des requêtes HTTP par endpoint et méthode', BUCKETS_HTTP),
+    'routinerie_db_query_duration_seconds': (
+        'histogram', 'Durée des requêtes SQL par endpoint', BUCKETS_SQL),
+    'routinerie_pdf_render_duration_seconds': (
+        'histogram', 'Durée du rendu PDF des listes de courses', BUCKETS_PDF),
+}
+
+
+class Registre:
+    """Compteurs et histogrammes du processus, indexés par (nom, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Incrémentée à chaque modification (instantané à réécrire ou non)
+        self.modifications = 0
+        self.compteurs = {}
+        # (nom, labels) -> [compte par bucket (non cumulé, +Inf en dernier), somme]
+        self.histogrammes = {}
+
+    def incrementer(self, nom, labels, valeur=1):
+        cle = (nom, tuple(sorted(labels.items())))
+        with self._lock:
+            self.compteurs[cle] = self.compteurs.get(cle, 0) + valeur
+            self.modifications += 1
+
+    def observer(self, nom, labels, valeur):
+        buckets = METRIQUES[nom][2]
+        index = len(buckets)
+        for position, borne in enumerate(buckets):
+            if valeur <= borne:
+                index = position
+                break
+        cle = (nom, tuple(sorted(labels.items())))
+        with self._lock:
+            serie = self.histogrammes.get(cle)
+            if serie is None:
+                serie = self.histogrammes[cle] = [0] * (len(buckets) + 1) + [0.0]
+            serie[index] += 1
+            serie[-1] += valeur
+            self.modifications += 1
+
+    def instantane(self):
+        """Copie sérialisable en JSON des valeurs du processus"""
+        with self._lock:
+            return {
+                'compteurs': [[nom, list(labels), valeur]
+                              for (nom, labels), valeur in self.compteurs.items()],
+                'histogrammes': [[nom, list(labels), list(serie)]
+                                 for (nom, labels), serie in self.histogrammes.items()],
+            }
+
+    def fusionner(self, instantane):
+        """Ajoute un instantané (d'un autre processus) aux valeurs du registre"""
+        with self._lock:
+            for nom, labels, valeur in instantane['compteurs']:
+                cle = (nom, tuple(tuple(paire) for paire in labels))
+                self.compteurs[cle] = self.compteurs.get(cle, 0) + valeur
+            for nom, labels, serie in instantane['histogrammes']:
+                cle = (nom, tuple(tuple(paire) for paire in labels))
+                existante = self.histogrammes.get(cle)
+                if existante is None:
+                    self.histogrammes[cle] = list(serie)
+                else:
+                    for index, valeur in enumerate(serie):
+                        existante[index] += valeur
+
+
+registre = Registre()
+
+# Valeurs cumulées des workers terminés, avec la liste des instantanés
+# déjà absorbés (ignorés par agreger s'ils n'ont pas encore disparu)
+ARCHIVE = 'archive.json'
+
+# Fichier d'instantané et thread d'écriture du processus courant
+_fichier = {'chemin': None, 'pid': None, 'modifications': 0}
+
+
+def reinitialiser():
+    """Repart d'un registre vide (après un fork: rien n'est hérité du master)"""
+    global registre
+    registre = Registre()
+    _fichier.update(chemin=None, pid=None, modifications=0)
+
+
+def enregistrer(repertoire):
+    """Écrit l'instantané du processus dans son fichier de `repertoire`"""
+    if _fichier['chemin'] is None:
+        # pid + date de démarrage: un pid réutilisé n'écrase pas un ancien worker
+        _fichier['chemin'] = os.path.join(repertoire, f'{os.getpid()}-{time.time_ns()}.json')
+    temporaire = _fichier['chemin'] + '.tmp'
+    with open(temporaire, 'w', encoding='utf-8') as fichier:
+        json.dump(registre.instantane(), fichier)
+    os.replace(temporaire, _fichier['chemin'])
+
+
+def _demarrer_ecriture(repertoire, periode):
+    """Thread (un par processus) qui réécrit l'instantané quand il a changé"""
+    if _fichier['pid'] == os.getpid():
+        return
+    _fichier['pid'] = os.getpid()
+
+    def ecrire():
+        while True:
+            time.sleep(periode)
+            modifications = registre.modifications
+            if modifications != _fichier['modifications']:
+                enregistrer(repertoire)
+                _fichier['modifications'] = modifications
+
+    threading.Thread(target=ecrire, name='metriques', daemon=True).start()
+
+
+def vider_repertoire(repertoire):
+    """Supprime les instantanés d'une exécution précédente (démarrage du master)"""
+    os.makedirs(repertoire, exist_ok=True)
+    for chemin in glob.glob(os.path.join(repertoire, '*.json')):
+        os.remove(chemin)
+
+
+def _lire_json(chemin):
+    try:
+        with open(chemin, encoding='utf-8') as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        # Fichier en cours de remplacement ou supprimé
+        return None
+
+
+def archiver_processus(repertoire, pid):
+    """
+    Ajoute les instantanés du processus `pid` (terminé) à l'archive puis
+    les supprime. Appelé par le master gunicorn (child_exit).
+    """
+    instantanes = glob.glob(os.path.join(repertoire, f'{pid}-*.json'))
+    if not instantanes:
+        return
+    descripteur = os.open(os.path.join(repertoire, 'archive.lock'), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(descripteur, fcntl.LOCK_EX)
+        chemin_archive = os.path.join(repertoire, ARCHIVE)
+        archive = _lire_json(chemin_archive) or {'compteurs': [], 'histogrammes': [], 'absorbes': []}
+        total = Registre()
+        total.fusionner(archive)
+        for chemin in instantanes:
+            instantane = _lire_json(chemin)
+            if instantane is not None:
+                total.fusionner(instantane)
+        absorbes = [nom for nom in archive['absorbes'] if os.path.exists(os.path.join(repertoire, nom))]
+        absorbes += [os.path.basename(chemin) for chemin in instantanes]
+
+        # L'archive (qui nomme les instantanés absorbés) est publiée avant
+        # leur suppression: un relevé concurrent ne compte rien deux fois
+        temporaire = chemin_archive + '.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            json.dump({**total.instantane(), 'absorbes': absorbes}, fichier)
+        os.replace(temporaire, chemin_archive)
+        for chemin in instantanes:
+            os.remove(chemin)
+    finally:
+        os.close(descripteur)
+
+
+def agreger(repertoire=None):
+    """Registre des valeurs de tous les workers (ou du seul processus courant)"""
+    if not repertoire:
+        return registre
+    enregistrer(repertoire)
+    instantanes = {}
+    for chemin in glob.glob(os.path.join(repertoire, '*.json')):
+        nom = os.path.basename(chemin)
+        if nom != ARCHIVE:
+            instantanes[nom] = _lire_json(chemin)
+    # Archive lue en dernier: un instantané absorbé entre-temps y figure
+    archive = _lire_json(os.path.join(repertoire, ARCHIVE))
+
+    total = Registre()
+    if archive is not None:
+        total.fusionner(archive)
+        for nom in archive['absorbes']:
+            instantanes.pop(nom, None)
+    for instantane in instantanes.values():
+        if instantane is not None:
+            total.fusionner(instantane)
+    return total
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_texte(labels, supplementaires=()):
+    paires = [*labels, *supplementaires]
+    if not paires:
+        return ''
+    return '{' + ','.join(f'{nom}="{_echapper(valeur)}"' for nom, valeur in paires) + '}'
+
+
+def exposer(valeurs):
+    """Texte d'exposition Prometheus (version 0.0.4) d'un registre"""
+    lignes = []
+    for nom, (type_metrique, aide, buckets) in METRIQUES.items():
+        lignes.append(f'# HELP {nom} {aide}')
+        lignes.append(f'# TYPE {nom} {type_metrique}')
+        if type_metrique == 'counter':
+            for (nom_serie, labels), valeur in sorted(valeurs.compteurs.items()):
+                if nom_serie == nom:
+                    lignes.append(f'{nom}{_labels_texte(labels)} {valeur}')
+            continue
+        for (nom_serie, labels), serie in sorted(valeurs.histogrammes.items()):
+            if nom_serie != nom:
+                continue
+            cumul = 0
+            for borne, compte in zip((*buckets, '+Inf'), serie[:-1]):
+                cumul += compte
+                lignes.append(f'{nom}_bucket{_labels_texte(labels, [("le", borne)])} {cumul}')
+            lignes.append(f'{nom}_sum{_labels_texte(labels)} {serie[-1]}')
+            lignes.append(f'{nom}_count{_labels_texte(labels)} {cumul}')
+    return '\n'.join(lignes) + '\n'
+
+
+def _endpoint():
+    return request.endpoint or 'aucun'
+
+
+def observer_pdf(duree):
+    """Enregistre la durée (s) d'un rendu PDF"""
+    registre.observer('routinerie_pdf_render_duration_seconds', {}, duree)
+
+
+def installer(app, engine):
+    """Mesure les requêtes HTTP et SQL de l'application"""
+    if not app.config['METRICS']:
+        return
+    repertoire = app.config['METRICS_DIR']
+    periode = app.config['METRICS_FLUSH_SECONDES']
+    if repertoire:
+        os.makedirs(repertoire, exist_ok=True)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_debuts_metrique', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+        duree = time.perf_counter() - conn.info['_debuts_metrique'].pop()
+        # Le travail hors requête (démarrage, CLI) n'est pas mesuré
+        if has_request_context():
+            registre.observer('routinerie_db_query_duration_seconds',
+                              {'endpoint': _endpoint()}, duree)
+
+    @event.listens_for(engine, 'handle_error')
+    def _erreur_execution(exception_context):
+        connexion = exception_context.connection
+        if connexion is not None and connexion.info.get('_debuts_metrique'):
+            connexion.info['_debuts_metrique'].pop()
+
+    @app.before_request
+    def _debut_requete():
+        g._debut_metrique = time.perf_counter()
+
+    @app.after_request
+    def _mesurer_requete(response):
+        debut = g.pop('_debut_metrique', None)
+        if debut is not None:
+            labels = {'endpoint': _endpoint(), 'method': request.method}
+            registre.observer('routinerie_http_request_duration_seconds', labels,
+                              time.perf_counter() - debut)
+            registre.incrementer('routinerie_http_requests_total',
+                                 {**labels, 'status': str(response.status_code)})
+        if repertoire:
+            _demarrer_ecriture(repertoire, periode)
+        return response
@@ -0,0 +1,188 @@
+"""
+Migrations versionnées du schéma SQLite.
+
+Chaque migration porte un numéro croissant; les numéros appliqués sont
+enregistrés dans la table schema_version et seules les migrations en
+attente sont exécutées, au démarrage de l'application (ou via
+`flask migrer`). Les tables ne sont jamais reconstruites: les migrations
+ajoutent colonnes et index, et restent idempotentes pour une base créée
+directement par db.create_all().
+
+Le numéro de la dernière migration est aussi écrit dans PRAGMA
+user_version (en-tête du fichier SQLite): au démarrage, une base à jour
+se vérifie par cette seule lecture, sans inspecter le schéma.
+"""
+from datetime import datetime
+import unicodedata
+
+from sqlalchemy import text
+
+from app import db
+
+# Colonnes ajoutées après la création initiale du schéma: (table, colonne, définition SQL)
+COLONNES_AJOUTEES = [
+    ('ingredient', 'categorie', "VARCHAR(50) NOT NULL DEFAULT 'Autre'"),
+    ('recette', 'categories_masque', 'INTEGER NOT NULL DEFAULT 0'),
+    ('recette', 'score_equilibre', 'INTEGER NOT NULL DEFAULT 0'),
+    ('ingredient', 'updated_at', 'DATETIME'),
+]
+
+
+def _colonnes(table):
+    return {ligne[1] for ligne in db.session.execute(text(f'PRAGMA table_info({table})'))}
+
+
+def _ajouter_colonnes():
+    from app.models import Recette
+
+    ajoutees = []
+    for table, colonne, definition in COLONNES_AJOUTEES:
+        if colonne not in _colonnes(table):
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {colonne} {definition}'))
+            ajoutees.append((table, colonne))
+
+    # Le masque d'équilibre doit être calculé pour les recettes existantes
+    if ('recette', 'categories_masque') in ajoutees:
+        Recette.recalculer_equilibre()
+
+
+def _creer_index_recherche():
+    from app import recherche
+    recherche.creer_index()
+
+
+# Menus en trop d'une case: tous sauf le plus ancien (celui qu'affichait le planning)
+_MENUS_EN_DOUBLE = 'FROM menu WHERE id NOT IN (SELECT MIN(id) FROM menu GROUP BY semaine, jour, moment)'
+
+
+def compter_menus_en_double():
+    return db.session.execute(text(f'SELECT COUNT(*) {_MENUS_EN_DOUBLE}')).scalar()
+
+
+def dedoublonner_menus():
+    """
+    Supprime les menus en double d'une même case en gardant le plus ancien
+    (préalable à la migration 3). Ne commite pas; retourne le nombre supprimé.
+    """
+    return db.session.execute(text(f'DELETE {_MENUS_EN_DOUBLE}')).rowcount
+
+
+def _creer_index_requetes():
+    # Une case du planning ne porte qu'un menu. Des menus en double ne sont
+    # jamais supprimés ici (au démarrage, sans sauvegarde): la migration
+    # échoue et `flask migrer --dedoublonner` les supprime après sauvegarde
+    if 'ix_menu_case' not in {ligne[1] for ligne in db.session.execute(text('PRAGMA index_list(menu)'))}:
+        doublons = compter_menus_en_double()
+        if doublons:
+            raise ValueError(f'{doublons} menu(s) en double: lancer `flask migrer --dedoublonner`')
+    db.session.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_menu_case ON menu (semaine, jour, moment)'))
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_recette_ingredient_recette ON recette_ingredient (recette_id)'))
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_recette_ingredient_ingredient ON recette_ingredient (ingredient_id)'))
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_ingredient_nom ON ingredient (nom)'))
+
+
+def _ajouter_version_menu():
+    if 'version' not in _colonnes('menu'):
+        db.session.execute(text('ALTER TABLE menu ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+
+
+def _creer_statistiques():
+    from app import statistiques
+    statistiques.creer_agregats()
+    # Parcours des recettes par (nom, id): l'index porte aussi le rowid (id)
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_recette_nom ON recette (nom)'))
+
+
+def _corriger_agregats_ingredients():
+    # Triggers de la migration 5: un ingrédient en double dans une recette
+    # était compté deux fois à l'ajout d'un menu et une fois au retrait
+    from app import statistiques
+    statistiques.recreer_triggers()
+
+
+def _sans_accents(texte):
+    return ''.join(c for c in unicodedata.normalize('NFD', texte) if not unicodedata.combining(c))
+
+
+def _normaliser_categories():
+    # Les catégories libres héritées (hors Ingredient.CATEGORIES) n'ont pas
+    # de bit dans le masque d'équilibre: elles sont ramenées à la catégorie
+    # connue de même nom (casse et accents ignorés), sinon à 'Autre'
+    from app.models import Ingredient, Recette
+
+    connues = {_sans_accents(categorie).casefold(): categorie for categorie in Ingredient.CATEGORIES}
+    inconnues = [categorie for (categorie,) in db.session.execute(text(
+        'SELECT DISTINCT categorie FROM ingredient')) if categorie not in Ingredient.CATEGORIES]
+    if not inconnues:
+        return
+    for categorie in inconnues:
+        cible = connues.get(_sans_accents(categorie or '').strip().casefold(), 'Autre')
+        db.session.execute(
+            text('UPDATE ingredient SET categorie = :cible WHERE categorie IS :categorie'),
+            {'cible': cible, 'categorie': categorie}
+        )
+    Recette.recalculer_equilibre()
+
+
+# (version, description, fonction); ne jamais renuméroter ni modifier une
+# migration publiée: en ajouter une nouvelle. Une base à jour ne passe plus
+# par db.create_all() au démarrage: un nouveau modèle a donc aussi besoin
+# d'une migration (qui peut simplement appeler db.create_all())
+MIGRATIONS = [
+    (1, 'Colonnes ajoutées depuis le schéma initial', _ajouter_colonnes),
+    (2, 'Index de recherche plein texte', _creer_index_recherche),
+    (3, 'Index du planning, des ingrédients de recette et des noms', _creer_index_requetes),
+    (4, 'Version des menus (verrouillage optimiste)', _ajouter_version_menu),
+    (5, "Agrégats d'usage par semaine et index des noms de recette", _creer_statistiques),
+    (6, "Ingrédients en double comptés une fois dans les agrégats d'usage", _corriger_agregats_ingredients),
+    (7, "Catégories d'ingrédients hors liste ramenées à une catégorie connue", _normaliser_categories),
+]
+
+VERSION_SCHEMA = MIGRATIONS[-1][0]
+
+
+def schema_a_jour():
+    """Vrai si la base a déjà reçu toutes les migrations (lecture de user_version)"""
+    return db.session.execute(text('PRAGMA user_version')).scalar() == VERSION_SCHEMA
+
+
+def versions_appliquees():
+    """Numéros des migrations déjà appliquées"""
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, '
+        'description VARCHAR(200) NOT NULL, '
+        'applied_at DATETIME NOT NULL)'
+    ))
+    return set(db.session.scalars(text('SELECT version FROM schema_version')))
+
+
+def migrer():
+    """
+    Applique les migrations en attente, dans l'ordre, avec un commit par
+    migration. Retourne la liste des (version, description) appliquées.
+    """
+    appliquees = versions_appliquees()
+    nouvelles = []
+    for version, description, migration in MIGRATIONS:
+        if version in appliquees:
+            continue
+        try:
+            migration()
+            db.session.execute(
+                text('INSERT INTO schema_version (version, description, applied_at) '
+                     'VALUES (:version, :description, :applied_at)'),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        nouvelles.append((version, description))
+    db.session.execute(text(f'PRAGMA user_version = {VERSION_SCHEMA}'))
+    db.session.commit()
+    return nouvelles
@@ -1,14 +1,20 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import joinedload
 from app import db
 
 class Ingredient(db.Model):
     """Modèle pour les ingrédients"""
     __tablename__ = 'ingredient'
+    __table_args__ = (
+        db.Index('ix_ingredient_nom', 'nom'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(100), nullable=False)
     unite = db.Column(db.String(20), nullable=False)  # kg, g, L, ml, pièce, etc.
     categorie = db.Column(db.String(50), nullable=False, default='Autre')  # Catégorie d'ingrédient
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relation avec RecetteIngredient
     recette_ingredients = db.relationship('RecetteIngredient', back_populates='ingredient', cascade='all, delete-orphan')
@@ -28,6 +34,25 @@ class Ingredient(db.Model):
         'Autre'
     ]
     
+    # Unités de mesure acceptées
+    UNITES = ['g', 'kg', 'ml', 'L', 'cl', 'pièce', 'cuillère', 'tasse', 'pincée', 'c. à soupe', 'c. à café']
+    
+    # Bit attribué à chaque catégorie (position dans CATEGORIES)
+    MASQUES_CATEGORIES = {categorie: 1 << index for index, categorie in enumerate(CATEGORIES)}
+    
+    @classmethod
+    def masque_categories(cls, categories):
+        """Convertit une liste de catégories en masque de bits"""
+        masque = 0
+        for categorie in categories:
+            masque |= cls.MASQUES_CATEGORIES.get(categorie, 0)
+        return masque
+    
+    @classmethod
+    def categories_du_masque(cls, masque):
+        """Convertit un masque de bits en liste de catégories (ordre de CATEGORIES)"""
+        return [categorie for categorie, bit in cls.MASQUES_CATEGORIES.items() if masque & bit]
+    
     def __repr__(self):
         return f'<Ingredient {self.nom}>'
 
@@ -35,6 +60,10 @@ class Ingredient(db.Model):
 class Recette(db.Model):
     """Modèle pour les recettes"""
     __tablename__ = 'recette'
+    __table_args__ = (
+        # Listes paginées et statistiques triées par (nom, id)
+        db.Index('ix_recette_nom', 'nom'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(200), nullable=False)
@@ -44,6 +73,10 @@ class Recette(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Équilibre précalculé, maintenu par recalculer_equilibre() à chaque écriture
+    categories_masque = db.Column(db.Integer, nullable=False, default=0)  # voir Ingredient.MASQUES_CATEGORIES
+    score_equilibre = db.Column(db.Integer, nullable=False, default=0)  # nombre de groupes présents (0-3)
+    
     # Relations
     recette_ingredients = db.relationship('RecetteIngredient', back_populates='recette', cascade='all, delete-orphan')
     menus = db.relationship('Menu', back_populates='recette')
@@ -56,6 +89,105 @@ class Recette(db.Model):
                 categories.add(ri.ingredient.categorie)
         return list(categories)
     
+    def appliquer_ingredients(self, ingredients):
+        """
+        Aligne les ingrédients de la recette sur `ingredients`, une liste de
+        dicts {ingredient_id, quantite, unite}, en n'écrivant que la
+        différence avec l'existant: insertions, mises à jour et suppressions
+        groupées, dans la transaction courante (sans commit).
+        Un même ingrédient n'apparaît qu'une fois (première occurrence).
+        Retourne True si des lignes ont été modifiées.
+        """
+        voulus = {}
+        for ing in ingredients:
+            voulus.setdefault(ing['ingredient_id'], (ing['quantite'], ing['unite']))
+        
+        existants = {}
+        a_supprimer = []
+        for ri_id, ingredient_id, quantite, unite in db.session.query(
+            RecetteIngredient.id,
+            RecetteIngredient.ingredient_id,
+            RecetteIngredient.quantite,
+            RecetteIngredient.unite
+        ).filter(RecetteIngredient.recette_id == self.id).order_by(RecetteIngredient.id):
+            if ingredient_id in voulus and ingredient_id not in existants:
+                existants[ingredient_id] = (ri_id, quantite, unite)
+            else:
+                a_supprimer.append(ri_id)
+        
+        a_inserer = []
+        a_modifier = []
+        for ingredient_id, (quantite, unite) in voulus.items():
+            if ingredient_id not in existants:
+                a_inserer.append({
+                    'recette_id': self.id,
+                    'ingredient_id': ingredient_id,
+                    'quantite': quantite,
+                    'unite': unite
+                })
+            elif existants[ingredient_id][1:] != (quantite, unite):
+                a_modifier.append({
+                    'id': existants[ingredient_id][0],
+                    'quantite': quantite,
+                    'unite': unite
+                })
+        
+        if a_supprimer:
+            db.session.execute(
+                delete(RecetteIngredient).where(RecetteIngredient.id.in_(a_supprimer)),
+                execution_options={'synchronize_session': False}
+            )
+        if a_modifier:
+            db.session.execute(update(RecetteIngredient), a_modifier)
+        if a_inserer:
+            db.session.execute(insert(RecetteIngredient), a_inserer)
+        
+        modifie = bool(a_supprimer or a_modifier or a_inserer)
+        if modifie:
+            # Écritures hors unité de travail: signaler le changement du catalogue
+            from app.catalogue import incrementer_version
+            incrementer_version(db.session.connection())
+            db.session.expire(self, ['recette_ingredients'])
+        return modifie
+    
+    @classmethod
+    def recalculer_equilibre(cls, recette_ids=None, taille_lot=500):
+        """
+        Recalcule categories_masque et score_equilibre des recettes données
+        (toutes si recette_ids vaut None). Ne commite pas la session.
+        Retourne le nombre de recettes mises à jour.
+        """
+        if recette_ids is None:
+            recette_ids = [recette_id for (recette_id,) in db.session.query(cls.id)]
+        masques = dict.fromkeys(recette_ids, 0)
+        ids = list(masques)
+        
+        for debut in range(0, len(ids), taille_lot):
+            lignes = db.session.query(
+                RecetteIngredient.recette_id,
+                Ingredient.categorie
+            ).join(
+                Ingredient, Ingredient.id == RecetteIngredient.ingredient_id
+            ).filter(
+                RecetteIngredient.recette_id.in_(ids[debut:debut + taille_lot])
+            ).distinct()
+            
+            for recette_id, categorie in lignes:
+                masques[recette_id] |= Ingredient.MASQUES_CATEGORIES.get(categorie, 0)
+        
+        if masques:
+            db.session.execute(update(cls), [{
+                'id': recette_id,
+                'categories_masque': masque,
+                'score_equilibre': Menu.score_masque(masque)
+            } for recette_id, masque in masques.items()])
+            # UPDATE hors unité de travail: les champs d'équilibre sont exposés
+            # par les API du catalogue (?fields=), leur version doit changer
+            from app.catalogue import incrementer_version
+            incrementer_version(db.session.connection())
+        
+        return len(masques)
+    
     def __repr__(self):
         return f'<Recette {self.nom}>'
 
@@ -63,6 +195,10 @@ class Recette(db.Model):
 class RecetteIngredient(db.Model):
     """Table de liaison entre Recette et Ingredient avec quantités"""
     __tablename__ = 'recette_ingredient'
+    __table_args__ = (
+        db.Index('ix_recette_ingredient_recette', 'recette_id'),
+        db.Index('ix_recette_ingredient_ingredient', 'ingredient_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     recette_id = db.Column(db.Integer, db.ForeignKey('recette.id'), nullable=False)
@@ -81,6 +217,10 @@ class RecetteIngredient(db.Model):
 class Menu(db.Model):
     """Modèle pour les menus de la semaine"""
     __tablename__ = 'menu'
+    __table_args__ = (
+        # Une seule case (semaine, jour, moment) par menu
+        db.Index('ix_menu_case', 'semaine', 'jour', 'moment', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     jour = db.Column(db.String(20), nullable=False)  # lundi, mardi, mercredi, jeudi, vendredi
@@ -90,15 +230,26 @@ class Menu(db.Model):
     description = db.Column(db.Text)  # optionnel si pas de recette associée
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incrémentée à chaque écriture: verrouillage optimiste des déplacements
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=db.literal_column('version + 1'))
     
     # Relation avec Recette
     recette = db.relationship('Recette', back_populates='menus')
     
+    # Cases de la grille hebdomadaire
+    JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi']
+    MOMENTS = ['midi', 'soir']
+    
     # Catégories importantes pour l'équilibre nutritionnel
     CATEGORIES_PROTEINES = ['Viandes', 'Poissons', 'Céréales & Féculents']
     CATEGORIES_LEGUMES = ['Légumes']
     CATEGORIES_FECULENTS = ['Céréales & Féculents']
     
+    MASQUE_PROTEINES = Ingredient.masque_categories(CATEGORIES_PROTEINES)
+    MASQUE_LEGUMES = Ingredient.masque_categories(CATEGORIES_LEGUMES)
+    MASQUE_FECULENTS = Ingredient.masque_categories(CATEGORIES_FECULENTS)
+    
     def analyser_equilibre(self):
         """
         Analyse l'équilibre nutritionnel du menu.
@@ -110,20 +261,50 @@ class Menu(db.Model):
         - 'desequilibre' (rouge): contient 0 ou 1 groupe
         """
         if not self.recette:
-            return {
-                'niveau': 'vide',
-                'score': 0,
-                'categories': [],
-                'manque': ['Protéines', 'Légumes', 'Féculents'],
-                'message': 'Aucune recette'
-            }
+            return self.analyse_vide()
         
         categories = self.recette.get_categories_presentes()
+        return self.evaluer_categories(categories)
+    
+    @staticmethod
+    def analyse_vide():
+        """Analyse d'un menu sans recette"""
+        return {
+            'niveau': 'vide',
+            'score': 0,
+            'categories': [],
+            'manque': ['Protéines', 'Légumes', 'Féculents'],
+            'message': 'Aucune recette'
+        }
+    
+    @classmethod
+    def score_masque(cls, masque):
+        """Nombre de groupes alimentaires présents dans un masque de catégories"""
+        return (bool(masque & cls.MASQUE_PROTEINES)
+                + bool(masque & cls.MASQUE_LEGUMES)
+                + bool(masque & cls.MASQUE_FECULENTS))
+    
+    @classmethod
+    def evaluer_categories(cls, categories):
+        """
+        Calcule l'analyse d'équilibre à partir de la liste des catégories
+        présentes dans la recette d'un menu (voir analyser_equilibre).
+        """
+        return cls.evaluer_masque(Ingredient.masque_categories(categories), categories)
+    
+    @classmethod
+    def evaluer_masque(cls, masque, categories=None):
+        """
+        Calcule l'analyse d'équilibre à partir d'un masque de catégories.
+        Si `categories` n'est pas fourni, il est déduit du masque.
+        """
+        if categories is None:
+            categories = Ingredient.categories_du_masque(masque)
         
         # Vérifier la présence des groupes alimentaires
-        a_proteines = any(cat in categories for cat in self.CATEGORIES_PROTEINES)
-        a_legumes = any(cat in categories for cat in self.CATEGORIES_LEGUMES)
-        a_feculents = any(cat in categories for cat in self.CATEGORIES_FECULENTS)
+        a_proteines = bool(masque & cls.MASQUE_PROTEINES)
+        a_legumes = bool(masque & cls.MASQUE_LEGUMES)
+        a_feculents = bool(masque & cls.MASQUE_FECULENTS)
         
         # Calculer le score (nombre de groupes présents)
         score = sum([a_proteines, a_legumes, a_feculents])
@@ -161,5 +342,92 @@ class Menu(db.Model):
             }
         }
     
+    @classmethod
+    def charger_grille(cls, debut, fin=None):
+        """
+        Charge en une seule requête les menus des semaines de `debut` à `fin`
+        (lundis inclus), avec leur recette et les catégories des ingrédients.
+        Retourne un dict {semaine: {jour: {moment: menu ou None}}}.
+        """
+        fin = fin or debut
+        
+        # Grille vide pour chaque semaine demandée
+        grille = {}
+        semaine = debut
+        while semaine <= fin:
+            grille[semaine] = {jour: {moment: None for moment in cls.MOMENTS} for jour in cls.JOURS}
+            semaine += timedelta(weeks=1)
+        
+        menus = cls.query.options(
+            joinedload(cls.recette)
+            .joinedload(Recette.recette_ingredients)
+            .joinedload(RecetteIngredient.ingredient)
+        ).filter(
+            cls.semaine >= debut,
+            cls.semaine <= fin
+        ).order_by(cls.id).all()
+        
+        for menu in menus:
+            cases = grille.get(menu.semaine)
+            # En cas de doublon sur une case, garder le premier menu créé
+            if cases is not None and menu.jour in cases and cases[menu.jour].get(menu.moment, False) is None:
+                cases[menu.jour][menu.moment] = menu
+        
+        return grille
+    
     def __repr__(self):
         return f'<Menu {self.jour} {self.moment}>'
+
+
+
+class CatalogueVersion(db.Model):
+    """
+    Version du catalogue (recettes et ingrédients), incrémentée à chaque
+    écriture. Une seule ligne (id=1), lue pour les réponses conditionnelles.
+    """
+    __tablename__ = 'catalogue_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CatalogueVersion {self.version}>'
+
+
+class UsageRecette(db.Model):
+    """
+    Nombre de cases du planning occupées par une recette, par semaine.
+    Tenu à jour par des triggers sur menu (voir app/statistiques.py).
+    """
+    __tablename__ = 'usage_recette'
+    __table_args__ = (
+        db.Index('ix_usage_recette_recette', 'recette_id', 'semaine'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    semaine = db.Column(db.Date, primary_key=True)
+    recette_id = db.Column(db.Integer, primary_key=True)
+    nb = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<UsageRecette {self.semaine} {self.recette_id}: {self.nb}>'
+
+
+class UsageIngredient(db.Model):
+    """
+    Nombre de cases du planning dont la recette contient un ingrédient, par
+    semaine. Tenu à jour par des triggers sur menu et recette_ingredient.
+    """
+    __tablename__ = 'usage_ingredient'
+    __table_args__ = (
+        db.Index('ix_usage_ingredient_ingredient', 'ingredient_id', 'semaine'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    semaine = db.Column(db.Date, primary_key=True)
+    ingredient_id = db.Column(db.Integer, primary_key=True)
+    nb = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<UsageIngredient {self.semaine} {self.ingredient_id}: {self.nb}>'
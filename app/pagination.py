@@ -0,0 +1,83 @@
+"""
+Pagination par curseur (keyset sur nom, id) et projection de champs.
+
+Les listes sont triées par (nom, id); le curseur encode le couple de la
+dernière ligne renvoyée et la page suivante reprend strictement après
+lui, sans OFFSET. Seules les colonnes demandées sont sélectionnées: les
+lignes ne sont jamais hydratées en objets du modèle.
+"""
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+from app import db
+from app.models import Recette, Ingredient
+
+# Champs exposables par modèle et champs renvoyés par défaut
+CHAMPS = {
+    Recette: ('id', 'nom', 'description', 'temps_preparation', 'portions', 'score_equilibre'),
+    Ingredient: ('id', 'nom', 'categorie', 'unite'),
+}
+
+
+def encoder_curseur(nom, id):
+    """Curseur opaque désignant la ligne (nom, id)"""
+    brut = json.dumps([nom, id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(brut).decode('ascii').rstrip('=')
+
+
+def decoder_curseur(curseur):
+    """Retourne (nom, id) depuis un curseur; lève ValueError s'il est invalide"""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        nom, id = json.loads(brut.decode('utf-8'))
+    except Exception:
+        raise ValueError('Curseur invalide')
+    if not isinstance(nom, str) or not isinstance(id, int):
+        raise ValueError('Curseur invalide')
+    return nom, id
+
+
+def lire_champs(modele, parametre, defaut):
+    """
+    Liste des champs demandés via `fields=a,b,c` (défaut si absent).
+    Lève ValueError si un champ n'est pas exposable.
+    """
+    if not parametre:
+        return list(defaut)
+    champs = [champ.strip() for champ in parametre.split(',') if champ.strip()]
+    inconnus = [champ for champ in champs if champ not in CHAMPS[modele]]
+    if inconnus or not champs:
+        raise ValueError(f'Champs invalides: {", ".join(inconnus)}')
+    return champs
+
+
+def page(modele, champs, curseur=None, limite=50):
+    """
+    Renvoie (lignes, curseur suivant) pour une page de `limite` éléments
+    triés par (nom, id). Chaque ligne est un dict limité à `champs`.
+    Le curseur suivant vaut None sur la dernière page; avec `limite` None,
+    toute la liste (à partir du curseur) est renvoyée.
+    """
+    # nom et id sont toujours lus pour construire le curseur
+    selection = list(dict.fromkeys([*champs, 'nom', 'id']))
+    requete = db.session.query(
+        *[getattr(modele, champ) for champ in selection]
+    ).order_by(modele.nom, modele.id)
+
+    if curseur:
+        nom, id = decoder_curseur(curseur)
+        requete = requete.filter(tuple_(modele.nom, modele.id) > tuple_(nom, id))
+
+    if limite is None:
+        return [{champ: getattr(ligne, champ) for champ in champs} for ligne in requete], None
+
+    lignes = requete.limit(limite + 1).all()
+
+    suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        suivant = encoder_curseur(lignes[-1].nom, lignes[-1].id)
+
+    return [{champ: getattr(ligne, champ) for champ in champs} for ligne in lignes], suivant
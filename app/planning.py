@@ -0,0 +1,314 @@
+"""
+Écritures groupées sur le planning des menus.
+
+- appliquer_lot: remplit ou vide n'importe quel nombre de cases, sur une
+  ou plusieurs semaines, en une transaction (un UPSERT SQLite sur l'index
+  unique de la case pour les remplissages, un DELETE pour les effacements).
+- copier_semaines: duplique ou décale une plage de semaines vers une autre
+  avec un nombre fixe d'instructions, quel que soit le nombre de cases.
+- deplacer_menu: déplace un menu (ou échange deux cases) par un UPDATE
+  conditionné à la version des menus: une écriture concurrente est
+  détectée (ConflitMenu) au lieu d'être écrasée, sans verrou applicatif.
+
+Les fonctions valident tout avant d'écrire, lèvent ValueError sur une
+entrée invalide et ne commitent pas.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert
+
+from app import db
+from app.models import Menu, Recette
+
+# Nombre maximal de cases par lot et de semaines par copie
+MAX_OPERATIONS = 1000
+MAX_SEMAINES = 12
+
+_table = Menu.__table__
+
+
+class ConflitMenu(Exception):
+    """Un des menus a changé depuis sa lecture par le client"""
+
+    def __init__(self, message, menus):
+        super().__init__(message)
+        self.menus = menus
+
+
+def lire_semaine(valeur):
+    """Lundi de la semaine contenant la date 'AAAA-MM-JJ' (ValueError sinon)"""
+    try:
+        jour = datetime.strptime(valeur or '', '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        raise ValueError('Format de date invalide')
+    return jour - timedelta(days=jour.weekday())
+
+
+def _verifier_recettes(recette_ids):
+    """Lève ValueError si une des recettes n'existe pas"""
+    if not recette_ids:
+        return
+    existantes = set(db.session.scalars(select(Recette.id).where(Recette.id.in_(recette_ids))))
+    inconnues = sorted(set(recette_ids) - existantes)
+    if inconnues:
+        raise ValueError(f'Recette(s) inconnue(s): {", ".join(map(str, inconnues))}')
+
+
+def _upsert(lignes):
+    """Insère les cases ou remplace le contenu de celles déjà occupées"""
+    instruction = insert(_table)
+    db.session.execute(
+        instruction.on_conflict_do_update(
+            index_elements=[_table.c.semaine, _table.c.jour, _table.c.moment],
+            set_={
+                'recette_id': instruction.excluded.recette_id,
+                'description': instruction.excluded.description,
+                'updated_at': instruction.excluded.updated_at,
+                # ON CONFLICT n'applique pas les onupdate de la colonne
+                'version': _table.c.version + 1,
+            }
+        ),
+        lignes
+    )
+
+
+def appliquer_lot(operations):
+    """
+    Applique une liste d'opérations {semaine, jour, moment, recette_id,
+    description}: une case sans recette ni description est vidée, les
+    autres sont créées ou remplacées. Si une même case apparaît plusieurs
+    fois, la dernière opération l'emporte.
+    Retourne {'remplis': n, 'vides': n}.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('Aucune opération')
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f'Au plus {MAX_OPERATIONS} opérations par lot')
+
+    cases = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f'Opération {index}: objet attendu')
+        jour = operation.get('jour')
+        moment = operation.get('moment')
+        if jour not in Menu.JOURS or moment not in Menu.MOMENTS:
+            raise ValueError(f'Opération {index}: jour ou moment invalide')
+        try:
+            semaine = lire_semaine(operation.get('semaine'))
+        except ValueError as e:
+            raise ValueError(f'Opération {index}: {e}')
+        recette_id = operation.get('recette_id')
+        if recette_id is not None and (isinstance(recette_id, bool) or not isinstance(recette_id, int)):
+            raise ValueError(f'Opération {index}: recette invalide')
+        description = operation.get('description')
+        if description is not None and not isinstance(description, str):
+            raise ValueError(f'Opération {index}: description invalide')
+        cases[(semaine, jour, moment)] = (recette_id, (description or '').strip() or None)
+
+    _verifier_recettes({recette_id for recette_id, _ in cases.values() if recette_id is not None})
+
+    maintenant = datetime.utcnow()
+    a_remplir = [
+        {'semaine': semaine, 'jour': jour, 'moment': moment, 'recette_id': recette_id,
+         'description': description, 'created_at': maintenant, 'updated_at': maintenant}
+        for (semaine, jour, moment), (recette_id, description) in cases.items()
+        if recette_id is not None or description
+    ]
+    a_vider = [cle for cle, (recette_id, description) in cases.items()
+               if recette_id is None and not description]
+
+    if a_remplir:
+        _upsert(a_remplir)
+    if a_vider:
+        db.session.execute(
+            delete(Menu)
+            .where(tuple_(Menu.semaine, Menu.jour, Menu.moment).in_(a_vider))
+            .execution_options(synchronize_session=False)
+        )
+    return {'remplis': len(a_remplir), 'vides': len(a_vider)}
+
+
+def copier_semaines(source_debut, source_fin, cible_debut, deplacer=False, remplacer=True):
+    """
+    Copie les menus des semaines `source_debut`..`source_fin` (lundis) vers
+    les semaines commençant à `cible_debut`, en conservant jours et moments.
+    - remplacer: les semaines cibles sont d'abord vidées (copie exacte);
+      sinon seules leurs cases libres sont remplies.
+    - deplacer: les semaines sources qui ne sont pas aussi cibles sont
+      vidées ensuite (décalage du planning). Sans remplacer, seuls les
+      menus effectivement copiés quittent leur case: ceux dont la case
+      cible était occupée restent en place et sont signalés.
+    Les plages peuvent se chevaucher. Retourne {'copies': n, 'semaines': n,
+    'ignores': [{semaine, jour, moment}]} (cases sources non copiées).
+    """
+    if source_fin < source_debut:
+        raise ValueError('Plage de semaines invalide')
+    nb_semaines = (source_fin - source_debut).days // 7 + 1
+    if nb_semaines > MAX_SEMAINES:
+        raise ValueError(f'Au plus {MAX_SEMAINES} semaines par copie')
+    decalage = cible_debut - source_debut
+    if not decalage:
+        raise ValueError('Les semaines source et cible sont identiques')
+    cible_fin = source_fin + decalage
+
+    # Contenu source lu avant toute écriture (plages qui se chevauchent)
+    sources = db.session.execute(
+        select(Menu.semaine, Menu.jour, Menu.moment, Menu.recette_id, Menu.description)
+        .where(Menu.semaine.between(source_debut, source_fin))
+    ).all()
+
+    if remplacer:
+        db.session.execute(
+            delete(Menu).where(Menu.semaine.between(cible_debut, cible_fin))
+            .execution_options(synchronize_session=False)
+        )
+    if deplacer and remplacer:
+        db.session.execute(
+            delete(Menu)
+            .where(Menu.semaine.between(source_debut, source_fin))
+            .where(~Menu.semaine.between(cible_debut, cible_fin))
+            .execution_options(synchronize_session=False)
+        )
+
+    maintenant = datetime.utcnow()
+    lignes = [
+        {'semaine': semaine + decalage, 'jour': jour, 'moment': moment, 'recette_id': recette_id,
+         'description': description, 'created_at': maintenant, 'updated_at': maintenant}
+        for semaine, jour, moment, recette_id, description in sources
+    ]
+    if not lignes:
+        return {'copies': 0, 'semaines': nb_semaines, 'ignores': []}
+    if remplacer:
+        _upsert(lignes)
+        return {'copies': len(lignes), 'semaines': nb_semaines, 'ignores': []}
+
+    # Cases libres seulement: RETURNING donne les cases réellement remplies
+    copiees = set(db.session.execute(
+        insert(_table)
+        .on_conflict_do_nothing(index_elements=[_table.c.semaine, _table.c.jour, _table.c.moment])
+        .returning(_table.c.semaine, _table.c.jour, _table.c.moment),
+        lignes
+    ).tuples().all())
+    if deplacer:
+        a_vider = [(semaine - decalage, jour, moment) for semaine, jour, moment in copiees
+                   if not cible_debut <= semaine - decalage <= cible_fin]
+        for debut in range(0, len(a_vider), 500):
+            db.session.execute(
+                delete(Menu)
+                .where(tuple_(Menu.semaine, Menu.jour, Menu.moment).in_(a_vider[debut:debut + 500]))
+                .execution_options(synchronize_session=False)
+            )
+
+    ignores = [
+        {'semaine': semaine.isoformat(), 'jour': jour, 'moment': moment}
+        for semaine, jour, moment, _, _ in sources
+        if (semaine + decalage, jour, moment) not in copiees
+    ]
+    return {'copies': len(copiees), 'semaines': nb_semaines, 'ignores': ignores}
+
+
+def etat_cases(semaine, cases):
+    """État courant des cases [(jour, moment)] d'une semaine (None si vide)"""
+    menus = {
+        (menu.jour, menu.moment): menu
+        for menu in db.session.execute(
+            select(Menu.id, Menu.jour, Menu.moment, Menu.recette_id, Menu.description, Menu.version)
+            .where(Menu.semaine == semaine)
+            .where(tuple_(Menu.jour, Menu.moment).in_(cases))
+        )
+    }
+    etat = []
+    for jour, moment in cases:
+        menu = menus.get((jour, moment))
+        etat.append({
+            'semaine': semaine.isoformat(),
+            'jour': jour,
+            'moment': moment,
+            'menu': None if menu is None else {
+                'id': menu.id,
+                'recette_id': menu.recette_id,
+                'description': menu.description,
+                'version': menu.version,
+            }
+        })
+    return etat
+
+
+def deplacer_menu(menu_id, jour, moment, version=None, version_cible=None, verifier_cible=False):
+    """
+    Déplace le menu `menu_id` vers la case (jour, moment) de sa semaine, ou
+    échange le contenu des deux cases si elle est occupée, en un seul
+    UPDATE conditionné aux versions attendues. `version` et
+    `version_cible` sont les versions vues par le client (par défaut celles
+    lues ici); avec `verifier_cible`, une case cible attendue vide
+    (version_cible None) doit l'être encore.
+    Lève LookupError si le menu n'existe pas et ConflitMenu (avec l'état
+    courant des deux cases) si une écriture concurrente est passée avant.
+    Ne commite pas.
+    """
+    menu = db.session.execute(
+        select(Menu.id, Menu.semaine, Menu.jour, Menu.moment, Menu.recette_id,
+               Menu.description, Menu.version).where(Menu.id == menu_id)
+    ).first()
+    if menu is None:
+        raise LookupError('Menu non trouvé')
+
+    cases = [(menu.jour, menu.moment), (jour, moment)]
+
+    def conflit():
+        db.session.rollback()
+        return ConflitMenu('Le planning a été modifié entre-temps', etat_cases(menu.semaine, cases))
+
+    if version is None:
+        version = menu.version
+    if version != menu.version:
+        raise conflit()
+    if (menu.jour, menu.moment) == (jour, moment):
+        return
+
+    cible = db.session.execute(
+        select(Menu.id, Menu.recette_id, Menu.description, Menu.version)
+        .where(Menu.semaine == menu.semaine, Menu.jour == jour, Menu.moment == moment)
+    ).first()
+
+    maintenant = datetime.utcnow()
+    if cible is None:
+        if verifier_cible and version_cible is not None:
+            raise conflit()
+        instruction = (
+            update(Menu)
+            .where(Menu.id == menu.id, Menu.version == version)
+            .values(jour=jour, moment=moment, updated_at=maintenant, version=Menu.version + 1)
+        )
+        attendues = 1
+    else:
+        if version_cible is None:
+            if verifier_cible:
+                raise conflit()
+            version_cible = cible.version
+        # Échange des contenus: les valeurs lues ne sont écrites que si
+        # aucune des deux lignes n'a changé de version depuis
+        instruction = (
+            update(Menu)
+            .where(or_(
+                (Menu.id == menu.id) & (Menu.version == version),
+                (Menu.id == cible.id) & (Menu.version == version_cible),
+            ))
+            .values(
+                recette_id=case((Menu.id == menu.id, cible.recette_id), else_=menu.recette_id),
+                description=case((Menu.id == menu.id, cible.description), else_=menu.description),
+                updated_at=maintenant,
+                version=Menu.version + 1,
+            )
+        )
+        attendues = 2
+
+    try:
+        resultat = db.session.execute(instruction.execution_options(synchronize_session=False))
+    except IntegrityError:
+        # La case cible a été occupée entre la lecture et l'écriture
+        raise conflit()
+    if resultat.rowcount != attendues:
+        raise conflit()
@@ -0,0 +1,114 @@
+"""
+Recherche plein texte des recettes et ingrédients (SQLite FTS5).
+
+Deux index à contenu externe, recette_fts (nom, description) et
+ingredient_fts (nom), sont tenus à jour par des triggers SQLite: toute
+écriture sur les tables sources, ORM ou SQL brut, est répercutée dans la
+même transaction. Le tokenizer unicode61 avec remove_diacritics rend la
+recherche insensible aux accents ("epinard" trouve "Épinards") et chaque
+mot saisi est cherché comme préfixe.
+"""
+import re
+
+from sqlalchemy import text
+
+from app import db
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+INDEX = {
+    'recette_fts': ('recette', ['nom', 'description']),
+    'ingredient_fts': ('ingredient', ['nom']),
+}
+
+# Poids BM25 des colonnes indexées (le nom compte plus que la description)
+POIDS_RECETTE = (10.0, 1.0)
+
+LIMITE_MAX = 50
+
+_MOT = re.compile(r'\w+', re.UNICODE)
+
+
+def _ddl_index(index, table, colonnes):
+    """Instructions de création d'un index FTS5 et de ses triggers"""
+    cols = ', '.join(colonnes)
+    new_cols = ', '.join(f'new.{c}' for c in colonnes)
+    old_cols = ', '.join(f'old.{c}' for c in colonnes)
+    supprimer = (f"INSERT INTO {index}({index}, rowid, {cols}) "
+                 f"VALUES ('delete', old.id, {old_cols});")
+    inserer = f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new_cols});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', "
+        f"tokenize='{TOKENIZER}', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN {inserer} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN {supprimer} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} "
+        f"BEGIN {supprimer} {inserer} END",
+    ]
+
+
+def creer_index():
+    """
+    Crée les index de recherche et leurs triggers s'ils n'existent pas,
+    puis les remplit à partir des tables existantes. Ne commite pas.
+    """
+    existants = {nom for (nom,) in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'"
+    ))}
+    for index, (table, colonnes) in INDEX.items():
+        if index in existants:
+            continue
+        for instruction in _ddl_index(index, table, colonnes):
+            db.session.execute(text(instruction))
+        db.session.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+
+def reconstruire_index():
+    """Reconstruit entièrement les index à partir des tables sources"""
+    for index in INDEX:
+        db.session.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+
+def requete_fts(saisie):
+    """
+    Convertit une saisie utilisateur en requête FTS5: chaque mot devient un
+    préfixe entre guillemets (aucune syntaxe FTS n'est interprétée).
+    Retourne None si la saisie ne contient aucun mot.
+    """
+    mots = _MOT.findall(saisie or '')
+    if not mots:
+        return None
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+def rechercher_recettes(saisie, limite=10):
+    """Recettes correspondant à la saisie, les plus pertinentes d'abord"""
+    requete = requete_fts(saisie)
+    if requete is None:
+        return []
+    lignes = db.session.execute(text(
+        "SELECT r.id, r.nom, r.description FROM recette_fts "
+        "JOIN recette r ON r.id = recette_fts.rowid "
+        "WHERE recette_fts MATCH :requete "
+        f"ORDER BY bm25(recette_fts, {POIDS_RECETTE[0]}, {POIDS_RECETTE[1]}), r.nom "
+        "LIMIT :limite"
+    ), {'requete': requete, 'limite': limite})
+    return [{'id': id, 'nom': nom, 'description': description}
+            for id, nom, description in lignes]
+
+
+def rechercher_ingredients(saisie, limite=10):
+    """Ingrédients correspondant à la saisie, les plus pertinents d'abord"""
+    requete = requete_fts(saisie)
+    if requete is None:
+        return []
+    lignes = db.session.execute(text(
+        "SELECT i.id, i.nom, i.categorie FROM ingredient_fts "
+        "JOIN ingredient i ON i.id = ingredient_fts.rowid "
+        "WHERE ingredient_fts MATCH :requete "
+        "ORDER BY bm25(ingredient_fts), i.nom "
+        "LIMIT :limite"
+    ), {'requete': requete, 'limite': limite})
+    return [{'id': id, 'nom': nom, 'categorie': categorie}
+            for id, nom, categorie in lignes]
@@ -0,0 +1,308 @@
+"""
+Rendus PDF en arrière-plan (travaux d'export de listes de courses).
+
+La requête HTTP agrège la liste (SQL, rapide) puis confie le rendu
+ReportLab, coûteux en CPU, à un pool de processus: le worker gunicorn est
+aussitôt libéré et répond avec un identifiant de travail.
+
+L'état des travaux vit dans un répertoire partagé (PDF_TRAVAUX_DIR), un
+fichier JSON par travail à côté du PDF produit: avec plusieurs workers
+gunicorn, le suivi, le téléchargement et l'annulation fonctionnent quel
+que soit le worker qui reçoit la requête.
+
+- Concurrence bornée pour toute la machine: un rendu doit d'abord
+  verrouiller l'un des PDF_RENDUS_MAX fichiers de place (flock), et les
+  processus de rendu tournent avec une priorité abaissée (nice) pour que
+  les requêtes interactives gardent leur latence.
+- Un seul processus de rendu par worker gunicorn, créé au premier
+  export: la machine compte au plus autant de processus de rendu que de
+  workers, dont min(workers, PDF_RENDUS_MAX) rendent en même temps; les
+  autres attendent une place en la sondant toutes les ATTENTE_PLACE s.
+- File bornée par worker (PDF_FILE_MAX travaux non terminés): au-delà,
+  la demande est refusée plutôt que mise en attente sans limite.
+- Annulation: le travail est marqué annulé; il est retiré de la file s'il
+  n'a pas commencé, sinon son résultat est jeté.
+- Les travaux et leurs fichiers sont supprimés PDF_TRAVAUX_TTL secondes
+  après leur création: un travail expiré est introuvable dès son
+  expiration, et les travaux expirés sont purgés à chaque soumission et
+  au plus toutes les PURGE_PERIODE secondes lors des lectures.
+- Chaque changement d'état se fait sous le verrou (flock) du travail:
+  une annulation ne peut pas être écrasée par la fin d'un rendu, et un
+  travail terminé a toujours son PDF.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import fcntl
+import glob
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+EN_ATTENTE = 'en_attente'
+EN_COURS = 'en_cours'
+TERMINE = 'termine'
+ERREUR = 'erreur'
+ANNULE = 'annule'
+FINAUX = (TERMINE, ERREUR, ANNULE)
+
+# Attente entre deux tentatives de prise d'une place de rendu (s)
+ATTENTE_PLACE = 0.05
+
+# Intervalle minimal entre deux purges déclenchées par des lectures (s)
+PURGE_PERIODE = 60
+
+
+class FilePleine(Exception):
+    """Trop de travaux en attente dans ce processus"""
+
+
+# Pool et travaux soumis par le processus courant
+_etat = {'pool': None, 'pid': None, 'purge': 0.0}
+_futures = {}
+_lock = threading.Lock()
+
+
+def _chemin(repertoire, travail_id, extension):
+    return os.path.join(repertoire, f'{travail_id}.{extension}')
+
+
+def _ecrire(repertoire, travail_id, donnees):
+    """Écrit l'état du travail (remplacement atomique)"""
+    chemin = _chemin(repertoire, travail_id, 'json')
+    temporaire = f'{chemin}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporaire, 'w', encoding='utf-8') as fichier:
+        json.dump(donnees, fichier)
+    os.replace(temporaire, chemin)
+
+
+@contextmanager
+def _verrou(repertoire, travail_id):
+    """Verrou exclusif (flock) des changements d'état du travail, entre processus"""
+    descripteur = os.open(_chemin(repertoire, travail_id, 'lock'), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(descripteur, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(descripteur)
+
+
+def _lire_fichier(repertoire, travail_id):
+    try:
+        with open(_chemin(repertoire, travail_id, 'json'), encoding='utf-8') as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        return None
+
+
+def _supprimer(repertoire, travail_id):
+    """Supprime l'état, le PDF et le verrou du travail"""
+    for extension in ('json', 'pdf', 'lock'):
+        try:
+            os.remove(_chemin(repertoire, travail_id, extension))
+        except FileNotFoundError:
+            pass
+
+
+def lire(repertoire, travail_id):
+    """État du travail, ou None s'il n'existe pas (ou plus: expiré)"""
+    if not travail_id.isalnum():
+        return None
+    maintenant = time.time()
+    if maintenant - _etat['purge'] >= PURGE_PERIODE:
+        _etat['purge'] = maintenant
+        purger(repertoire)
+    etat = _lire_fichier(repertoire, travail_id)
+    if etat is not None and etat.get('expire', 0) < maintenant:
+        _supprimer(repertoire, travail_id)
+        return None
+    return etat
+
+
+def _mettre_a_jour(repertoire, travail_id, **valeurs):
+    """
+    Met à jour l'état du travail, sauf s'il est déjà final (annulé entre-temps).
+    À appeler sous le verrou du travail.
+    Retourne le nouvel état, ou None si rien n'a été écrit.
+    """
+    etat = lire(repertoire, travail_id)
+    if etat is None or etat['statut'] in FINAUX:
+        return None
+    etat.update(valeurs)
+    _ecrire(repertoire, travail_id, etat)
+    return etat
+
+
+def chemin_pdf(repertoire, travail_id):
+    return _chemin(repertoire, travail_id, 'pdf')
+
+
+def _prendre_place(repertoire, places):
+    """Verrouille l'une des `places` de rendu de la machine (attend qu'une se libère)"""
+    while True:
+        for index in range(places):
+            descripteur = os.open(os.path.join(repertoire, f'place-{index}.lock'),
+                                  os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(descripteur, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return descripteur
+            except BlockingIOError:
+                os.close(descripteur)
+        time.sleep(ATTENTE_PLACE)
+
+
+def _initialiser_processus():
+    """Processus de rendu moins prioritaires que les workers HTTP"""
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+def _rendre(repertoire, travail_id, places, debut, fin, lignes):
+    """
+    Exécuté dans un processus du pool: attend une place, rend le PDF dans
+    son fichier puis marque le travail terminé. Retourne la durée du rendu
+    (s), ou None si le travail a été annulé avant.
+    """
+    from app.export_pdf import rendre_liste_courses
+
+    descripteur = _prendre_place(repertoire, places)
+    try:
+        with _verrou(repertoire, travail_id):
+            if _mettre_a_jour(repertoire, travail_id, statut=EN_COURS, debut_rendu=time.time()) is None:
+                return None
+        debut_rendu = time.perf_counter()
+        pdf = rendre_liste_courses(debut, fin, lignes)
+        duree = time.perf_counter() - debut_rendu
+
+        chemin = chemin_pdf(repertoire, travail_id)
+        with open(f'{chemin}.tmp', 'wb') as fichier:
+            fichier.write(pdf)
+        # PDF publié et statut TERMINE ensemble, ou pas du tout (annulé ou
+        # expiré pendant le rendu: le résultat est jeté)
+        with _verrou(repertoire, travail_id):
+            etat = lire(repertoire, travail_id)
+            if etat is None or etat['statut'] in FINAUX:
+                os.remove(f'{chemin}.tmp')
+                return None
+            os.replace(f'{chemin}.tmp', chemin)
+            _mettre_a_jour(repertoire, travail_id, statut=TERMINE, taille=len(pdf),
+                           duree=round(duree, 3), fin_rendu=time.time())
+        return duree
+    finally:
+        os.close(descripteur)
+
+
+def _pool(config):
+    """Pool de rendu du processus courant, créé au premier travail (jamais hérité d'un fork)"""
+    if _etat['pid'] != os.getpid():
+        _futures.clear()
+        _etat['pool'] = ProcessPoolExecutor(
+            # Un processus par worker: PDF_RENDUS_MAX borne la machine, pas
+            # le worker (des processus en plus ne feraient qu'attendre une place)
+            max_workers=1,
+            # spawn: un fork d'un worker à plusieurs threads peut hériter de verrous pris
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_initialiser_processus,
+        )
+        _etat['pid'] = os.getpid()
+    return _etat['pool']
+
+
+def purger(repertoire):
+    """Supprime les travaux expirés (état, PDF et verrou)"""
+    maintenant = time.time()
+    for chemin in glob.glob(os.path.join(repertoire, '*.json')):
+        try:
+            with open(chemin, encoding='utf-8') as fichier:
+                expire = json.load(fichier).get('expire', 0)
+        except (OSError, ValueError):
+            continue
+        if expire < maintenant:
+            _supprimer(repertoire, os.path.basename(chemin)[:-len('.json')])
+    # Verrous restés sans travail (travail supprimé pendant qu'un verrou était pris)
+    for chemin in glob.glob(os.path.join(repertoire, '*.lock')):
+        try:
+            orphelin = not os.path.exists(chemin[:-len('.lock')] + '.json') \
+                and os.path.getmtime(chemin) < maintenant - PURGE_PERIODE
+            if orphelin and not os.path.basename(chemin).startswith('place-'):
+                os.remove(chemin)
+        except OSError:
+            continue
+
+
+def soumettre(config, debut, fin, lignes, au_termine=None):
+    """
+    Crée un travail de rendu de la liste de courses `lignes` (période du
+    lundi `debut` au dimanche `fin`) et le soumet au pool. `au_termine`
+    reçoit la durée du rendu une fois celui-ci terminé. Lève FilePleine si
+    PDF_FILE_MAX travaux de ce processus ne sont pas terminés.
+    Retourne l'état initial du travail.
+    """
+    repertoire = config['PDF_TRAVAUX_DIR']
+    os.makedirs(repertoire, exist_ok=True)
+    purger(repertoire)
+
+    with _lock:
+        pool = _pool(config)
+        for travail_id in [cle for cle, future in _futures.items() if future.done()]:
+            del _futures[travail_id]
+        if len(_futures) >= config['PDF_FILE_MAX']:
+            raise FilePleine('Trop d\'exports PDF en attente')
+
+        travail_id = uuid.uuid4().hex
+        etat = {
+            'id': travail_id,
+            'statut': EN_ATTENTE,
+            'debut': debut.isoformat(),
+            'fin': fin.isoformat(),
+            'cree': time.time(),
+            'expire': time.time() + config['PDF_TRAVAUX_TTL'],
+        }
+        _ecrire(repertoire, travail_id, etat)
+        future = pool.submit(_rendre, repertoire, travail_id, config['PDF_RENDUS_MAX'],
+                             debut, fin, lignes)
+        _futures[travail_id] = future
+
+    def termine(future):
+        if future.cancelled():
+            return
+        erreur = future.exception()
+        if erreur is not None:
+            # Processus de rendu tombé ou exception de ReportLab
+            with _verrou(repertoire, travail_id):
+                _mettre_a_jour(repertoire, travail_id, statut=ERREUR, message=str(erreur) or repr(erreur))
+        elif au_termine is not None and future.result() is not None:
+            au_termine(future.result())
+
+    future.add_done_callback(termine)
+    return etat
+
+
+def annuler(repertoire, travail_id):
+    """
+    Annule le travail: retiré de la file s'il n'a pas commencé, résultat
+    jeté sinon; le PDF d'un travail terminé est supprimé.
+    Retourne le nouvel état, ou None si le travail n'existe pas.
+    """
+    if lire(repertoire, travail_id) is None:
+        return None
+    with _lock:
+        future = _futures.get(travail_id)
+    if future is not None:
+        future.cancel()
+    with _verrou(repertoire, travail_id):
+        etat = lire(repertoire, travail_id)
+        if etat is None:
+            # Purgé entre-temps: ne pas laisser le verrou créé à l'instant
+            _supprimer(repertoire, travail_id)
+            return None
+        if etat['statut'] != ANNULE:
+            etat['statut'] = ANNULE
+            _ecrire(repertoire, travail_id, etat)
+        if os.path.exists(chemin_pdf(repertoire, travail_id)):
+            os.remove(chemin_pdf(repertoire, travail_id))
+    return etat
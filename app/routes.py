@@ -1,54 +1,90 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_file, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_file, flash, make_response, current_app, Response, stream_with_context
 from datetime import datetime, timedelta
 from app import db
 from app.models import Menu, Recette, Ingredient, RecetteIngredient
+from app.equilibre import analyser_menus, analyser_semaine
+from app.catalogue import conditionnel
+from app.recherche import rechercher_recettes, rechercher_ingredients, LIMITE_MAX
+from app.pagination import page, lire_champs
+from app.echange import exporter_ndjson, importer_ndjson, TYPES as TYPES_ECHANGE
+from app.courses import agreger_courses, liste_courses, MAX_PERSONNES
+from app.export_pdf import get_cache, lignes_pdf, empreinte, rendre_liste_courses
+from app import metriques, rendu_pdf, sauvegarde, statistiques, unites
+from app.autoplan import planifier_semaine, lire_temps_max, SANS_REPETITION_DEFAUT
+from app.planning import appliquer_lot, copier_semaines, deplacer_menu, lire_semaine, ConflitMenu
 from sqlalchemy import func
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import hmac
 import io
 import json
+import sqlite3
+import time
 
 bp = Blueprint('main', __name__)
 
+# Nombre maximal de semaines agrégées en une requête
+MAX_SEMAINES = 12
+
+
+def _lundi(week_offset):
+    """Date du lundi de la semaine courante décalée de `week_offset` semaines"""
+    today = datetime.now().date()
+    return today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
+
+
+def _taille_page():
+    """Taille de page demandée (`limit`), bornée par la configuration"""
+    limite = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    return max(1, min(limite, current_app.config['PAGE_SIZE_MAX']))
+
+
+def _personnes():
+    """
+    Nombre de convives demandé (`personnes`) pour mettre les quantités à
+    l'échelle: None si absent, False s'il est invalide.
+    """
+    personnes = request.args.get('personnes')
+    if not personnes:
+        return None
+    try:
+        personnes = int(personnes)
+    except ValueError:
+        return False
+    return personnes if 1 <= personnes <= MAX_PERSONNES else False
+
+
+def _semaines_demandees():
+    """
+    Lit la plage de semaines de la requête: `from`/`to` ou, à défaut, `week`.
+    Retourne (lundi de début, lundi de fin) ou (None, None) si invalide.
+    """
+    week_offset = request.args.get('week', 0, type=int)
+    debut_offset = request.args.get('from', week_offset, type=int)
+    fin_offset = request.args.get('to', debut_offset, type=int)
+    
+    if fin_offset < debut_offset or fin_offset - debut_offset >= MAX_SEMAINES:
+        return None, None
+    
+    return _lundi(debut_offset), _lundi(fin_offset)
+
+
 @bp.route('/')
 def index():
     """Page d'accueil - Planificateur de menus"""
     # Obtenir la semaine demandée ou la semaine actuelle
     week_offset = request.args.get('week', 0, type=int)
-    today = datetime.now().date()
-    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
+    monday = _lundi(week_offset)
     
     # Récupérer les menus de la semaine
-    jours = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi']
-    moments = ['midi', 'soir']
+    jours = Menu.JOURS
+    moments = Menu.MOMENTS
     
     # Calculer les dates pour chaque jour
     dates = {}
-    jour_index = {'lundi': 0, 'mardi': 1, 'mercredi': 2, 'jeudi': 3, 'vendredi': 4}
-    for jour in jours:
-        date = monday + timedelta(days=jour_index[jour])
-        dates[jour] = date
-    
-    menus = {}
-    for jour in jours:
-        menus[jour] = {}
-        for moment in moments:
-            menu = Menu.query.filter_by(
-                jour=jour,
-                moment=moment,
-                semaine=monday
-            ).first()
-            menus[jour][moment] = menu
-    
-    # Récupérer toutes les recettes pour le sélecteur
-    recettes = Recette.query.order_by(Recette.nom).all()
-    
-    # Récupérer tous les ingrédients pour les modals
-    ingredients = Ingredient.query.order_by(Ingredient.nom).all()
+    for jour_index, jour in enumerate(jours):
+        dates[jour] = monday + timedelta(days=jour_index)
+    
+    # Une seule requête pour toute la grille (recettes et catégories incluses)
+    menus = Menu.charger_grille(monday)[monday]
     
     return render_template('menu_planner.html', 
                          menus=menus, 
@@ -56,16 +92,24 @@ def index():
                          moments=moments,
                          semaine=monday,
                          dates=dates,
-                         recettes=recettes,
-                         ingredients=ingredients,
                          week_offset=week_offset)
 
 
 @bp.route('/recettes')
 def recettes():
     """Page de gestion des recettes"""
-    recettes_list = Recette.query.order_by(Recette.nom).all()
-    return render_template('recipes.html', recettes=recettes_list)
+    try:
+        recettes_list, curseur_suivant = page(
+            Recette,
+            ['id', 'nom', 'description', 'temps_preparation', 'portions'],
+            request.args.get('cursor'),
+            _taille_page()
+        )
+    except ValueError:
+        return redirect(url_for('main.recettes'))
+    return render_template('recipes.html', recettes=recettes_list,
+                           curseur_suivant=curseur_suivant,
+                           premiere_page=not request.args.get('cursor'))
 
 
 @bp.route('/recette/<int:id>')
@@ -78,13 +122,28 @@ def recette_detail(id):
 @bp.route('/ingredients')
 def ingredients():
     """Page de gestion des ingrédients"""
-    ingredients_list = Ingredient.query.order_by(Ingredient.nom).all()
-    return render_template('ingredients.html', ingredients=ingredients_list)
+    try:
+        ingredients_list, curseur_suivant = page(
+            Ingredient,
+            ['id', 'nom', 'categorie', 'unite'],
+            request.args.get('cursor'),
+            _taille_page()
+        )
+    except ValueError:
+        return redirect(url_for('main.ingredients'))
+    return render_template('ingredients.html', ingredients=ingredients_list,
+                           curseur_suivant=curseur_suivant,
+                           premiere_page=not request.args.get('cursor'))
 
 
 @bp.route('/api/menu/<int:menu_id>/move', methods=['PUT'])
 def move_menu(menu_id):
-    """API pour déplacer un menu vers un autre jour/moment"""
+    """
+    API pour déplacer un menu vers un autre jour/moment (échange si la case
+    est occupée). Le client peut joindre la version du menu déplacé
+    (`version`) et celle de la case cible (`version_cible`, null si vide):
+    si l'une a changé entre-temps, la réponse est 409 avec l'état courant.
+    """
     data = request.get_json()
     
     if not data:
@@ -94,43 +153,25 @@ def move_menu(menu_id):
     nouveau_moment = data.get('moment')
     
     # Validation
-    jours_valides = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi']
-    moments_valides = ['midi', 'soir']
-    
-    if nouveau_jour not in jours_valides or nouveau_moment not in moments_valides:
+    if nouveau_jour not in Menu.JOURS or nouveau_moment not in Menu.MOMENTS:
         return jsonify({'success': False, 'message': 'Jour ou moment invalide'}), 400
     
-    # Récupérer le menu à déplacer
-    menu = Menu.query.get(menu_id)
-    if not menu:
-        return jsonify({'success': False, 'message': 'Menu non trouvé'}), 404
-    
-    # Sauvegarder les coordonnées d'origine
-    jour_origine = menu.jour
-    moment_origine = menu.moment
-    
-    # Vérifier s'il y a déjà un menu à la destination
-    menu_existant = Menu.query.filter_by(
-        jour=nouveau_jour,
-        moment=nouveau_moment,
-        semaine=menu.semaine
-    ).first()
-    
-    if menu_existant and menu_existant.id != menu_id:
-        # Échanger les deux menus (swap)
-        menu_existant.jour = jour_origine
-        menu_existant.moment = moment_origine
-    
-    # Déplacer le menu
-    menu.jour = nouveau_jour
-    menu.moment = nouveau_moment
+    version = data.get('version')
+    version_cible = data.get('version_cible')
+    for valeur in (version, version_cible):
+        if valeur is not None and (isinstance(valeur, bool) or not isinstance(valeur, int)):
+            return jsonify({'success': False, 'message': 'Version invalide'}), 400
     
     try:
-        db.session.commit()
-        return jsonify({'success': True, 'message': 'Menu déplacé avec succès'})
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}), 500
+        deplacer_menu(menu_id, nouveau_jour, nouveau_moment, version=version,
+                      version_cible=version_cible, verifier_cible='version' in data)
+    except LookupError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except ConflitMenu as e:
+        return jsonify({'success': False, 'message': str(e), 'conflit': True, 'cases': e.menus}), 409
+    
+    db.session.commit()
+    return jsonify({'success': True, 'message': 'Menu déplacé avec succès'})
 
 @bp.route('/api/menu', methods=['POST'])
 def create_menu():
@@ -186,6 +227,155 @@ def create_menu():
     return jsonify({'success': True, 'menu_id': menu.id})
 
 
+@bp.route('/api/menus/batch', methods=['POST'])
+def batch_menus():
+    """
+    API pour remplir ou vider plusieurs cases du planning en une transaction.
+    Corps: {"menus": [{"semaine", "jour", "moment", "recette_id", "description"}]};
+    une case sans recette ni description est vidée.
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Données manquantes'}), 400
+    
+    try:
+        resultat = appliquer_lot(data.get('menus'))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    db.session.commit()
+    return jsonify({'success': True, **resultat})
+
+
+@bp.route('/api/week/copy', methods=['POST'])
+def copy_week():
+    """
+    API pour dupliquer ou décaler une semaine (ou une plage de semaines).
+    Corps: {"source", "source_fin" (optionnel), "cible", "deplacer": false,
+    "remplacer": true}; les dates sont ramenées au lundi de leur semaine.
+    Avec "deplacer" sans "remplacer", les menus dont la case cible est
+    occupée restent en place et sont listés dans "ignores".
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Données manquantes'}), 400
+    
+    try:
+        source = lire_semaine(data.get('source'))
+        source_fin = lire_semaine(data['source_fin']) if data.get('source_fin') else source
+        cible = lire_semaine(data.get('cible'))
+        resultat = copier_semaines(
+            source, source_fin, cible,
+            deplacer=bool(data.get('deplacer', False)),
+            remplacer=bool(data.get('remplacer', True))
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    db.session.commit()
+    return jsonify({'success': True, **resultat})
+
+
+@bp.route('/api/week/autoplan', methods=['POST'])
+def autoplan_week():
+    """
+    API pour remplir automatiquement les cases vides d'une semaine avec des
+    recettes équilibrées. Corps: {"semaine", "semaines_sans_repetition",
+    "temps_max" (entier, ou {"soir": 45, "lundi-midi": 20}), "graine",
+    "appliquer": true}; avec "appliquer": false, rien n'est écrit.
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Données manquantes'}), 400
+    
+    sans_repetition = data.get('semaines_sans_repetition', SANS_REPETITION_DEFAUT)
+    if isinstance(sans_repetition, bool) or not isinstance(sans_repetition, int):
+        return jsonify({'success': False, 'message': 'Semaines sans répétition invalides'}), 400
+    
+    graine = data.get('graine')
+    if graine is not None and (isinstance(graine, bool) or not isinstance(graine, (int, str))):
+        return jsonify({'success': False, 'message': 'Graine invalide'}), 400
+    
+    try:
+        semaine = lire_semaine(data.get('semaine'))
+        propositions, non_remplies = planifier_semaine(
+            semaine,
+            sans_repetition=sans_repetition,
+            temps_max=lire_temps_max(data.get('temps_max')),
+            graine=graine
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if propositions:
+        noms = dict(db.session.execute(
+            db.select(Recette.id, Recette.nom)
+            .where(Recette.id.in_([p['recette_id'] for p in propositions]))
+        ).all())
+        for proposition in propositions:
+            proposition['nom'] = noms[proposition['recette_id']]
+    
+    if propositions and data.get('appliquer', True):
+        appliquer_lot([{'semaine': semaine.isoformat(), **p} for p in propositions])
+        db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'semaine': semaine.isoformat(),
+        'propositions': propositions,
+        'non_remplies': non_remplies
+    })
+
+
+def _lire_ingredients(ingredients):
+    """
+    Normalise la liste d'ingrédients reçue pour une recette en dicts
+    {ingredient_id, quantite, unite}. Les entrées sans ingrédient sont
+    ignorées; la quantité vaut 1 et l'unité celle de l'ingrédient si elles
+    sont absentes. Lève ValueError si une quantité ou une unité est invalide.
+    """
+    lignes = []
+    for ing in ingredients:
+        if not ing.get('ingredient_id'):
+            continue
+        try:
+            ingredient_id = int(ing['ingredient_id'])
+        except (ValueError, TypeError):
+            continue
+        
+        quantite = ing.get('quantite')
+        if quantite in (None, ''):
+            quantite = 1
+        try:
+            quantite = float(quantite)
+        except (ValueError, TypeError):
+            raise ValueError('Quantité invalide')
+        if not 0 < quantite < 1e6:
+            raise ValueError('Quantité invalide')
+        
+        unite = ing.get('unite')
+        lignes.append({
+            'ingredient_id': ingredient_id,
+            'quantite': quantite,
+            'unite': unites.normaliser(unite) if unite else None
+        })
+    
+    # Unité par défaut: celle de l'ingrédient (une seule requête)
+    sans_unite = {ligne['ingredient_id'] for ligne in lignes if ligne['unite'] is None}
+    if sans_unite:
+        unites_defaut = dict(db.session.query(Ingredient.id, Ingredient.unite)
+                             .filter(Ingredient.id.in_(sans_unite)))
+        for ligne in lignes:
+            if ligne['unite'] is None:
+                ligne['unite'] = unites_defaut.get(ligne['ingredient_id'], 'pièce')
+    return lignes
+
+
 @bp.route('/api/recette', methods=['POST'])
 def create_recette():
     """API pour créer une recette"""
@@ -223,6 +413,11 @@ def create_recette():
     except (ValueError, TypeError):
         portions = 4
     
+    try:
+        ingredients = _lire_ingredients(data.get('ingredients', []))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
     recette = Recette(
         nom=nom,
         description=description,
@@ -230,24 +425,11 @@ def create_recette():
         portions=portions
     )
     db.session.add(recette)
-    db.session.commit()
+    db.session.flush()
     
-    # Ajouter les ingrédients
-    ingredients = data.get('ingredients', [])
-    for ing in ingredients:
-        if not ing.get('ingredient_id'):
-            continue
-        
-        try:
-            recette_ingredient = RecetteIngredient(
-                recette_id=recette.id,
-                ingredient_id=int(ing['ingredient_id']),
-                quantite=1,  # Valeur par défaut
-                unite='unité'  # Valeur par défaut
-            )
-            db.session.add(recette_ingredient)
-        except (ValueError, TypeError):
-            continue
+    # Ajouter les ingrédients (même transaction que la recette)
+    recette.appliquer_ingredients(ingredients)
+    Recette.recalculer_equilibre([recette.id])
     
     db.session.commit()
     return jsonify({
@@ -264,67 +446,90 @@ def create_recette():
 
 
 @bp.route('/api/ingredients', methods=['GET'])
+@conditionnel
 def get_ingredients():
-    """API pour récupérer tous les ingrédients"""
-    ingredients_list = Ingredient.query.order_by(Ingredient.nom).all()
-    return jsonify([{
-        'id': ing.id,
-        'nom': ing.nom,
-        'categorie': ing.categorie
-    } for ing in ingredients_list])
+    """
+    API pour récupérer les ingrédients triés par nom: tous, ou par pages
+    si cursor ou limit est fourni. Paramètres: cursor, limit, fields (id,
+    nom, categorie, unite).
+    """
+    return _liste_paginee(Ingredient, ('id', 'nom', 'categorie'))
 
 
 @bp.route('/api/recettes', methods=['GET'])
+@conditionnel
 def get_recettes():
-    """API pour récupérer toutes les recettes"""
-    recettes_list = Recette.query.order_by(Recette.nom).all()
-    return jsonify([{
-        'id': rec.id,
-        'nom': rec.nom,
-        'description': rec.description
-    } for rec in recettes_list])
+    """
+    API pour récupérer les recettes triées par nom: toutes, ou par pages
+    si cursor ou limit est fourni. Paramètres: cursor, limit, fields (id,
+    nom, description, temps_preparation, portions, score_equilibre).
+    """
+    return _liste_paginee(Recette, ('id', 'nom', 'description'))
+
+
+def _liste_paginee(modele, champs_defaut):
+    """
+    Réponse JSON d'une liste: complète sans cursor ni limit (comportement
+    historique de l'API), sinon une page dont le curseur suivant est
+    transmis dans l'en-tête X-Next-Cursor et dans un en-tête Link rel="next".
+    """
+    paginee = 'cursor' in request.args or 'limit' in request.args
+    try:
+        champs = lire_champs(modele, request.args.get('fields'), champs_defaut)
+        lignes, curseur_suivant = page(modele, champs, request.args.get('cursor'),
+                                       _taille_page() if paginee else None)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    response = jsonify(lignes)
+    if curseur_suivant:
+        args = request.args.to_dict()
+        args['cursor'] = curseur_suivant
+        response.headers['X-Next-Cursor'] = curseur_suivant
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
+
+@bp.route('/api/search', methods=['GET'])
+def search():
+    """
+    API de recherche plein texte (insensible aux accents, par préfixe).
+    Paramètres: q, type (recettes, ingredients ou tous), limit.
+    """
+    saisie = request.args.get('q', '').strip()
+    type_recherche = request.args.get('type', 'tous')
+    limite = request.args.get('limit', 10, type=int)
+    
+    if type_recherche not in ('recettes', 'ingredients', 'tous'):
+        return jsonify({'success': False, 'message': 'Type de recherche invalide'}), 400
+    
+    limite = max(1, min(limite, LIMITE_MAX))
+    
+    resultats = {}
+    if type_recherche in ('recettes', 'tous'):
+        resultats['recettes'] = rechercher_recettes(saisie, limite)
+    if type_recherche in ('ingredients', 'tous'):
+        resultats['ingredients'] = rechercher_ingredients(saisie, limite)
+    
+    return jsonify(resultats)
 
 
 @bp.route('/api/shopping-list', methods=['GET'])
 def get_shopping_list():
-    """API pour récupérer la liste de courses de la semaine"""
-    week_offset = request.args.get('week', 0, type=int)
-    today = datetime.now().date()
-    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
-    
-    # Récupérer tous les menus de la semaine
-    menus = Menu.query.filter_by(semaine=monday).all()
-    
-    # Dictionnaire pour regrouper les ingrédients par catégorie
-    ingredients_by_category = {}
-    
-    for menu in menus:
-        if menu.recette:
-            for ri in menu.recette.recette_ingredients:
-                ingredient = ri.ingredient
-                categorie = ingredient.categorie
-                
-                if categorie not in ingredients_by_category:
-                    ingredients_by_category[categorie] = {}
-                
-                if ingredient.nom not in ingredients_by_category[categorie]:
-                    ingredients_by_category[categorie][ingredient.nom] = {
-                        'nom': ingredient.nom,
-                        'count': 0
-                    }
-                
-                ingredients_by_category[categorie][ingredient.nom]['count'] += 1
-    
-    # Convertir en liste
-    result = []
-    for categorie in sorted(ingredients_by_category.keys()):
-        ingredients_list = list(ingredients_by_category[categorie].values())
-        result.append({
-            'categorie': categorie,
-            'ingredients': sorted(ingredients_list, key=lambda x: x['nom'])
-        })
-    
-    return jsonify(result)
+    """
+    API pour récupérer la liste de courses de la semaine.
+    Les paramètres `from` et `to` (décalages de semaine) permettent
+    d'agréger plusieurs semaines en un seul appel; `personnes` met les
+    quantités à l'échelle de ce nombre de convives.
+    """
+    debut, fin = _semaines_demandees()
+    if debut is None:
+        return jsonify({'success': False, 'message': 'Plage de semaines invalide'}), 400
+    personnes = _personnes()
+    if personnes is False:
+        return jsonify({'success': False, 'message': 'Nombre de personnes invalide'}), 400
+    
+    return jsonify(liste_courses(debut, fin, personnes))
 
 
 @bp.route('/api/ingredient', methods=['POST'])
@@ -354,7 +559,7 @@ def create_ingredient():
         return jsonify({'success': False, 'message': f'Catégorie invalide'}), 400
     
     unite = data.get('unite', 'g').strip()
-    unites_valides = ['g', 'kg', 'ml', 'L', 'cl', 'pièce', 'cuillère', 'tasse', 'pincée', 'c. à soupe', 'c. à café']
+    unites_valides = Ingredient.UNITES
     if unite not in unites_valides:
         return jsonify({'success': False, 'message': f'Unité invalide. Unités valides: {", ".join(unites_valides)}'}), 400
     
@@ -369,6 +574,13 @@ def create_ingredient():
     return jsonify({'success': True, 'ingredient_id': ingredient.id})
 
 
+def _recettes_utilisant(ingredient_id):
+    """Ids des recettes contenant un ingrédient"""
+    return [recette_id for (recette_id,) in db.session.query(
+        RecetteIngredient.recette_id
+    ).filter_by(ingredient_id=ingredient_id).distinct()]
+
+
 @bp.route('/api/ingredient/<int:id>', methods=['GET'])
 def get_ingredient(id):
     """API pour récupérer un ingrédient"""
@@ -407,15 +619,20 @@ def update_ingredient(id):
         return jsonify({'success': False, 'message': 'Catégorie invalide'}), 400
     
     unite = data.get('unite', 'g').strip()
-    unites_valides = ['g', 'kg', 'ml', 'L', 'cl', 'pièce', 'cuillère', 'tasse', 'pincée', 'c. à soupe', 'c. à café']
+    unites_valides = Ingredient.UNITES
     if unite not in unites_valides:
         return jsonify({'success': False, 'message': f'Unité invalide'}), 400
     
     # Mettre à jour l'ingrédient
+    categorie_modifiee = ingredient.categorie != categorie
     ingredient.nom = nom
     ingredient.categorie = categorie
     ingredient.unite = unite
     
+    # Propager le changement de catégorie aux recettes qui l'utilisent
+    if categorie_modifiee:
+        Recette.recalculer_equilibre(_recettes_utilisant(id))
+    
     db.session.commit()
     return jsonify({'success': True, 'ingredient_id': ingredient.id})
 
@@ -424,12 +641,16 @@ def update_ingredient(id):
 def delete_ingredient(id):
     """API pour supprimer un ingrédient"""
     ingredient = Ingredient.query.get_or_404(id)
+    recette_ids = _recettes_utilisant(id)
     db.session.delete(ingredient)
+    db.session.flush()
+    Recette.recalculer_equilibre(recette_ids)
     db.session.commit()
     return jsonify({'success': True})
 
 
 @bp.route('/api/recette/<int:id>', methods=['GET'])
+@conditionnel
 def get_recette(id):
     """API pour récupérer une recette"""
     recette = Recette.query.get_or_404(id)
@@ -495,27 +716,15 @@ def update_recette(id):
     except (ValueError, TypeError):
         recette.portions = 4
     
-    # Gérer les ingrédients
+    # Gérer les ingrédients: seules les différences sont écrites
     if 'ingredients' in data:
-        # Supprimer les anciens ingrédients
-        RecetteIngredient.query.filter_by(recette_id=recette.id).delete()
-        
-        # Ajouter les nouveaux ingrédients
-        ingredients = data.get('ingredients', [])
-        for ing in ingredients:
-            if not ing.get('ingredient_id'):
-                continue
-            
-            try:
-                recette_ingredient = RecetteIngredient(
-                    recette_id=recette.id,
-                    ingredient_id=int(ing['ingredient_id']),
-                    quantite=1,  # Valeur par défaut
-                    unite='unité'  # Valeur par défaut
-                )
-                db.session.add(recette_ingredient)
-            except (ValueError, TypeError):
-                continue
+        try:
+            ingredients = _lire_ingredients(data.get('ingredients', []))
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 400
+        if recette.appliquer_ingredients(ingredients):
+            Recette.recalculer_equilibre([recette.id])
     
     db.session.commit()
     return jsonify({'success': True, 'message': 'Recette modifiée avec succès'})
@@ -539,70 +748,148 @@ def delete_menu(id):
     return jsonify({'success': True})
 
 
+@bp.route('/api/export', methods=['GET'])
+def export_ndjson():
+    """
+    Export NDJSON en flux du catalogue et de l'historique des menus.
+    Paramètre optionnel: types=ingredient,recette,menu
+    """
+    types = request.args.get('types')
+    types = types.split(',') if types else TYPES_ECHANGE
+    if any(t not in TYPES_ECHANGE for t in types):
+        return jsonify({'success': False, 'message': 'Type invalide'}), 400
+    
+    return Response(
+        stream_with_context(exporter_ndjson(types)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=routinerie.ndjson'}
+    )
+
+
+@bp.route('/api/import', methods=['POST'])
+def import_ndjson():
+    """Import NDJSON en masse; retourne le rapport avec les erreurs par ligne"""
+    rapport = importer_ndjson(request.stream)
+    return jsonify({'success': True, **rapport})
+
+
 @bp.route('/liste-courses/export-pdf')
 def export_shopping_list_pdf():
-    """Export de la liste de courses en PDF"""
-    week_offset = request.args.get('week', 0, type=int)
-    today = datetime.now().date()
-    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
-    sunday = monday + timedelta(days=6)
-    
-    # Récupérer tous les menus de la semaine
-    menus = Menu.query.filter(
-        Menu.semaine == monday,
-        Menu.recette_id.isnot(None)
-    ).all()
-    
-    # Agréger les ingrédients
-    ingredients_aggregated = {}
-    for menu in menus:
-        if menu.recette:
-            for ri in menu.recette.ingredients:
-                key = (ri.ingredient.nom, ri.unite)
-                if key in ingredients_aggregated:
-                    ingredients_aggregated[key] += ri.quantite
-                else:
-                    ingredients_aggregated[key] = ri.quantite
-    
-    # Créer le PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title = Paragraph(f"<b>Liste de Courses</b><br/>Semaine du {monday.strftime('%d/%m/%Y')} au {sunday.strftime('%d/%m/%Y')}", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-    
-    # Créer le tableau des ingrédients
-    data = [['Ingrédient', 'Quantité', 'Unité']]
-    for (nom, unite), quantite in sorted(ingredients_aggregated.items()):
-        data.append([nom, f"{quantite:.1f}", unite])
-    
-    table = Table(data, colWidths=[300, 100, 100])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
+    """
+    Export de la liste de courses en PDF.
+    Le document est mis en cache par empreinte de son contenu et servi
+    avec un ETag: un client à jour reçoit 304 sans nouveau rendu.
+    """
+    debut, fin = _semaines_demandees()
+    if debut is None:
+        return jsonify({'success': False, 'message': 'Plage de semaines invalide'}), 400
+    personnes = _personnes()
+    if personnes is False:
+        return jsonify({'success': False, 'message': 'Nombre de personnes invalide'}), 400
+    dimanche = fin + timedelta(days=6)
+    
+    # Agréger les ingrédients (une seule requête)
+    lignes = lignes_pdf(agreger_courses(debut, fin, personnes))
+    etag = empreinte(debut, dimanche, lignes)
+    
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        cache = get_cache(current_app.config['PDF_CACHE_MAX_OCTETS'])
+        pdf = cache.get(etag)
+        if pdf is None:
+            debut_rendu = time.perf_counter()
+            pdf = rendre_liste_courses(debut, dimanche, lignes)
+            metriques.observer_pdf(time.perf_counter() - debut_rendu)
+            cache.set(etag, pdf)
+        
+        response = send_file(
+            io.BytesIO(pdf),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'liste_courses_{debut.strftime("%Y%m%d")}.pdf',
+            etag=False
+        )
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@bp.route('/api/exports/liste-courses', methods=['POST'])
+def create_pdf_export():
+    """
+    Demande l'export PDF de la liste de courses en arrière-plan (mêmes
+    paramètres que /liste-courses/export-pdf: week, from, to, personnes).
+    Répond 202 avec l'identifiant du travail à suivre.
+    """
+    debut, fin = _semaines_demandees()
+    if debut is None:
+        return jsonify({'success': False, 'message': 'Plage de semaines invalide'}), 400
+    personnes = _personnes()
+    if personnes is False:
+        return jsonify({'success': False, 'message': 'Nombre de personnes invalide'}), 400
+    
+    lignes = lignes_pdf(agreger_courses(debut, fin, personnes))
+    try:
+        travail = rendu_pdf.soumettre(current_app.config, debut, fin + timedelta(days=6), lignes,
+                                      au_termine=metriques.observer_pdf)
+    except rendu_pdf.FilePleine as e:
+        response = jsonify({'success': False, 'message': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    statut_url = url_for('main.get_pdf_export', travail_id=travail['id'])
+    response = jsonify({
+        'success': True,
+        'travail': travail,
+        'statut_url': statut_url,
+        'fichier_url': url_for('main.download_pdf_export', travail_id=travail['id']),
+    })
+    response.headers['Location'] = statut_url
+    return response, 202
+
+
+@bp.route('/api/exports/liste-courses/<travail_id>', methods=['GET'])
+def get_pdf_export(travail_id):
+    """État d'un export PDF: en_attente, en_cours, termine, erreur ou annule"""
+    travail = rendu_pdf.lire(current_app.config['PDF_TRAVAUX_DIR'], travail_id)
+    if travail is None:
+        return jsonify({'success': False, 'message': 'Export inconnu ou expiré'}), 404
+    return jsonify({'success': True, 'travail': travail})
+
+
+@bp.route('/api/exports/liste-courses/<travail_id>/fichier', methods=['GET'])
+def download_pdf_export(travail_id):
+    """Téléchargement du PDF d'un export terminé (409 tant qu'il ne l'est pas)"""
+    repertoire = current_app.config['PDF_TRAVAUX_DIR']
+    travail = rendu_pdf.lire(repertoire, travail_id)
+    if travail is None:
+        return jsonify({'success': False, 'message': 'Export inconnu ou expiré'}), 404
+    if travail['statut'] != rendu_pdf.TERMINE:
+        return jsonify({'success': False, 'message': 'Export non disponible',
+                        'statut': travail['statut']}), 409
+    try:
+        fichier = open(rendu_pdf.chemin_pdf(repertoire, travail_id), 'rb')
+    except OSError:
+        return jsonify({'success': False, 'message': 'Export inconnu ou expiré'}), 404
     return send_file(
-        buffer,
+        fichier,
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'liste_courses_{monday.strftime("%Y%m%d")}.pdf'
+        download_name=f'liste_courses_{travail["debut"].replace("-", "")}.pdf'
     )
 
 
+@bp.route('/api/exports/liste-courses/<travail_id>', methods=['DELETE'])
+def cancel_pdf_export(travail_id):
+    """Annule un export (ou supprime le PDF d'un export terminé)"""
+    travail = rendu_pdf.annuler(current_app.config['PDF_TRAVAUX_DIR'], travail_id)
+    if travail is None:
+        return jsonify({'success': False, 'message': 'Export inconnu ou expiré'}), 404
+    return jsonify({'success': True, 'travail': travail})
+
+
 @bp.route('/api/menu/<int:menu_id>/equilibre', methods=['GET'])
 def get_menu_equilibre(menu_id):
     """API pour obtenir l'analyse d'équilibre d'un menu"""
@@ -620,20 +907,164 @@ def get_menu_equilibre(menu_id):
 
 @bp.route('/api/menus/equilibre', methods=['POST'])
 def get_menus_equilibre():
-    """API pour obtenir l'analyse d'équilibre de plusieurs menus"""
+    """API pour obtenir l'analyse d'équilibre de plusieurs menus ou d'une semaine"""
     data = request.get_json()
+    
+    if not data:
+        return jsonify({'success': False, 'message': 'Données manquantes'}), 400
+    
+    semaine_str = data.get('semaine')
     menu_ids = data.get('menu_ids', [])
     
-    if not menu_ids:
+    if semaine_str:
+        try:
+            semaine = datetime.strptime(semaine_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Format de date invalide'}), 400
+        analyses = analyser_semaine(semaine)
+    elif menu_ids:
+        analyses = analyser_menus(menu_ids)
+    else:
         return jsonify({'success': False, 'message': 'Aucun menu spécifié'}), 400
     
-    resultats = {}
-    for menu_id in menu_ids:
-        menu = Menu.query.get(menu_id)
-        if menu:
-            resultats[str(menu_id)] = menu.analyser_equilibre()
+    resultats = {str(menu_id): analyse for menu_id, analyse in analyses.items()}
     
     return jsonify({
         'success': True,
         'analyses': resultats
     })
+
+
+def _periode_stats():
+    """
+    Période des statistiques: `debut`/`fin` ('AAAA-MM-JJ', ramenées au
+    lundi) ou, à défaut, les 52 semaines jusqu'à la semaine courante.
+    Lève ValueError si une date est invalide.
+    """
+    debut, fin = statistiques.periode_defaut(_lundi(0))
+    if request.args.get('debut'):
+        debut = lire_semaine(request.args['debut'])
+    if request.args.get('fin'):
+        fin = lire_semaine(request.args['fin'])
+    if fin < debut:
+        raise ValueError('Période invalide')
+    return debut, fin
+
+
+@bp.route('/api/stats/recette/<int:id>', methods=['GET'])
+def stats_recette(id):
+    """Nombre de fois où la recette a été planifiée sur la période (debut, fin), par semaine"""
+    if db.session.get(Recette, id) is None:
+        return jsonify({'success': False, 'message': 'Recette non trouvée'}), 404
+    try:
+        debut, fin = _periode_stats()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'recette_id': id,
+        'debut': debut.isoformat(),
+        'fin': fin.isoformat(),
+        **statistiques.usage_recette(id, debut, fin),
+    })
+
+
+@bp.route('/api/stats/ingredients', methods=['GET'])
+def stats_ingredients():
+    """
+    Ingrédients les plus utilisés par catégorie sur la période.
+    Paramètres: debut, fin, categorie, limit (par catégorie, 10 par défaut).
+    """
+    try:
+        debut, fin = _periode_stats()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    limite = max(1, min(request.args.get('limit', 10, type=int), statistiques.LIMITE_MAX))
+    return jsonify({
+        'success': True,
+        'debut': debut.isoformat(),
+        'fin': fin.isoformat(),
+        'categories': statistiques.ingredients_frequents(
+            debut, fin, categorie=request.args.get('categorie'), limite=limite),
+    })
+
+
+@bp.route('/api/stats/recettes-oubliees', methods=['GET'])
+def stats_recettes_oubliees():
+    """
+    Recettes non planifiées depuis N semaines (`semaines`, 8 par défaut),
+    par ordre alphabétique. Pagination: limit et cursor (curseur de la
+    page suivante dans l'en-tête X-Next-Cursor).
+    """
+    semaines = request.args.get('semaines', 8, type=int)
+    if semaines < 1:
+        return jsonify({'success': False, 'message': 'Nombre de semaines invalide'}), 400
+    depuis = _lundi(1 - semaines)
+    try:
+        recettes, curseur_suivant = statistiques.recettes_oubliees(
+            depuis, curseur=request.args.get('cursor'), limite=_taille_page())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    response = jsonify({'success': True, 'depuis': depuis.isoformat(), 'recettes': recettes})
+    if curseur_suivant:
+        response.headers['X-Next-Cursor'] = curseur_suivant
+    return response
+
+
+@bp.route('/metrics')
+def metrics():
+    """Métriques au format texte Prometheus (tous les workers si METRICS_DIR est défini)"""
+    if not current_app.config['METRICS']:
+        return jsonify({'success': False, 'message': 'Métriques désactivées'}), 404
+    valeurs = metriques.agreger(current_app.config['METRICS_DIR'])
+    return Response(metriques.exposer(valeurs), mimetype='text/plain; version=0.0.4')
+
+
+def _refus_admin():
+    """Réponse d'erreur si la requête n'a pas le jeton d'administration (None sinon)"""
+    jeton = current_app.config['ADMIN_TOKEN']
+    if not jeton:
+        return jsonify({'success': False, 'message': 'Administration désactivée'}), 404
+    fourni = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(fourni.encode(), jeton.encode()):
+        return jsonify({'success': False, 'message': 'Jeton d\'administration invalide'}), 403
+    return None
+
+
+@bp.route('/api/admin/backup', methods=['POST'])
+def backup():
+    """
+    Sauvegarde à chaud de la base (en-tête X-Admin-Token requis).
+    Corps optionnel: {"compresser": true} pour un instantané gzip.
+    """
+    refus = _refus_admin()
+    if refus:
+        return refus
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Corps invalide (objet JSON attendu)'}), 400
+    config = current_app.config
+    try:
+        rapport = sauvegarde.sauvegarder(
+            sauvegarde.chemin_base(db.engine),
+            config['BACKUP_DIR'],
+            compresser=bool(data.get('compresser')),
+            pages=config['BACKUP_PAGES'],
+            pause=config['BACKUP_PAUSE'],
+            retention_jours=config['BACKUP_RETENTION_JOURS'],
+        )
+    except sauvegarde.SauvegardeEnCours as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except (ValueError, sqlite3.Error) as e:
+        current_app.logger.error('Sauvegarde échouée: %s', e)
+        return jsonify({'success': False, 'message': f'Sauvegarde échouée: {e}'}), 500
+    return jsonify({'success': True, **rapport})
+
+
+@bp.route('/api/admin/backups', methods=['GET'])
+def list_backups():
+    """Sauvegardes disponibles, plus récente en premier (en-tête X-Admin-Token requis)"""
+    refus = _refus_admin()
+    if refus:
+        return refus
+    return jsonify({'success': True, 'sauvegardes': sauvegarde.lister(current_app.config['BACKUP_DIR'])})
@@ -0,0 +1,194 @@
+"""
+Sauvegardes à chaud de la base SQLite.
+
+- Copie page par page avec l'API de sauvegarde en ligne de sqlite3:
+  BACKUP_PAGES pages par étape et BACKUP_PAUSE secondes entre deux
+  étapes. Le verrou de lecture n'est tenu que le temps d'une étape: les
+  requêtes continuent pendant la copie. En WAL, une transaction de lecture
+  fige l'instantané copié; avec un journal classique, une base modifiée
+  entre deux étapes fait reprendre la copie au début (au-delà de
+  MAX_REPRISES, elle est faite en une étape).
+- Instantané compressé (option): VACUUM INTO (une seule transaction de
+  lecture, fichier compacté) puis gzip.
+
+Chaque copie est vérifiée (PRAGMA integrity_check) avant d'être renommée
+en database_backup_AAAAMMJJ_HHMMSS.db[.gz]: un fichier présent sous ce
+nom est toujours complet. Les sauvegardes plus anciennes que
+BACKUP_RETENTION_JOURS sont ensuite supprimées.
+"""
+from datetime import datetime
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+PREFIXE = 'database_backup_'
+EXTENSIONS = ('.db', '.db.gz')
+
+# Reprises de la copie au début (base modifiée entre deux étapes) tolérées
+# avant de copier en une seule étape
+MAX_REPRISES = 3
+
+# Une seule sauvegarde à la fois par processus
+_verrou = threading.Lock()
+
+
+class SauvegardeEnCours(Exception):
+    """Une sauvegarde est déjà en cours dans ce processus"""
+
+
+def chemin_base(engine):
+    """Chemin du fichier SQLite du moteur (ValueError pour une base en mémoire)"""
+    chemin = engine.url.database
+    if engine.url.get_backend_name() != 'sqlite' or not chemin or chemin == ':memory:':
+        raise ValueError('Sauvegarde possible uniquement pour une base SQLite sur fichier')
+    return chemin
+
+
+def _verifier(chemin):
+    """Lève ValueError si la copie `chemin` n'est pas intègre"""
+    connexion = sqlite3.connect(chemin)
+    try:
+        resultat = [ligne[0] for ligne in connexion.execute('PRAGMA integrity_check')]
+    finally:
+        connexion.close()
+    if resultat != ['ok']:
+        raise ValueError(f'Copie corrompue: {"; ".join(resultat[:5])}')
+
+
+class _CopieInterrompue(Exception):
+    pass
+
+
+def _copier_par_pages(source, cible, pages, pause):
+    """Copie en ligne par étapes; retourne le nombre de pages copiées"""
+    copiees = {'total': 0, 'restantes': None, 'reprises': 0}
+
+    def progression(statut, restantes, total):
+        # Des pages restantes qui augmentent: la copie a repris au début
+        if copiees['restantes'] is not None and restantes > copiees['restantes']:
+            copiees['reprises'] += 1
+            if copiees['reprises'] > MAX_REPRISES:
+                raise _CopieInterrompue()
+        copiees.update(total=total, restantes=restantes)
+
+    connexion = sqlite3.connect(source, timeout=30, isolation_level=None)
+    destination = sqlite3.connect(cible)
+    try:
+        wal = connexion.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        if wal:
+            # En WAL, une transaction de lecture ouverte fige l'instantané copié
+            # sans bloquer les écritures: la copie ne reprend jamais au début
+            connexion.execute('BEGIN')
+            connexion.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        try:
+            connexion.backup(destination, pages=pages, progress=progression, sleep=pause)
+        except _CopieInterrompue:
+            # Journal classique trop souvent modifié: copie en une étape
+            # (les écritures attendent la fin de la copie, au plus busy_timeout)
+            connexion.backup(destination, pages=-1)
+        if wal:
+            connexion.execute('ROLLBACK')
+        # La copie reprend l'en-tête de la source: un fichier autonome
+        # (sans -wal) est plus simple à restaurer
+        destination.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        destination.close()
+        connexion.close()
+    return copiees['total']
+
+
+def _instantane_compresse(source, cible):
+    """VACUUM INTO un fichier temporaire, vérifié puis compressé dans `cible`"""
+    temporaire = cible[:-len('.gz')] + '.vacuum'
+    connexion = sqlite3.connect(source, timeout=30)
+    try:
+        connexion.execute('VACUUM INTO ?', (temporaire,))
+    finally:
+        connexion.close()
+    try:
+        _verifier(temporaire)
+        with open(temporaire, 'rb') as entree, gzip.open(cible, 'wb', compresslevel=6) as sortie:
+            shutil.copyfileobj(entree, sortie, 1024 * 1024)
+    finally:
+        os.remove(temporaire)
+
+
+def appliquer_retention(repertoire, jours, garder=()):
+    """Supprime les sauvegardes de plus de `jours` jours; retourne leurs noms"""
+    if not jours:
+        return []
+    limite = time.time() - jours * 86400
+    supprimees = []
+    for chemin in lister_fichiers(repertoire):
+        if chemin in garder or os.path.getmtime(chemin) >= limite:
+            continue
+        os.remove(chemin)
+        supprimees.append(os.path.basename(chemin))
+    return supprimees
+
+
+def lister_fichiers(repertoire):
+    """Chemins des sauvegardes du répertoire, de la plus ancienne à la plus récente"""
+    chemins = [
+        chemin for extension in EXTENSIONS
+        for chemin in glob.glob(os.path.join(repertoire, f'{PREFIXE}*{extension}'))
+    ]
+    return sorted(chemins, key=os.path.getmtime)
+
+
+def lister(repertoire):
+    """Description des sauvegardes disponibles (plus récente en premier)"""
+    return [
+        {
+            'fichier': os.path.basename(chemin),
+            'taille': os.path.getsize(chemin),
+            'date': datetime.fromtimestamp(os.path.getmtime(chemin)).isoformat(timespec='seconds'),
+        }
+        for chemin in reversed(lister_fichiers(repertoire))
+    ]
+
+
+def sauvegarder(source, repertoire, compresser=False, pages=256, pause=0.005, retention_jours=30):
+    """
+    Sauvegarde la base `source` dans `repertoire`, vérifie la copie puis
+    applique la rétention. Lève SauvegardeEnCours si une sauvegarde est
+    déjà en cours et ValueError si la copie n'est pas intègre.
+    Retourne {fichier, taille, pages, duree, compresse, supprimees}.
+    """
+    if not _verrou.acquire(blocking=False):
+        raise SauvegardeEnCours('Une sauvegarde est déjà en cours')
+    try:
+        debut = time.perf_counter()
+        os.makedirs(repertoire, exist_ok=True)
+        nom = PREFIXE + datetime.now().strftime('%Y%m%d_%H%M%S') + ('.db.gz' if compresser else '.db')
+        cible = os.path.join(repertoire, nom)
+        # Nom définitif donné seulement à une copie complète et vérifiée
+        temporaire = f'{cible}.{os.getpid()}.tmp'
+        nb_pages = None
+        try:
+            if compresser:
+                _instantane_compresse(source, temporaire + '.gz')
+                os.replace(temporaire + '.gz', cible)
+            else:
+                nb_pages = _copier_par_pages(source, temporaire, pages, pause)
+                _verifier(temporaire)
+                os.replace(temporaire, cible)
+        finally:
+            for reste in (temporaire, temporaire + '.gz', temporaire + '-journal'):
+                if os.path.exists(reste):
+                    os.remove(reste)
+
+        return {
+            'fichier': nom,
+            'taille': os.path.getsize(cible),
+            'pages': nb_pages,
+            'duree': round(time.perf_counter() - debut, 3),
+            'compresse': compresser,
+            'supprimees': appliquer_retention(repertoire, retention_jours, garder={cible}),
+        }
+    finally:
+        _verrou.release()
@@ -0,0 +1,81 @@
+"""
+Profil de performance SQLite appliqué à chaque nouvelle connexion.
+
+Le profil (SQLITE_PROFIL) fixe les PRAGMA de la connexion: journal WAL
+pour que les lectures ne bloquent plus derrière les écritures,
+synchronous=NORMAL, busy_timeout pour attendre un verrou au lieu
+d'échouer avec "database is locked", taille du cache, mmap et tables
+temporaires en mémoire. Chaque PRAGMA peut être surchargé par une
+variable d'environnement (voir config.py).
+"""
+from sqlalchemy import event
+
+# PRAGMA appliqués par profil, dans cet ordre
+PROFILS = {
+    # Plusieurs workers, lectures concurrentes: WAL et attente sur verrou
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    # Comme performance, mais chaque commit est synchronisé sur disque
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+        'temp_store': 'MEMORY',
+    },
+    # Réglages par défaut de SQLite
+    'defaut': {},
+}
+
+
+def _est_fichier_sqlite(uri):
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') != 'sqlite:'
+
+
+def options_moteur(config):
+    """
+    Options du moteur SQLAlchemy (pool) pour une base SQLite fichier,
+    fusionnées avec SQLALCHEMY_ENGINE_OPTIONS si déjà définies.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if _est_fichier_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    return options
+
+
+def pragmas(config):
+    """PRAGMA du profil configuré, avec les surcharges de la configuration"""
+    nom = config['SQLITE_PROFIL']
+    if nom not in PROFILS:
+        raise ValueError(f'Profil SQLite inconnu: {nom} ({", ".join(PROFILS)})')
+    valeurs = dict(PROFILS[nom])
+    for pragma, valeur in (config.get('SQLITE_PRAGMAS') or {}).items():
+        if valeur is not None:
+            valeurs[pragma] = valeur
+    return valeurs
+
+
+def configurer(engine, config):
+    """Applique les PRAGMA du profil à chaque connexion ouverte par le moteur"""
+    if engine.dialect.name != 'sqlite':
+        return
+    valeurs = pragmas(config)
+    if not valeurs:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _appliquer_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, valeur in valeurs.items():
+                cursor.execute(f'PRAGMA {pragma} = {valeur}')
+        finally:
+            cursor.close()
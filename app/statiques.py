@@ -0,0 +1,351 @@
+"""
+Fichiers statiques compilés: paquets minifiés, empreintés et précompressés.
+
+`flask construire-statiques` (lancé aussi au démarrage de gunicorn)
+assemble les sources de static/ en paquets (PAQUETS), les minifie, les
+écrit dans static/dist/ sous un nom contenant l'empreinte de leur contenu
+(planner.3f2a9c1b7e4d.js) avec leurs variantes .gz (et .br si le module
+brotli est installé), puis publie manifest.json (nom du paquet -> fichier).
+
+Un contenu modifié change de nom: les paquets sont servis sous /assets/
+avec `Cache-Control: public, max-age=31536000, immutable`, et le
+navigateur ne revalide plus rien, même lors des `location.reload()` du
+planning. La variante compressée est choisie selon Accept-Encoding.
+
+Dans les templates, `{{ statiques('planner.js') }}` produit les balises
+du paquet; sans manifest (ou en debug, ou avec STATIQUES_SOURCES) elles
+pointent vers les sources non compilées de /static/.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, current_app, request, send_file, url_for
+from markupsafe import Markup, escape
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+# Paquet -> sources concaténées dans l'ordre (chemins relatifs à static/)
+PAQUETS = {
+    'style.css': ['css/style.css'],
+    'main.js': ['js/main.js'],
+    'planner.js': ['js/planner.js', 'js/equilibre.js'],
+    'recipes.js': ['js/recipes.js'],
+    'ingredients.js': ['js/ingredients.js'],
+}
+
+REPERTOIRE = 'dist'
+MANIFEST = 'manifest.json'
+DUREE_CACHE = 365 * 24 * 3600
+
+# Longueur de l'empreinte (hexadécimal) dans les noms de fichiers
+LONGUEUR_EMPREINTE = 12
+
+_IDENTIFIANT = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$\\')
+
+# Caractère significatif précédent après lequel "/" ouvre une expression régulière
+_AVANT_REGEX = set('(,=:[!&|?{};+-*%<>~^\n')
+_MOTS_AVANT_REGEX = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'new')
+
+
+def _identifiant(caractere):
+    return caractere in _IDENTIFIANT or ord(caractere) > 127
+
+
+def _lire_chaine(source, index, fin):
+    """Index suivant la chaîne (ou le littéral) ouvert en `index` et fermé par `fin`"""
+    index += 1
+    while index < len(source) and source[index] != fin:
+        index += 2 if source[index] == '\\' else 1
+    return index + 1
+
+
+def _lire_regex(source, index):
+    """Index suivant l'expression régulière ouverte en `index` (drapeaux compris)"""
+    index += 1
+    classe = False
+    while index < len(source):
+        caractere = source[index]
+        if caractere == '\\':
+            index += 2
+            continue
+        if caractere == '[':
+            classe = True
+        elif caractere == ']':
+            classe = False
+        elif caractere == '/' and not classe:
+            break
+        index += 1
+    index += 1
+    while index < len(source) and _identifiant(source[index]):
+        index += 1
+    return index
+
+
+def _regex_possible(sortie):
+    """Un "/" à cette position ouvre-t-il une expression régulière ?"""
+    fin = ''.join(sortie[-8:]).rstrip(' ')
+    if not fin or fin[-1] in _AVANT_REGEX:
+        return True
+    return any(fin.endswith(mot) and (len(fin) == len(mot) or not _identifiant(fin[-len(mot) - 1]))
+               for mot in _MOTS_AVANT_REGEX)
+
+
+def minifier_js(source):
+    """
+    Minification prudente: commentaires et indentation supprimés, espaces
+    réduits; les sauts de ligne sont gardés (insertion automatique des
+    points-virgules). Chaînes, gabarits `...${}` et expressions
+    régulières sont recopiés tels quels.
+    """
+    sortie = []
+    # Profondeur d'accolades de chaque expression ${} de gabarit ouverte
+    gabarits = []
+    espace = False
+    index = 0
+    taille = len(source)
+
+    def ajouter(fragment):
+        nonlocal espace
+        if espace and sortie and fragment != '\n':
+            precedent = sortie[-1][-1]
+            # Espace gardé seulement s'il sépare deux mots, "+ +", "- -",
+            # une division ou "1 .toString()"
+            if (_identifiant(precedent) and _identifiant(fragment[0])) \
+                    or (precedent in '+-' and fragment[0] in '+-') \
+                    or '/' in (precedent, fragment[0]) \
+                    or (precedent.isdigit() and fragment[0] == '.'):
+                sortie.append(' ')
+        espace = False
+        if fragment == '\n' and (not sortie or sortie[-1].endswith('\n')):
+            return
+        sortie.append(fragment)
+
+    def lire_gabarit(index):
+        """Recopie un gabarit à partir de `index` jusqu'à sa fin ou à un ${"""
+        debut = index
+        while index < taille:
+            caractere = source[index]
+            if caractere == '\\':
+                index += 2
+            elif caractere == '`':
+                return source[debut:index + 1], index + 1, False
+            elif source.startswith('${', index):
+                return source[debut:index + 2], index + 2, True
+            else:
+                index += 1
+        return source[debut:], taille, False
+
+    while index < taille:
+        caractere = source[index]
+        if caractere in ' \t\r':
+            espace = True
+            index += 1
+        elif caractere == '\n':
+            ajouter('\n')
+            index += 1
+        elif source.startswith('//', index):
+            fin = source.find('\n', index)
+            index = taille if fin < 0 else fin
+        elif source.startswith('/*', index):
+            fin = source.find('*/', index + 2)
+            fin = taille if fin < 0 else fin + 2
+            if '\n' in source[index:fin]:
+                ajouter('\n')
+            else:
+                espace = True
+            index = fin
+        elif caractere in '\'"':
+            fin = _lire_chaine(source, index, caractere)
+            ajouter(source[index:fin])
+            index = fin
+        elif caractere == '`':
+            fragment, index, expression = lire_gabarit(index + 1)
+            ajouter('`' + fragment)
+            if expression:
+                gabarits.append(0)
+        elif caractere == '/' and _regex_possible(sortie):
+            fin = _lire_regex(source, index)
+            ajouter(source[index:fin])
+            index = fin
+        elif caractere == '}' and gabarits and gabarits[-1] == 0:
+            # Fin d'une expression ${}: retour dans le gabarit
+            gabarits.pop()
+            fragment, index, expression = lire_gabarit(index + 1)
+            ajouter('}' + fragment)
+            if expression:
+                gabarits.append(0)
+        else:
+            if gabarits and caractere in '{}':
+                gabarits[-1] += 1 if caractere == '{' else -1
+            ajouter(caractere)
+            index += 1
+    return ''.join(sortie).strip() + '\n'
+
+
+def minifier_css(source):
+    """Commentaires supprimés, espaces réduits autour de la ponctuation; chaînes intactes"""
+    sortie = []
+    espace = False
+    index = 0
+    while index < len(source):
+        caractere = source[index]
+        if source.startswith('/*', index):
+            fin = source.find('*/', index + 2)
+            index = len(source) if fin < 0 else fin + 2
+            espace = True
+            continue
+        if caractere.isspace():
+            espace = True
+            index += 1
+            continue
+        if caractere in '\'"':
+            fin = _lire_chaine(source, index, caractere)
+            fragment = source[index:fin]
+            index = fin
+        else:
+            fragment = caractere
+            index += 1
+        if caractere == '}' and sortie and sortie[-1] == ';':
+            sortie.pop()
+        # Pas d'espace autour de { } ; , > ni après ":" (pas avant: sélecteur "a :hover")
+        if espace and sortie and sortie[-1] not in '{};,>:' and fragment not in '{};,>':
+            sortie.append(' ')
+        espace = False
+        sortie.append(fragment)
+    return ''.join(sortie) + '\n'
+
+
+def _minifier(nom, contenu):
+    return minifier_css(contenu) if nom.endswith('.css') else minifier_js(contenu)
+
+
+def _ecrire(chemin, donnees):
+    """Écriture atomique (fichier temporaire puis renommage)"""
+    temporaire = f'{chemin}.{os.getpid()}.tmp'
+    with open(temporaire, 'wb') as fichier:
+        fichier.write(donnees)
+    os.replace(temporaire, chemin)
+
+
+def lire_manifest(dossier_statique):
+    """Manifest publié {paquet: fichier}, ou None s'il n'y en a pas"""
+    try:
+        with open(os.path.join(dossier_statique, REPERTOIRE, MANIFEST), encoding='utf-8') as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        return None
+
+
+def construire(dossier_statique):
+    """
+    Compile les PAQUETS de `dossier_statique` dans son sous-répertoire
+    dist/ puis publie le manifest. Les fichiers de la génération précédente
+    sont gardés (pages déjà servies), les plus anciens supprimés.
+    Retourne [{paquet, fichier, source, minifie, gzip, brotli}] (tailles en octets).
+    """
+    sortie = os.path.join(dossier_statique, REPERTOIRE)
+    os.makedirs(sortie, exist_ok=True)
+    precedent = lire_manifest(dossier_statique) or {}
+
+    manifest = {}
+    rapport = []
+    for paquet, sources in PAQUETS.items():
+        contenus = []
+        for source in sources:
+            with open(os.path.join(dossier_statique, source), encoding='utf-8') as fichier:
+                contenus.append(fichier.read())
+        # ";" entre deux scripts: un fichier sans point-virgule final reste séparé du suivant
+        separateur = '\n' if paquet.endswith('.css') else '\n;\n'
+        brut = separateur.join(contenus)
+        minifie = separateur.join(_minifier(paquet, contenu) for contenu in contenus).encode('utf-8')
+
+        base, extension = os.path.splitext(paquet)
+        nom = f'{base}.{hashlib.sha256(minifie).hexdigest()[:LONGUEUR_EMPREINTE]}{extension}'
+        chemin = os.path.join(sortie, nom)
+        compresse = gzip.compress(minifie, compresslevel=9, mtime=0)
+        _ecrire(chemin, minifie)
+        _ecrire(chemin + '.gz', compresse)
+        ligne = {'paquet': paquet, 'fichier': nom, 'source': len(brut.encode('utf-8')),
+                 'minifie': len(minifie), 'gzip': len(compresse), 'brotli': None}
+        if brotli is not None:
+            compresse = brotli.compress(minifie, quality=11)
+            _ecrire(chemin + '.br', compresse)
+            ligne['brotli'] = len(compresse)
+        manifest[paquet] = nom
+        rapport.append(ligne)
+
+    _ecrire(os.path.join(sortie, MANIFEST),
+            json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    gardes = set(manifest.values()) | set(precedent.values()) | {MANIFEST}
+    for fichier in os.listdir(sortie):
+        if fichier.removesuffix('.gz').removesuffix('.br') not in gardes and not fichier.endswith('.tmp'):
+            os.remove(os.path.join(sortie, fichier))
+    return rapport
+
+
+def _manifest(app):
+    """Manifest de l'application, relu seulement quand le fichier change"""
+    chemin = os.path.join(app.static_folder, REPERTOIRE, MANIFEST)
+    try:
+        version = os.stat(chemin).st_mtime_ns
+    except OSError:
+        return None
+    cache = app.extensions['statiques']
+    if cache.get('version') != version:
+        cache.update(version=version, manifest=lire_manifest(app.static_folder))
+    return cache['manifest']
+
+
+def urls(paquet):
+    """URLs à charger pour le paquet: le fichier compilé, ou ses sources"""
+    sources = current_app.debug or current_app.config['STATIQUES_SOURCES']
+    manifest = None if sources else _manifest(current_app)
+    if manifest and paquet in manifest:
+        return [url_for('statiques', fichier=manifest[paquet])]
+    return [url_for('static', filename=source) for source in PAQUETS[paquet]]
+
+
+def balises(paquet):
+    """Balises <link> ou <script> du paquet"""
+    if paquet.endswith('.css'):
+        modele = '<link rel="stylesheet" href="{}">'
+    else:
+        modele = '<script src="{}"></script>'
+    return Markup('\n'.join(modele.format(escape(url)) for url in urls(paquet)))
+
+
+def servir(fichier):
+    """Paquet compilé, compressé selon Accept-Encoding, mis en cache sans revalidation"""
+    repertoire = os.path.join(current_app.static_folder, REPERTOIRE)
+    chemin = os.path.join(repertoire, fichier)
+    if fichier == MANIFEST or not os.path.isfile(chemin):
+        abort(404)
+
+    encodage = None
+    for candidat, extension in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidat] and os.path.isfile(chemin + extension):
+            chemin, encodage = chemin + extension, candidat
+            break
+
+    response = send_file(chemin, mimetype=mimetypes.guess_type(fichier)[0],
+                         max_age=DUREE_CACHE, conditional=True)
+    if encodage:
+        response.headers['Content-Encoding'] = encodage
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def installer(app):
+    """Route /assets/ et fonction `statiques()` des templates"""
+    app.extensions['statiques'] = {}
+    app.add_url_rule('/assets/<fichier>', 'statiques', servir)
+    app.jinja_env.globals['statiques'] = balises
@@ -0,0 +1,242 @@
+"""
+Statistiques d'usage des recettes et ingrédients (agrégats par semaine).
+
+Deux tables d'agrégats, usage_recette (semaine, recette_id, nb) et
+usage_ingredient (semaine, ingredient_id, nb), sont tenues à jour par des
+triggers SQLite, comme les index de recherche: toute écriture sur le
+planning (création, remplacement, échange, suppression de menu, lots,
+copies de semaines, import) ou sur les ingrédients d'une recette est
+répercutée dans la même transaction. Un déplacement dans la semaine ne
+change pas les agrégats. Un ingrédient présent deux fois dans une recette
+(données antérieures au dédoublonnage) n'y compte qu'une fois, à l'ajout
+comme au retrait.
+
+Les statistiques se lisent sur ces agrégats (une ligne par semaine et par
+recette ou ingrédient) sans parcourir menu ni recette_ingredient: leur
+coût dépend de la période demandée, pas de la profondeur de l'historique.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func, select, text, tuple_
+
+from app import db
+from app.models import Ingredient, Recette, UsageIngredient, UsageRecette
+from app.pagination import decoder_curseur, encoder_curseur
+
+# Période par défaut des statistiques (semaines jusqu'à la semaine courante)
+SEMAINES_DEFAUT = 52
+
+LIMITE_MAX = 500
+
+
+def _ajouter_menu(ligne):
+    """Instructions de trigger comptant le menu `ligne` (new ou old) dans les agrégats"""
+    return (
+        f"INSERT INTO usage_recette (semaine, recette_id, nb) "
+        f"SELECT {ligne}.semaine, {ligne}.recette_id, 1 WHERE {ligne}.recette_id IS NOT NULL "
+        f"ON CONFLICT (semaine, recette_id) DO UPDATE SET nb = nb + 1; "
+        f"INSERT INTO usage_ingredient (semaine, ingredient_id, nb) "
+        f"SELECT DISTINCT {ligne}.semaine, ingredient_id, 1 FROM recette_ingredient "
+        f"WHERE recette_id = {ligne}.recette_id "
+        f"ON CONFLICT (semaine, ingredient_id) DO UPDATE SET nb = nb + 1;"
+    )
+
+
+def _retirer_menu(ligne):
+    """Instructions de trigger retirant le menu `ligne` des agrégats"""
+    return (
+        f"UPDATE usage_recette SET nb = nb - 1 "
+        f"WHERE semaine = {ligne}.semaine AND recette_id = {ligne}.recette_id; "
+        f"DELETE FROM usage_recette "
+        f"WHERE semaine = {ligne}.semaine AND recette_id = {ligne}.recette_id AND nb <= 0; "
+        f"UPDATE usage_ingredient SET nb = nb - 1 WHERE semaine = {ligne}.semaine "
+        f"AND ingredient_id IN (SELECT ingredient_id FROM recette_ingredient "
+        f"WHERE recette_id = {ligne}.recette_id); "
+        f"DELETE FROM usage_ingredient WHERE semaine = {ligne}.semaine AND nb <= 0;"
+    )
+
+
+def _ajouter_ingredient(ligne):
+    """
+    Instructions de trigger reportant une ligne de recette_ingredient sur
+    les semaines de sa recette, sauf si l'ingrédient y figure déjà
+    """
+    return (
+        f"INSERT INTO usage_ingredient (semaine, ingredient_id, nb) "
+        f"SELECT semaine, {ligne}.ingredient_id, nb FROM usage_recette "
+        f"WHERE recette_id = {ligne}.recette_id "
+        f"AND NOT EXISTS (SELECT 1 FROM recette_ingredient WHERE recette_id = {ligne}.recette_id "
+        f"AND ingredient_id = {ligne}.ingredient_id AND id != {ligne}.id) "
+        f"ON CONFLICT (semaine, ingredient_id) DO UPDATE SET nb = nb + excluded.nb;"
+    )
+
+
+def _retirer_ingredient(ligne):
+    """
+    Instructions de trigger retirant une ligne de recette_ingredient des
+    semaines de sa recette, si l'ingrédient n'y figure plus (exécutées
+    après l'écriture: `ligne` n'est plus dans la table)
+    """
+    return (
+        f"UPDATE usage_ingredient SET nb = nb - (SELECT u.nb FROM usage_recette u "
+        f"WHERE u.recette_id = {ligne}.recette_id AND u.semaine = usage_ingredient.semaine) "
+        f"WHERE ingredient_id = {ligne}.ingredient_id AND semaine IN "
+        f"(SELECT semaine FROM usage_recette WHERE recette_id = {ligne}.recette_id) "
+        f"AND NOT EXISTS (SELECT 1 FROM recette_ingredient WHERE recette_id = {ligne}.recette_id "
+        f"AND ingredient_id = {ligne}.ingredient_id); "
+        f"DELETE FROM usage_ingredient WHERE ingredient_id = {ligne}.ingredient_id AND nb <= 0 "
+        f"AND semaine IN (SELECT semaine FROM usage_recette WHERE recette_id = {ligne}.recette_id);"
+    )
+
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS usage_menu_ai AFTER INSERT ON menu "
+    f"BEGIN {_ajouter_menu('new')} END",
+    "CREATE TRIGGER IF NOT EXISTS usage_menu_ad AFTER DELETE ON menu "
+    f"BEGIN {_retirer_menu('old')} END",
+    "CREATE TRIGGER IF NOT EXISTS usage_menu_au AFTER UPDATE OF semaine, recette_id ON menu "
+    "WHEN old.semaine IS NOT new.semaine OR old.recette_id IS NOT new.recette_id "
+    f"BEGIN {_retirer_menu('old')} {_ajouter_menu('new')} END",
+    "CREATE TRIGGER IF NOT EXISTS usage_recette_ingredient_ai AFTER INSERT ON recette_ingredient "
+    f"BEGIN {_ajouter_ingredient('new')} END",
+    "CREATE TRIGGER IF NOT EXISTS usage_recette_ingredient_ad AFTER DELETE ON recette_ingredient "
+    f"BEGIN {_retirer_ingredient('old')} END",
+    "CREATE TRIGGER IF NOT EXISTS usage_recette_ingredient_au "
+    "AFTER UPDATE OF recette_id, ingredient_id ON recette_ingredient "
+    "WHEN old.recette_id IS NOT new.recette_id OR old.ingredient_id IS NOT new.ingredient_id "
+    f"BEGIN {_retirer_ingredient('old')} {_ajouter_ingredient('new')} END",
+]
+
+
+def creer_agregats():
+    """
+    Crée les tables d'agrégats et leurs triggers s'ils n'existent pas, puis
+    les remplit à partir du planning existant. Ne commite pas.
+    """
+    connexion = db.session.connection()
+    UsageRecette.__table__.create(connexion, checkfirst=True)
+    UsageIngredient.__table__.create(connexion, checkfirst=True)
+    for instruction in TRIGGERS:
+        db.session.execute(text(instruction))
+    reconstruire_agregats()
+
+
+def recreer_triggers():
+    """Remplace les triggers existants par ceux de TRIGGERS et recalcule les agrégats. Ne commite pas."""
+    for instruction in TRIGGERS:
+        nom = instruction.split('IF NOT EXISTS ', 1)[1].split(' ', 1)[0]
+        db.session.execute(text(f'DROP TRIGGER IF EXISTS {nom}'))
+        db.session.execute(text(instruction))
+    reconstruire_agregats()
+
+
+def reconstruire_agregats():
+    """Recalcule entièrement les agrégats à partir du planning. Ne commite pas."""
+    db.session.execute(text('DELETE FROM usage_recette'))
+    db.session.execute(text('DELETE FROM usage_ingredient'))
+    db.session.execute(text(
+        'INSERT INTO usage_recette (semaine, recette_id, nb) '
+        'SELECT semaine, recette_id, COUNT(*) FROM menu '
+        'WHERE recette_id IS NOT NULL GROUP BY semaine, recette_id'
+    ))
+    db.session.execute(text(
+        'INSERT INTO usage_ingredient (semaine, ingredient_id, nb) '
+        'SELECT u.semaine, ri.ingredient_id, SUM(u.nb) FROM usage_recette u '
+        'JOIN (SELECT DISTINCT recette_id, ingredient_id FROM recette_ingredient) ri '
+        'ON ri.recette_id = u.recette_id '
+        'GROUP BY u.semaine, ri.ingredient_id'
+    ))
+
+
+def periode_defaut(semaine_courante):
+    """(début, fin) des SEMAINES_DEFAUT semaines se terminant par `semaine_courante`"""
+    return semaine_courante - timedelta(weeks=SEMAINES_DEFAUT - 1), semaine_courante
+
+
+def usage_recette(recette_id, debut, fin):
+    """Nombre de cases occupées par la recette entre les lundis `debut` et `fin`, par semaine"""
+    semaines = [
+        {'semaine': semaine.isoformat(), 'nb': nb}
+        for semaine, nb in db.session.execute(
+            select(UsageRecette.semaine, UsageRecette.nb)
+            .where(UsageRecette.recette_id == recette_id)
+            .where(UsageRecette.semaine.between(debut, fin))
+            .order_by(UsageRecette.semaine)
+        )
+    ]
+    derniere = db.session.scalar(
+        select(func.max(UsageRecette.semaine)).where(UsageRecette.recette_id == recette_id)
+    )
+    return {
+        'total': sum(semaine['nb'] for semaine in semaines),
+        'semaines': semaines,
+        'derniere_semaine': derniere.isoformat() if derniere else None,
+    }
+
+
+def ingredients_frequents(debut, fin, categorie=None, limite=10):
+    """
+    Ingrédients les plus utilisés entre les lundis `debut` et `fin`, par
+    catégorie: {categorie: [{id, nom, nb}]} (au plus `limite` par catégorie).
+    """
+    total = func.sum(UsageIngredient.nb).label('nb')
+    par_ingredient = (
+        select(UsageIngredient.ingredient_id, total)
+        .where(UsageIngredient.semaine.between(debut, fin))
+        .group_by(UsageIngredient.ingredient_id)
+        .subquery()
+    )
+    rang = func.row_number().over(
+        partition_by=Ingredient.categorie,
+        order_by=(par_ingredient.c.nb.desc(), Ingredient.nom, Ingredient.id),
+    ).label('rang')
+    classement = (
+        select(Ingredient.categorie, Ingredient.id, Ingredient.nom, par_ingredient.c.nb, rang)
+        .join(par_ingredient, par_ingredient.c.ingredient_id == Ingredient.id)
+    )
+    if categorie:
+        classement = classement.where(Ingredient.categorie == categorie)
+    classement = classement.subquery()
+
+    resultat = {}
+    for categorie_ingredient, id, nom, nb in db.session.execute(
+        select(classement.c.categorie, classement.c.id, classement.c.nom, classement.c.nb)
+        .where(classement.c.rang <= limite)
+        .order_by(classement.c.categorie, classement.c.rang)
+    ):
+        resultat.setdefault(categorie_ingredient, []).append({'id': id, 'nom': nom, 'nb': nb})
+    return resultat
+
+
+def recettes_oubliees(depuis, curseur=None, limite=50):
+    """
+    Recettes absentes du planning depuis le lundi `depuis` (semaines
+    planifiées à venir comprises), triées par (nom, id) et paginées par
+    curseur. Retourne (recettes [{id, nom, derniere_semaine}], curseur suivant).
+    """
+    recentes = select(UsageRecette.recette_id).where(UsageRecette.semaine >= depuis)
+    requete = (
+        select(Recette.id, Recette.nom)
+        .where(Recette.id.not_in(recentes))
+        .order_by(Recette.nom, Recette.id)
+        .limit(limite + 1)
+    )
+    if curseur:
+        requete = requete.where(tuple_(Recette.nom, Recette.id) > decoder_curseur(curseur))
+    lignes = db.session.execute(requete).all()
+    suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        suivant = encoder_curseur(lignes[-1].nom, lignes[-1].id)
+
+    # Dernière semaine des seules recettes de la page (index recette_id, semaine)
+    dernieres = dict(db.session.execute(
+        select(UsageRecette.recette_id, func.max(UsageRecette.semaine))
+        .where(UsageRecette.recette_id.in_([ligne.id for ligne in lignes]))
+        .group_by(UsageRecette.recette_id)
+    ).all()) if lignes else {}
+    return [
+        {'id': ligne.id, 'nom': ligne.nom,
+         'derniere_semaine': dernieres[ligne.id].isoformat() if ligne.id in dernieres else None}
+        for ligne in lignes
+    ], suivant
@@ -0,0 +1,108 @@
+"""
+Conversion des quantités d'ingrédients vers des unités canoniques.
+
+Chaque unité du vocabulaire (Ingredient.UNITES, mêmes clés que
+FACTEURS) appartient à une dimension dont l'unité canonique sert aux
+calculs: masse en g, volume en ml, pièces et pincées. FACTEURS donne, pour chaque unité, son unité
+canonique et le facteur de conversion; les cuillères et la tasse sont des
+mesures de volume (c. à café = 5 ml, c. à soupe = 15 ml, tasse = 250 ml).
+Masse et volume ne se convertissent pas l'un en l'autre (densité
+inconnue): une liste de courses garde une ligne par ingrédient et par
+dimension.
+
+Les tables de correspondance (écritures acceptées, unités d'affichage)
+sont calculées une fois à l'import: une conversion est une lecture de
+dictionnaire.
+"""
+# unité -> (unité canonique, facteur)
+FACTEURS = {
+    'g': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'ml': ('ml', 1.0),
+    'cl': ('ml', 10.0),
+    'L': ('ml', 1000.0),
+    'c. à café': ('ml', 5.0),
+    'c. à soupe': ('ml', 15.0),
+    'cuillère': ('ml', 15.0),
+    'tasse': ('ml', 250.0),
+    'pièce': ('pièce', 1.0),
+    'pincée': ('pincée', 1.0),
+}
+
+# Autres écritures acceptées (comparées sans casse), dont 'unité', valeur
+# enregistrée autrefois par défaut pour les ingrédients de recette
+ALIAS = {
+    'unité': 'pièce', 'unite': 'pièce', 'piece': 'pièce', 'pièces': 'pièce', 'pcs': 'pièce',
+    'gr': 'g', 'gramme': 'g', 'grammes': 'g', 'kilo': 'kg',
+    'litre': 'L', 'litres': 'L', 'millilitre': 'ml', 'centilitre': 'cl',
+    'cs': 'c. à soupe', 'c.à.s': 'c. à soupe', 'cuillère à soupe': 'c. à soupe',
+    'cc': 'c. à café', 'c.à.c': 'c. à café', 'cuillère à café': 'c. à café',
+    'pincées': 'pincée', 'tasses': 'tasse',
+}
+
+# Unité canonique -> [(seuil, unité)]: la plus grande unité dont le seuil est
+# atteint est utilisée pour afficher une quantité
+AFFICHAGE = {
+    'g': [(1000.0, 'kg')],
+    'ml': [(1000.0, 'L')],
+}
+
+_UNITES = {
+    **{alias.casefold(): unite for alias, unite in ALIAS.items()},
+    **{unite.casefold(): unite for unite in FACTEURS},
+}
+
+
+def normaliser(unite):
+    """Unité du vocabulaire correspondant à `unite` (ValueError si inconnue)"""
+    try:
+        return _UNITES[' '.join(str(unite).split()).casefold()]
+    except (KeyError, AttributeError):
+        raise ValueError(f'Unité inconnue: {unite}')
+
+
+def vers_canonique(quantite, unite):
+    """
+    (quantité, unité canonique) pour une quantité exprimée en `unite`.
+    Une unité hors vocabulaire est conservée telle quelle.
+    """
+    canonique, facteur = FACTEURS.get(_UNITES.get(unite.casefold(), unite), (unite, 1.0))
+    return quantite * facteur, canonique
+
+
+def pour_affichage(quantite, canonique):
+    """(quantité arrondie, unité) lisible pour une quantité canonique"""
+    unite = canonique
+    for seuil, unite_affichage in AFFICHAGE.get(canonique, ()):
+        if quantite >= seuil:
+            unite = unite_affichage
+    return round(quantite / FACTEURS.get(unite, (canonique, 1.0))[1], 2), unite
+
+
+def formater(quantite):
+    """Quantité sans décimales inutiles: 1.5, 250, 0.25"""
+    return f'{round(quantite, 2):g}'
+
+
+def agreger(lignes):
+    """
+    Regroupe en une passe des lignes (categorie, ingredient_id, nom, unite,
+    quantite, count) par ingrédient et unité canonique: "500 g" et "1 kg"
+    donnent une seule ligne "1.5 kg". L'ordre d'arrivée des ingrédients
+    est conservé. Retourne des tuples (categorie, nom, unite, quantite, count).
+    """
+    totaux = {}
+    for categorie, ingredient_id, nom, unite, quantite, count in lignes:
+        quantite, canonique = vers_canonique(quantite or 0, unite)
+        cle = (ingredient_id, canonique)
+        total = totaux.get(cle)
+        if total is None:
+            totaux[cle] = [categorie, nom, quantite, count]
+        else:
+            total[2] += quantite
+            total[3] += count
+    resultat = []
+    for (_, canonique), (categorie, nom, quantite, count) in totaux.items():
+        quantite, unite = pour_affichage(quantite, canonique)
+        resultat.append((categorie, nom, unite, quantite, count))
+    return resultat
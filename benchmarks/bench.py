@@ -0,0 +1,178 @@
+"""
+Benchmark des endpoints sur une base synthétique (voir benchmarks/generer.py).
+
+    python -m benchmarks.bench --base benchmarks/data/moyen.db --sortie resultats.json
+    python -m benchmarks.bench --base ... --comparer ancien.json
+
+Chaque endpoint est appelé via le client de test Flask (sans réseau):
+durées min / médiane / p95 / max en millisecondes et nombre de requêtes
+SQL par appel. Les résultats sont écrits en JSON pour comparer deux
+exécutions (--comparer affiche l'écart des médianes et des requêtes).
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def _lundi():
+    aujourd_hui = date.today()
+    return aujourd_hui - timedelta(days=aujourd_hui.weekday())
+
+
+def _vider_cache_pdf():
+    from app import export_pdf
+    if export_pdf._cache is not None:
+        export_pdf._cache.clear()
+
+
+# (nom, méthode, url, corps JSON, préparation avant chaque appel)
+ENDPOINTS = [
+    ('index', 'GET', '/', None, None),
+    ('index_historique', 'GET', '/?week=-30', None, None),
+    ('get_shopping_list', 'GET', '/api/shopping-list?week=0', None, None),
+    ('get_shopping_list_4_semaines', 'GET', '/api/shopping-list?from=-3&to=0', None, None),
+    ('get_menus_equilibre', 'POST', '/api/menus/equilibre',
+     lambda: {'semaine': _lundi().isoformat()}, None),
+    ('export_shopping_list_pdf', 'GET', '/liste-courses/export-pdf?week=0', None, _vider_cache_pdf),
+    ('export_shopping_list_pdf_cache', 'GET', '/liste-courses/export-pdf?week=0', None, None),
+    ('get_ingredients', 'GET', '/api/ingredients', None, None),
+    ('get_recettes', 'GET', '/api/recettes', None, None),
+    ('recettes', 'GET', '/recettes', None, None),
+    ('ingredients', 'GET', '/ingredients', None, None),
+    ('search', 'GET', '/api/search?q=poul&type=tous', None, None),
+]
+
+
+def _centile(valeurs, centile):
+    triees = sorted(valeurs)
+    return triees[min(len(triees) - 1, round(centile / 100 * (len(triees) - 1)))]
+
+
+def mesurer(client, compteur, methode, url, corps, preparation, repetitions, echauffement):
+    """Appelle l'endpoint et retourne ses statistiques de durée et de requêtes SQL"""
+    durees = []
+    requetes = []
+    statut = None
+    for iteration in range(echauffement + repetitions):
+        if preparation:
+            preparation()
+        compteur['n'] = 0
+        debut = time.perf_counter()
+        reponse = client.open(url, method=methode, json=corps() if corps else None)
+        reponse.get_data()
+        duree = (time.perf_counter() - debut) * 1000
+        statut = reponse.status_code
+        if iteration >= echauffement:
+            durees.append(duree)
+            requetes.append(compteur['n'])
+    return {
+        'statut': statut,
+        'min_ms': round(min(durees), 3),
+        'mediane_ms': round(statistics.median(durees), 3),
+        'p95_ms': round(_centile(durees, 95), 3),
+        'max_ms': round(max(durees), 3),
+        'requetes_sql': max(requetes),
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executer(base, repetitions=20, echauffement=2, filtre=None):
+    """Exécute le benchmark sur le fichier SQLite `base` et retourne le rapport"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(base)}'
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.models import Ingredient, Recette, RecetteIngredient, Menu
+
+    app = create_app()
+    compteur = {'n': 0}
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _compter(conn, cursor, statement, parameters, context, executemany):
+            compteur['n'] += 1
+
+        volumes = {modele.__tablename__: db.session.query(modele).count()
+                   for modele in (Ingredient, Recette, RecetteIngredient, Menu)}
+
+    client = app.test_client()
+    resultats = {}
+    for nom, methode, url, corps, preparation in ENDPOINTS:
+        if filtre and filtre not in nom:
+            continue
+        resultats[nom] = mesurer(client, compteur, methode, url, corps, preparation,
+                                 repetitions, echauffement)
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'revision': _revision(),
+            'python': platform.python_version(),
+            'base': os.path.basename(base),
+            'volumes': volumes,
+            'repetitions': repetitions,
+        },
+        'resultats': resultats,
+    }
+
+
+def comparer(ancien, nouveau):
+    """Lignes de comparaison des médianes et du nombre de requêtes SQL"""
+    lignes = []
+    for nom, mesure in nouveau['resultats'].items():
+        reference = ancien['resultats'].get(nom)
+        if reference is None:
+            lignes.append(f'{nom:<32} {mesure["mediane_ms"]:9.2f} ms   (nouveau)')
+            continue
+        ecart = (mesure['mediane_ms'] / reference['mediane_ms'] - 1) * 100 if reference['mediane_ms'] else 0
+        lignes.append(
+            f'{nom:<32} {reference["mediane_ms"]:9.2f} -> {mesure["mediane_ms"]:9.2f} ms '
+            f'({ecart:+6.1f} %)   SQL {reference["requetes_sql"]} -> {mesure["requetes_sql"]}'
+        )
+    return lignes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark des endpoints Routinerie')
+    parser.add_argument('--base', required=True, help='Base générée par benchmarks.generer')
+    parser.add_argument('--repetitions', type=int, default=20)
+    parser.add_argument('--echauffement', type=int, default=2)
+    parser.add_argument('--filtre', help='Ne mesurer que les endpoints dont le nom contient ce texte')
+    parser.add_argument('--sortie', help='Fichier JSON des résultats')
+    parser.add_argument('--comparer', help='Résultats JSON de référence')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.base):
+        sys.exit(f'❌ Base introuvable: {args.base} (python -m benchmarks.generer)')
+
+    rapport = executer(args.base, args.repetitions, args.echauffement, args.filtre)
+
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+
+    if args.comparer:
+        with open(args.comparer, encoding='utf-8') as fichier:
+            lignes = comparer(json.load(fichier), rapport)
+    else:
+        lignes = [
+            f'{nom:<32} médiane {m["mediane_ms"]:9.2f} ms   p95 {m["p95_ms"]:9.2f} ms   '
+            f'SQL {m["requetes_sql"]:3d}   HTTP {m["statut"]}'
+            for nom, m in rapport['resultats'].items()
+        ]
+    print('\n'.join(lignes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Générateur de bases synthétiques pour les benchmarks.
+
+    python -m benchmarks.generer --echelle moyen --sortie benchmarks/data/moyen.db
+
+Les données passent par les vrais modèles (insertions ORM groupées: valeurs
+par défaut, triggers de recherche et version du catalogue compris) puis
+Recette.recalculer_equilibre(). Une même graine produit la même base.
+"""
+import argparse
+from datetime import date, timedelta
+import os
+import random
+import sys
+import time
+
+# Échelles: (recettes, ingrédients, années d'historique de menus)
+ECHELLES = {
+    'petit': (100, 300, 1),
+    'moyen': (10_000, 2_000, 3),
+    'grand': (100_000, 5_000, 5),
+}
+
+# Part des cases du planning occupées par un menu
+TAUX_REMPLISSAGE = 0.85
+
+TAILLE_LOT = 5_000
+
+BASES_INGREDIENTS = {
+    'Légumes': ['Carotte', 'Courgette', 'Épinard', 'Poireau', 'Tomate', 'Brocoli', 'Céleri', 'Poivron',
+                'Aubergine', 'Chou-fleur', 'Haricot vert', 'Oignon', 'Échalote', 'Navet', 'Potiron'],
+    'Fruits': ['Pomme', 'Poire', 'Citron', 'Orange', 'Fraise', 'Framboise', 'Abricot', 'Pêche',
+               'Banane', 'Mangue', 'Ananas', 'Cerise'],
+    'Viandes': ['Poulet', 'Bœuf', 'Porc', 'Agneau', 'Dinde', 'Canard', 'Veau', 'Lardons', 'Jambon'],
+    'Poissons': ['Saumon', 'Cabillaud', 'Thon', 'Crevette', 'Sardine', 'Maquereau', 'Colin', 'Moule'],
+    'Produits laitiers': ['Lait', 'Crème', 'Yaourt', 'Comté', 'Emmental', 'Chèvre', 'Mozzarella',
+                          'Parmesan', 'Fromage blanc', 'Œuf'],
+    'Céréales & Féculents': ['Riz', 'Pâtes', 'Pomme de terre', 'Semoule', 'Quinoa', 'Lentille',
+                             'Pois chiche', 'Pain', 'Farine', 'Boulgour'],
+    'Épices & Condiments': ['Sel', 'Poivre', 'Cumin', 'Curry', 'Paprika', 'Moutarde', 'Thym',
+                            'Laurier', 'Basilic', 'Persil', 'Ail', 'Gingembre'],
+    'Huiles & Matières grasses': ['Huile d\'olive', 'Beurre', 'Huile de colza', 'Margarine',
+                                  'Huile de sésame'],
+    'Sucres & Produits sucrés': ['Sucre', 'Miel', 'Chocolat', 'Confiture', 'Sirop d\'érable',
+                                 'Cassonade'],
+    'Boissons': ['Vin blanc', 'Vin rouge', 'Bouillon', 'Bière', 'Jus d\'orange', 'Lait de coco'],
+    'Autre': ['Levure', 'Gélatine', 'Fécule', 'Chapelure', 'Tofu'],
+}
+
+QUALIFICATIFS = ['', 'bio', 'frais', 'surgelé', 'fumé', 'râpé', 'en conserve', 'de saison',
+                 'fermier', 'entier', 'émincé', 'sec', 'du marché', 'extra', 'léger', 'local']
+
+PLATS = ['Gratin', 'Curry', 'Salade', 'Poêlée', 'Risotto', 'Tarte', 'Soupe', 'Wok', 'Cake',
+         'Ragoût', 'Velouté', 'Tajine', 'Quiche', 'Lasagnes', 'Brochettes', 'Crumble', 'Clafoutis']
+
+STYLES = ['maison', 'du dimanche', 'express', 'à l\'ancienne', 'de grand-mère', 'provençal',
+          'épicé', 'gourmand', 'léger', 'au four', 'minute', 'd\'été', 'd\'hiver']
+
+UNITES_RECETTE = ['g', 'ml', 'pièce', 'c. à soupe', 'c. à café', 'pincée']
+
+
+def generer_ingredients(alea, nombre):
+    """Lignes d'ingrédients aux noms uniques, répartis sur toutes les catégories"""
+    from app.models import Ingredient
+
+    candidats = []
+    for categorie in Ingredient.CATEGORIES:
+        for base in BASES_INGREDIENTS[categorie]:
+            for qualificatif in QUALIFICATIFS:
+                candidats.append((f'{base} {qualificatif}'.strip(), categorie))
+    alea.shuffle(candidats)
+
+    lignes = []
+    for index in range(nombre):
+        nom, categorie = candidats[index % len(candidats)]
+        if index >= len(candidats):
+            nom = f'{nom} n°{index // len(candidats) + 1}'
+        lignes.append({
+            'id': index + 1,
+            'nom': nom,
+            'categorie': categorie,
+            'unite': alea.choice(Ingredient.UNITES),
+        })
+    return lignes
+
+
+def generer_recettes(alea, nombre, ingredients):
+    """Lignes de recettes et de leurs ingrédients (3 à 12 par recette)"""
+    recettes = []
+    liens = []
+    for recette_id in range(1, nombre + 1):
+        composition = alea.sample(ingredients, alea.randint(3, 12))
+        principal = composition[0]['nom']
+        nom = f'{alea.choice(PLATS)} {principal.lower()} {alea.choice(STYLES)}'
+        recettes.append({
+            'id': recette_id,
+            'nom': nom,
+            'description': f'{nom.capitalize()} avec ' + ', '.join(i['nom'].lower() for i in composition[1:4]) + '.',
+            'temps_preparation': alea.choice([10, 15, 20, 30, 45, 60, 90, 120]),
+            'portions': alea.choice([1, 2, 4, 4, 4, 6, 8]),
+        })
+        for ingredient in composition:
+            unite = alea.choice(UNITES_RECETTE)
+            liens.append({
+                'recette_id': recette_id,
+                'ingredient_id': ingredient['id'],
+                'quantite': float(alea.randint(1, 50) * (10 if unite in ('g', 'ml') else 1)),
+                'unite': unite,
+            })
+    return recettes, liens
+
+
+def generer_menus(alea, nb_recettes, annees, semaines_futures=4):
+    """
+    Historique des menus: chaque case (semaine, jour, moment) des `annees`
+    passées est occupée avec la probabilité TAUX_REMPLISSAGE; la popularité
+    des recettes suit une loi de Zipf (quelques recettes reviennent souvent).
+    """
+    from app.models import Menu
+
+    aujourd_hui = date.today()
+    lundi = aujourd_hui - timedelta(days=aujourd_hui.weekday())
+    semaines = [lundi + timedelta(weeks=decalage)
+                for decalage in range(-52 * annees, semaines_futures + 1)]
+
+    poids = [1 / (rang + 1) ** 0.8 for rang in range(nb_recettes)]
+    ordre = list(range(1, nb_recettes + 1))
+    alea.shuffle(ordre)
+
+    cases = [(semaine, jour, moment)
+             for semaine in semaines for jour in Menu.JOURS for moment in Menu.MOMENTS
+             if alea.random() < TAUX_REMPLISSAGE]
+    choix = alea.choices(ordre, weights=poids, k=len(cases))
+    return [{'semaine': semaine, 'jour': jour, 'moment': moment, 'recette_id': recette_id}
+            for (semaine, jour, moment), recette_id in zip(cases, choix)]
+
+
+def _inserer(modele, lignes):
+    from sqlalchemy import insert
+    from app import db
+
+    for debut in range(0, len(lignes), TAILLE_LOT):
+        db.session.execute(insert(modele), lignes[debut:debut + TAILLE_LOT])
+
+
+def generer(nb_recettes, nb_ingredients, annees, graine=42):
+    """Remplit la base de l'application courante (qui doit être vide)"""
+    from app import db
+    from app.models import Ingredient, Recette, RecetteIngredient, Menu
+
+    if db.session.query(Recette.id).first() or db.session.query(Ingredient.id).first():
+        raise RuntimeError('La base cible doit être vide')
+
+    alea = random.Random(graine)
+    ingredients = generer_ingredients(alea, nb_ingredients)
+    recettes, liens = generer_recettes(alea, nb_recettes, ingredients)
+    menus = generer_menus(alea, nb_recettes, annees)
+
+    _inserer(Ingredient, ingredients)
+    _inserer(Recette, recettes)
+    _inserer(RecetteIngredient, liens)
+    _inserer(Menu, menus)
+    Recette.recalculer_equilibre()
+    db.session.commit()
+
+    return {
+        'ingredients': len(ingredients),
+        'recettes': len(recettes),
+        'recette_ingredients': len(liens),
+        'menus': len(menus),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Génère une base SQLite synthétique')
+    parser.add_argument('--echelle', choices=ECHELLES, default='petit')
+    parser.add_argument('--recettes', type=int, help="Nombre de recettes (remplace l'échelle)")
+    parser.add_argument('--ingredients', type=int, help="Nombre d'ingrédients (remplace l'échelle)")
+    parser.add_argument('--annees', type=int, help="Années d'historique (remplace l'échelle)")
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--sortie', help='Fichier SQLite (défaut: benchmarks/data/<echelle>.db)')
+    parser.add_argument('--ecraser', action='store_true', help='Remplacer le fichier existant')
+    args = parser.parse_args()
+
+    nb_recettes, nb_ingredients, annees = ECHELLES[args.echelle]
+    nb_recettes = args.recettes or nb_recettes
+    nb_ingredients = args.ingredients or nb_ingredients
+    annees = args.annees or annees
+
+    sortie = os.path.abspath(args.sortie or os.path.join(
+        os.path.dirname(__file__), 'data', f'{args.echelle}.db'))
+    if os.path.exists(sortie):
+        if not args.ecraser:
+            sys.exit(f'❌ {sortie} existe déjà (--ecraser pour le remplacer)')
+        os.remove(sortie)
+    os.makedirs(os.path.dirname(sortie), exist_ok=True)
+
+    # La base doit être choisie avant la création de l'application
+    os.environ['DATABASE_URL'] = f'sqlite:///{sortie}'
+    from app import create_app
+
+    debut = time.perf_counter()
+    with create_app().app_context():
+        totaux = generer(nb_recettes, nb_ingredients, annees, args.graine)
+    duree = time.perf_counter() - debut
+
+    print(f'✅ {sortie} généré en {duree:.1f} s')
+    for table, total in totaux.items():
+        print(f'   {table}: {total}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -11,3 +12,51 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'database.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Taille maximale du cache des exports PDF de listes de courses (octets)
+    PDF_CACHE_MAX_OCTETS = int(os.environ.get('PDF_CACHE_MAX_OCTETS', 16 * 1024 * 1024))
+    # Pagination des listes (recettes, ingrédients)
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+    PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 500))
+    # Profil SQLite appliqué à chaque connexion: performance, durable ou defaut
+    SQLITE_PROFIL = os.environ.get('SQLITE_PROFIL', 'performance')
+    # Surcharges individuelles des PRAGMA du profil (None = valeur du profil)
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS'),
+        'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT'),
+        'cache_size': os.environ.get('SQLITE_CACHE_SIZE'),
+        'mmap_size': os.environ.get('SQLITE_MMAP_SIZE'),
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE'),
+    }
+    # Pool de connexions par worker
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # Instrumentation par requête: en-tête Server-Timing, requêtes SQL lentes
+    # (ms) et détection N+1 (même instruction répétée plus de N fois, 0 = inactif)
+    INSTRUMENTATION = os.environ.get('INSTRUMENTATION', '1').lower() in ('1', 'true', 'yes', 'on')
+    SQL_LENTE_MS = float(os.environ.get('SQL_LENTE_MS', 100))
+    N_PLUS_1_SEUIL = int(os.environ.get('N_PLUS_1_SEUIL', 0))
+    # Métriques Prometheus (/metrics); avec plusieurs workers, METRICS_DIR est
+    # le répertoire partagé où chaque worker dépose ses valeurs
+    METRICS = os.environ.get('METRICS', '1').lower() in ('1', 'true', 'yes', 'on')
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_SECONDES = float(os.environ.get('METRICS_FLUSH_SECONDES', 1))
+    # Sauvegardes à chaud (flask sauvegarder, POST /api/admin/backup): pages
+    # copiées par étape, pause entre deux étapes (s) et rétention (jours)
+    BACKUP_DIR = os.environ.get('BACKUP_DIR') or os.path.join(basedir, 'backups')
+    BACKUP_PAGES = int(os.environ.get('BACKUP_PAGES', 256))
+    BACKUP_PAUSE = float(os.environ.get('BACKUP_PAUSE', 0.005))
+    BACKUP_RETENTION_JOURS = int(os.environ.get('BACKUP_RETENTION_JOURS', 30))
+    # Jeton des endpoints d'administration (en-tête X-Admin-Token); non défini = désactivés
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    # Exports PDF en arrière-plan: répertoire partagé des travaux, rendus
+    # simultanés (toute la machine), travaux en attente par worker, durée de
+    # conservation des travaux et de leurs fichiers (s)
+    PDF_TRAVAUX_DIR = os.environ.get('PDF_TRAVAUX_DIR') or \
+        os.path.join(tempfile.gettempdir(), 'routinerie-pdf')
+    PDF_RENDUS_MAX = int(os.environ.get('PDF_RENDUS_MAX', 2))
+    PDF_FILE_MAX = int(os.environ.get('PDF_FILE_MAX', 8))
+    PDF_TRAVAUX_TTL = int(os.environ.get('PDF_TRAVAUX_TTL', 600))
+    # Sources CSS/JS non compilées même si static/dist/ existe (toujours le cas en debug)
+    STATIQUES_SOURCES = os.environ.get('STATIQUES_SOURCES', '0').lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,96 @@
+"""
+Configuration gunicorn de production.
+
+    gunicorn -c gunicorn.conf.py          (ou: python run_production.py)
+
+Chaque réglage se surcharge par une variable d'environnement GUNICORN_*.
+Par défaut: 2 x CPU + 1 workers de 2 threads (gthread), application
+préchargée dans le master puis partagée par fork, workers recyclés après
+MAX_REQUESTS requêtes.
+
+Rechargement gracieux: `kill -HUP <master>` relance les workers sans
+couper les connexions en cours. Avec preload_app, le code est chargé par
+le master: pour déployer une nouvelle version, utiliser USR2 (nouveau
+master) puis WINCH/TERM sur l'ancien, ou GUNICORN_PRELOAD=0.
+"""
+import multiprocessing
+import os
+import tempfile
+
+
+def _entier(nom, defaut):
+    return int(os.environ.get(nom, defaut))
+
+
+def _booleen(nom, defaut):
+    return os.environ.get(nom, '1' if defaut else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+# Répertoire partagé des métriques: /metrics agrège tous les workers
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'routinerie-metriques'))
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5001)}")
+
+# Parallélisme: processus pour le CPU (rendu PDF, JSON), threads pour les E/S
+workers = _entier('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+threads = _entier('GUNICORN_THREADS', 2)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# L'application (et le schéma) est préparée une seule fois dans le master
+preload_app = _booleen('GUNICORN_PRELOAD', True)
+
+# Recyclage des workers (fuites mémoire, cache PDF), décalé pour éviter
+# que tous redémarrent en même temps
+max_requests = _entier('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _entier('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+keepalive = _entier('GUNICORN_KEEPALIVE', 5)
+timeout = _entier('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _entier('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = os.environ.get('GUNICORN_ERRORLOG', '-')
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def on_starting(server):
+    """
+    Efface les métriques laissées par une exécution précédente et compile
+    les paquets statiques (static/dist/) avant le démarrage des workers
+    """
+    from app import metriques, statiques
+    metriques.vider_repertoire(os.environ['METRICS_DIR'])
+    statiques.construire(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+
+
+def worker_exit(server, worker):
+    """Dernier instantané des métriques du worker avant sa sortie"""
+    from app import metriques
+    if os.path.isdir(os.environ['METRICS_DIR']):
+        metriques.enregistrer(os.environ['METRICS_DIR'])
+
+
+def child_exit(server, worker):
+    """Ajoute les métriques du worker terminé à l'archive (fichiers bornés)"""
+    from app import metriques
+    if os.path.isdir(os.environ['METRICS_DIR']):
+        metriques.archiver_processus(os.environ['METRICS_DIR'], worker.pid)
+
+
+def post_fork(server, worker):
+    """
+    Le worker hérite des connexions SQLite ouvertes par le master au
+    préchargement: un descripteur SQLite ne doit pas être partagé entre
+    processus. On vide le pool sans fermer ces connexions (elles restent
+    celles du master); le worker ouvrira les siennes. Ses métriques
+    repartent aussi de zéro.
+    """
+    from app import db, metriques
+    metriques.reinitialiser()
+    if not server.cfg.preload_app:
+        return
+    application = server.app.wsgi()
+    with application.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -1,7 +1,21 @@
-from app import create_app
+"""
+Lancement en production (Docker): gunicorn avec gunicorn.conf.py.
+Les réglages (workers, threads, port...) se font par variables GUNICORN_*.
+"""
+import os
+import sys
+
+
+def main():
+    racine = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(racine)
+    # Remplace le processus courant par le master gunicorn (signaux, PID 1)
+    os.execvp(sys.executable, [
+        sys.executable, '-m', 'gunicorn',
+        '-c', os.path.join(racine, 'gunicorn.conf.py'),
+        *sys.argv[1:]
+    ])
 
-app = create_app()
 
 if __name__ == '__main__':
-    # Mode production pour Docker
-    app.run(host='0.0.0.0', port=5001, debug=False)
+    main()
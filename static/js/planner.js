@@ -11,16 +11,41 @@ document.addEventListener('DOMContentLoaded', function() {
     const ingredientsListDiv = document.getElementById('ingredients-list');
     const addIngredientBtn = document.getElementById('add-ingredient-btn');
     
+    // Unités proposées pour les ingrédients de recette (Ingredient.UNITES)
+    const UNITES = ['g', 'kg', 'ml', 'cl', 'L', 'pièce', 'c. à soupe', 'c. à café', 'cuillère', 'tasse', 'pincée'];
+    
+    // Ligne d'ingrédient avec quantité et unité modifiables (unité vide = celle de l'ingrédient)
+    function ingredientRow(list, index, onRemove) {
+        const ing = list[index];
+        const div = document.createElement('div');
+        div.style.cssText = 'display: flex; align-items: center; gap: 0.5rem; margin-bottom: 0.3rem; padding: 0.3rem; background: #ecf0f1; border-radius: 4px;';
+        const options = UNITES.map(unite =>
+            `<option value="${unite}" ${ing.unite === unite ? 'selected' : ''}>${unite}</option>`
+        ).join('');
+        div.innerHTML = `
+            <span style="flex: 1;">${ing.nom}</span>
+            <input type="number" min="0" step="any" value="${ing.quantite ?? 1}" style="width: 5rem;" aria-label="Quantité">
+            <select style="width: 7rem;" aria-label="Unité"><option value="">unité par défaut</option>${options}</select>
+            <button type="button" class="btn-icon btn-icon-danger" style="width: 30px; height: 30px; font-size: 0.8rem;">🗑</button>
+        `;
+        div.querySelector('input').addEventListener('input', e => { ing.quantite = e.target.value; });
+        div.querySelector('select').addEventListener('change', e => { ing.unite = e.target.value || null; });
+        div.querySelector('button').addEventListener('click', () => onRemove(index));
+        return div;
+    }
+    
+    function ingredientsPayload(list) {
+        return list.map(ing => ({
+            ingredient_id: ing.ingredient_id,
+            quantite: ing.quantite ?? 1,
+            unite: ing.unite || null
+        }));
+    }
+    
     function renderIngredientsList() {
         ingredientsListDiv.innerHTML = '';
         ingredientsList.forEach((ing, index) => {
-            const div = document.createElement('div');
-            div.style.cssText = 'display: flex; align-items: center; gap: 0.5rem; margin-bottom: 0.3rem; padding: 0.3rem; background: #ecf0f1; border-radius: 4px;';
-            div.innerHTML = `
-                <span style="flex: 1;">${ing.nom}</span>
-                <button type="button" class="btn-icon btn-icon-danger" style="width: 30px; height: 30px; font-size: 0.8rem;" onclick="removeIngredient(${index})">🗑</button>
-            `;
-            ingredientsListDiv.appendChild(div);
+            ingredientsListDiv.appendChild(ingredientRow(ingredientsList, index, window.removeIngredient));
         });
     }
     
@@ -29,34 +54,27 @@ document.addEventListener('DOMContentLoaded', function() {
         renderIngredientsList();
     };
     
-    // Système de recherche d'ingrédients pour le modal de création
-    let allIngredients = [];
-    let selectedIngredient = null;
-    const ingredientSearch = document.getElementById('ingredient-search');
-    const ingredientSuggestions = document.getElementById('ingredient-suggestions');
-    
-    // Charger tous les ingrédients au démarrage
-    async function loadAllIngredients() {
+    // Recherche plein texte côté serveur (insensible aux accents, par préfixe)
+    async function searchCatalogue(type, searchText) {
+        const search = searchText.trim();
+        if (!search) return [];
+        
         try {
-            const response = await apiRequest('/api/ingredients');
-            allIngredients = response;
-            console.log('Ingrédients chargés:', allIngredients.length);
+            const response = await apiRequest(`/api/search?type=${type}&limit=10&q=${encodeURIComponent(search)}`);
+            return response[type] || [];
         } catch (error) {
-            console.error('Erreur lors du chargement des ingrédients:', error);
+            console.error('Erreur lors de la recherche:', error);
+            return [];
         }
     }
     
-    loadAllIngredients();
+    // Système de recherche d'ingrédients pour le modal de création
+    let selectedIngredient = null;
+    const ingredientSearch = document.getElementById('ingredient-search');
+    const ingredientSuggestions = document.getElementById('ingredient-suggestions');
     
     function filterIngredients(searchText) {
-        const search = searchText.toLowerCase().trim();
-        if (!search) return [];
-        
-        const filtered = allIngredients.filter(ing => 
-            ing.nom.toLowerCase().includes(search)
-        ).slice(0, 10); // Limite à 10 suggestions
-        console.log('Recherche:', search, '- Résultats:', filtered.length);
-        return filtered;
+        return searchCatalogue('ingredients', searchText);
     }
     
     function showIngredientSuggestions(ingredients) {
@@ -93,10 +111,13 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     if (ingredientSearch) {
-        ingredientSearch.addEventListener('input', (e) => {
-            const filtered = filterIngredients(e.target.value);
-            showIngredientSuggestions(filtered);
+        ingredientSearch.addEventListener('input', async (e) => {
+            const searchText = e.target.value;
             selectedIngredient = null;
+            const filtered = await filterIngredients(searchText);
+            // Ignorer les réponses arrivées après une nouvelle saisie
+            if (ingredientSearch.value !== searchText) return;
+            showIngredientSuggestions(filtered);
         });
         
         ingredientSearch.addEventListener('keydown', (e) => {
@@ -152,34 +173,13 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Système de recherche de recettes pour le modal menu
-    let allRecettes = [];
     let selectedRecette = null;
     const menuRecetteSearch = document.getElementById('menu-recette-search');
     const menuRecetteInput = document.getElementById('menu-recette');
     const menuRecetteSuggestions = document.getElementById('menu-recette-suggestions');
     
-    // Charger toutes les recettes au démarrage
-    async function loadAllRecettes() {
-        try {
-            const response = await apiRequest('/api/recettes');
-            allRecettes = response;
-            console.log('Recettes chargées:', allRecettes.length);
-        } catch (error) {
-            console.error('Erreur lors du chargement des recettes:', error);
-        }
-    }
-    
-    loadAllRecettes();
-    
     function filterRecettes(searchText) {
-        const search = searchText.toLowerCase().trim();
-        if (!search) return [];
-        
-        const filtered = allRecettes.filter(rec => 
-            rec.nom.toLowerCase().includes(search)
-        ).slice(0, 10); // Limite à 10 suggestions
-        console.log('Recherche recette:', search, '- Résultats:', filtered.length);
-        return filtered;
+        return searchCatalogue('recettes', searchText);
     }
     
     function showRecetteSuggestions(recettes) {
@@ -233,7 +233,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Afficher les ingrédients
                 if (recette.ingredients && recette.ingredients.length > 0) {
                     ingredientsDiv.innerHTML = recette.ingredients.map(ing => 
-                        `<div style="padding: 0.3rem 0;">• ${ing.ingredient_nom}</div>`
+                        `<div style="padding: 0.3rem 0;">• ${ing.quantite} ${ing.unite} ${ing.ingredient_nom}</div>`
                     ).join('');
                 } else {
                     ingredientsDiv.innerHTML = '<div style="padding: 0.3rem 0;">Aucun ingrédient</div>';
@@ -264,9 +264,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     if (menuRecetteSearch) {
-        menuRecetteSearch.addEventListener('input', (e) => {
-            const filtered = filterRecettes(e.target.value);
-            showRecetteSuggestions(filtered);
+        menuRecetteSearch.addEventListener('input', async (e) => {
+            const searchText = e.target.value;
             selectedRecette = null;
             menuRecetteInput.value = '';
             
@@ -276,6 +275,11 @@ document.addEventListener('DOMContentLoaded', function() {
             if (editRecipeBtn) {
                 editRecipeBtn.style.display = 'none';
             }
+            
+            const filtered = await filterRecettes(searchText);
+            // Ignorer les réponses arrivées après une nouvelle saisie
+            if (menuRecetteSearch.value !== searchText) return;
+            showRecetteSuggestions(filtered);
         });
         
         menuRecetteSearch.addEventListener('keydown', (e) => {
@@ -321,13 +325,7 @@ document.addEventListener('DOMContentLoaded', function() {
     function renderEditIngredientsList() {
         editIngredientsListDiv.innerHTML = '';
         editIngredientsList.forEach((ing, index) => {
-            const div = document.createElement('div');
-            div.style.cssText = 'display: flex; align-items: center; gap: 0.5rem; margin-bottom: 0.3rem; padding: 0.3rem; background: #ecf0f1; border-radius: 4px;';
-            div.innerHTML = `
-                <span style="flex: 1;">${ing.nom}</span>
-                <button type="button" class="btn-icon btn-icon-danger" style="width: 30px; height: 30px; font-size: 0.8rem;" onclick="removeEditIngredient(${index})">🗑</button>
-            `;
-            editIngredientsListDiv.appendChild(div);
+            editIngredientsListDiv.appendChild(ingredientRow(editIngredientsList, index, window.removeEditIngredient));
         });
     }
     
@@ -373,10 +371,13 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     if (editIngredientSearch) {
-        editIngredientSearch.addEventListener('input', (e) => {
-            const filtered = filterIngredients(e.target.value);
-            showEditIngredientSuggestions(filtered);
+        editIngredientSearch.addEventListener('input', async (e) => {
+            const searchText = e.target.value;
             editSelectedIngredient = null;
+            const filtered = await filterIngredients(searchText);
+            // Ignorer les réponses arrivées après une nouvelle saisie
+            if (editIngredientSearch.value !== searchText) return;
+            showEditIngredientSuggestions(filtered);
         });
         
         editIngredientSearch.addEventListener('keydown', (e) => {
@@ -516,7 +517,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     // Charger les ingrédients
                     editIngredientsList = recette.ingredients.map(ing => ({
                         ingredient_id: ing.ingredient_id,
-                        nom: ing.ingredient_nom
+                        nom: ing.ingredient_nom,
+                        quantite: ing.quantite,
+                        unite: ing.unite
                     }));
                     renderEditIngredientsList();
                     
@@ -614,6 +617,38 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Copie de la semaine affichée vers la suivante (une seule requête)
+    const copyWeekBtn = document.getElementById('copy-week');
+    
+    if (copyWeekBtn) {
+        copyWeekBtn.addEventListener('click', async () => {
+            if (!confirm('Copier les menus de cette semaine vers la semaine suivante ? Ses menus actuels seront remplacés.')) {
+                return;
+            }
+            
+            const semaine = document.getElementById('menu-semaine').value;
+            const cible = new Date(semaine + 'T00:00:00Z');
+            cible.setUTCDate(cible.getUTCDate() + 7);
+            
+            try {
+                const result = await apiRequest('/api/week/copy', 'POST', {
+                    source: semaine,
+                    cible: cible.toISOString().slice(0, 10)
+                });
+                
+                if (result.success) {
+                    const urlParams = new URLSearchParams(window.location.search);
+                    const currentWeek = parseInt(urlParams.get('week') || '0');
+                    window.location.href = '/?week=' + (currentWeek + 1);
+                } else {
+                    showNotification(result.message || 'Erreur lors de la copie', 'error');
+                }
+            } catch (error) {
+                showNotification('Erreur lors de la copie de la semaine', 'error');
+            }
+        });
+    }
+    
     // Gestion du drag and drop pour déplacer les menus
     let draggedElement = null;
     let draggedMenuId = null;
@@ -668,7 +703,10 @@ document.addEventListener('DOMContentLoaded', function() {
                         },
                         body: JSON.stringify({
                             jour: nouveauJour,
-                            moment: nouveauMoment
+                            moment: nouveauMoment,
+                            // Versions affichées: 409 si quelqu'un a modifié ces cases entre-temps
+                            version: parseInt(draggedElement.dataset.menuVersion),
+                            version_cible: this.dataset.menuVersion ? parseInt(this.dataset.menuVersion) : null
                         })
                     });
                     
@@ -677,6 +715,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     if (result.success) {
                         showNotification('Menu déplacé avec succès !', 'success');
                         setTimeout(() => location.reload(), 800);
+                    } else if (response.status === 409) {
+                        showNotification('Le planning a été modifié entre-temps, rechargement...', 'error');
+                        setTimeout(() => location.reload(), 1500);
                     } else {
                         showNotification(result.message || 'Erreur lors du déplacement', 'error');
                     }
@@ -709,9 +750,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const data = {
                 nom: document.getElementById('recette-nom').value,
                 description: document.getElementById('recette-description').value,
-                ingredients: ingredientsList.map(ing => ({
-                    ingredient_id: ing.ingredient_id
-                }))
+                ingredients: ingredientsPayload(ingredientsList)
             };
             
             try {
@@ -728,9 +767,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (response.ok && result.success) {
                     showNotification('Recette créée avec succès !', 'success');
                     
-                    // Recharger la liste des recettes
-                    await loadAllRecettes();
-                    
                     // Sélectionner automatiquement la nouvelle recette
                     menuRecetteSearch.value = result.recette.nom;
                     menuRecetteInput.value = result.recette.id;
@@ -775,9 +811,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const data = {
                 nom: document.getElementById('edit-recette-nom').value,
                 description: document.getElementById('edit-recette-description').value,
-                ingredients: editIngredientsList.map(ing => ({
-                    ingredient_id: ing.ingredient_id
-                }))
+                ingredients: ingredientsPayload(editIngredientsList)
             };
             
             try {
@@ -867,9 +901,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (response.ok && result.success) {
                     showNotification('Ingrédient créé avec succès !', 'success');
                     
-                    // Recharger la liste des ingrédients
-                    await loadAllIngredients();
-                    
                     // Fermer le modal et réinitialiser le formulaire
                     hideModal('ingredient-modal');
                     ingredientForm.reset();
@@ -900,6 +931,55 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Charger une page d'une liste paginée (curseur suivant dans l'en-tête X-Next-Cursor)
+    async function fetchPage(url, cursor) {
+        // limit explicite: sans cursor ni limit, l'API renvoie toute la liste
+        const params = new URLSearchParams({ limit: 50 });
+        if (cursor) params.set('cursor', cursor);
+        const pageUrl = `${url}?${params}`;
+        const response = await fetch(pageUrl);
+        const items = await response.json();
+        return { items: items, next: response.headers.get('X-Next-Cursor') };
+    }
+    
+    // Afficher une page dans un conteneur, avec un bouton pour charger la suivante
+    async function renderPagedList(container, url, renderItem, bindItem, emptyMessage, cursor = null) {
+        const page = await fetchPage(url, cursor);
+        
+        if (!cursor) {
+            container.innerHTML = '';
+            if (page.items.length === 0) {
+                container.innerHTML = `<p style="text-align: center; color: #95a5a6; padding: 2rem;">${emptyMessage}</p>`;
+                return;
+            }
+        }
+        
+        const template = document.createElement('div');
+        template.innerHTML = page.items.map(renderItem).join('');
+        Array.from(template.children).forEach(item => {
+            bindItem(item);
+            container.appendChild(item);
+        });
+        
+        if (page.next) {
+            const moreBtn = document.createElement('button');
+            moreBtn.type = 'button';
+            moreBtn.className = 'btn btn-secondary';
+            moreBtn.style.cssText = 'width: 100%; margin-top: 0.5rem;';
+            moreBtn.textContent = 'Afficher plus';
+            moreBtn.addEventListener('click', async () => {
+                moreBtn.remove();
+                try {
+                    await renderPagedList(container, url, renderItem, bindItem, emptyMessage, page.next);
+                } catch (error) {
+                    console.error('Erreur lors du chargement de la page suivante:', error);
+                    showNotification('Erreur lors du chargement de la liste', 'error');
+                }
+            });
+            container.appendChild(moreBtn);
+        }
+    }
+    
     // Gestion du bouton liste des recettes
     const showRecipesListBtn = document.getElementById('show-recipes-list-btn');
     if (showRecipesListBtn) {
@@ -907,19 +987,12 @@ document.addEventListener('DOMContentLoaded', function() {
             const container = document.getElementById('recipes-list-container');
             
             try {
-                // Charger toutes les recettes
-                const response = await apiRequest('/api/recettes');
-                
-                if (response && response.length > 0) {
-                    // Afficher les recettes sous forme de cartes cliquables
-                    container.innerHTML = response.map(recette => `
+                // Charger la première page de recettes, affichées sous forme de cartes cliquables
+                await renderPagedList(container, '/api/recettes', recette => `
                         <div class="recipe-list-item" data-recette-id="${recette.id}" style="padding: 0.75rem 1rem; margin-bottom: 0.5rem; background: #f8f9fa; border-radius: 5px; border-left: 4px solid #dda15e; cursor: pointer; transition: background 0.2s;">
                             <span style="color: #283618; font-weight: 500;">${recette.nom}</span>
                         </div>
-                    `).join('');
-                    
-                    // Ajouter les gestionnaires de clic
-                    container.querySelectorAll('.recipe-list-item').forEach(item => {
+                    `, item => {
                         item.addEventListener('mouseenter', function() {
                             this.style.background = '#e3f2fd';
                         });
@@ -944,7 +1017,9 @@ document.addEventListener('DOMContentLoaded', function() {
                                     // Charger les ingrédients
                                     editIngredientsList = recette.ingredients.map(ing => ({
                                         ingredient_id: ing.ingredient_id,
-                                        nom: ing.ingredient_nom
+                                        nom: ing.ingredient_nom,
+                                        quantite: ing.quantite,
+                                        unite: ing.unite
                                     }));
                                     renderEditIngredientsList();
                                     
@@ -959,10 +1034,7 @@ document.addEventListener('DOMContentLoaded', function() {
                                 showNotification('Erreur lors du chargement de la recette', 'error');
                             }
                         });
-                    });
-                } else {
-                    container.innerHTML = '<p style="text-align: center; color: #95a5a6; padding: 2rem;">Aucune recette disponible</p>';
-                }
+                    }, 'Aucune recette disponible');
                 
                 showModal('recipes-list-modal');
             } catch (error) {
@@ -979,20 +1051,13 @@ document.addEventListener('DOMContentLoaded', function() {
             const container = document.getElementById('ingredients-list-container');
             
             try {
-                // Charger tous les ingrédients
-                const response = await apiRequest('/api/ingredients');
-                
-                if (response && response.length > 0) {
-                    // Afficher les ingrédients sous forme de cartes cliquables
-                    container.innerHTML = response.map(ingredient => `
+                // Charger la première page d'ingrédients, affichés sous forme de cartes cliquables
+                await renderPagedList(container, '/api/ingredients', ingredient => `
                         <div class="ingredient-list-item" data-ingredient-id="${ingredient.id}" style="padding: 0.75rem 1rem; margin-bottom: 0.5rem; background: #f8f9fa; border-radius: 5px; border-left: 4px solid #606c38; cursor: pointer; transition: background 0.2s;">
                             <span style="color: #283618; font-weight: 500;">${ingredient.nom}</span>
                             <span style="color: #7f8c8d; font-size: 0.9rem; margin-left: 1rem;">(${ingredient.categorie})</span>
                         </div>
-                    `).join('');
-                    
-                    // Ajouter les gestionnaires de clic
-                    container.querySelectorAll('.ingredient-list-item').forEach(item => {
+                    `, item => {
                         item.addEventListener('mouseenter', function() {
                             this.style.background = '#e8edd5';
                         });
@@ -1019,10 +1084,7 @@ document.addEventListener('DOMContentLoaded', function() {
                                 showNotification('Erreur lors du chargement de l\'ingrédient', 'error');
                             }
                         });
-                    });
-                } else {
-                    container.innerHTML = '<p style="text-align: center; color: #95a5a6; padding: 2rem;">Aucun ingrédient disponible</p>';
-                }
+                    }, 'Aucun ingrédient disponible');
                 
                 showModal('ingredients-list-modal');
             } catch (error) {
@@ -1088,7 +1150,7 @@ document.addEventListener('DOMContentLoaded', function() {
                             <ul style="list-style: none; padding: 0; margin: 0;">
                                 ${category.ingredients.map(ing => `
                                     <li style="padding: 0.5rem; display: flex; justify-content: space-between; align-items: center;">
-                                        <span style="color: #283618;">${ing.nom}</span>
+                                        <span style="color: #283618;">${ing.nom} <strong>${ing.quantite} ${ing.unite}</strong></span>
                                         ${ing.count > 1 ? `<span style="background: #dda15e; color: white; padding: 0.25rem 0.5rem; border-radius: 12px; font-size: 0.85rem;">×${ing.count}</span>` : ''}
                                     </li>
                                 `).join('')}
@@ -0,0 +1,42 @@
+"""
+Fixtures des tests: une application sur une base SQLite temporaire,
+migrée comme au démarrage, et son client de test.
+"""
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def creer_app(tmp_path, monkeypatch):
+    """Fabrique d'applications, chacune sur sa propre base (`nom`.db)"""
+    from app import create_app, db
+
+    monkeypatch.setattr(Config, 'BACKUP_DIR', str(tmp_path / 'sauvegardes'))
+    monkeypatch.setattr(Config, 'PDF_TRAVAUX_DIR', str(tmp_path / 'pdf'))
+    monkeypatch.setattr(Config, 'METRICS', False)
+    monkeypatch.setattr(Config, 'INSTRUMENTATION', False)
+    applications = []
+
+    def creer(nom='test'):
+        monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / nom}.db")
+        application = create_app()
+        application.config['TESTING'] = True
+        applications.append(application)
+        return application
+
+    yield creer
+    for application in applications:
+        with application.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(creer_app):
+    return creer_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,70 @@
+"""
+Import et export NDJSON: un export réimporté dans une base vide redonne
+le même catalogue et le même planning.
+"""
+import json
+
+from app import db
+from app.models import Ingredient, Menu, Recette
+from benchmarks.generer import generer
+
+
+def _contenu(app):
+    """Catalogue et planning, indépendamment des identifiants"""
+    with app.app_context():
+        ingredients = {(i.nom, i.categorie, i.unite) for i in db.session.scalars(db.select(Ingredient))}
+        recettes = {}
+        for recette in db.session.scalars(db.select(Recette)):
+            composition = sorted((ri.ingredient.nom, ri.quantite, ri.unite) for ri in recette.recette_ingredients)
+            recettes.setdefault(recette.nom, []).append(
+                (recette.description, recette.temps_preparation, recette.portions,
+                 recette.categories_masque, recette.score_equilibre, composition))
+        menus = {
+            (menu.semaine, menu.jour, menu.moment): (menu.recette.nom if menu.recette else None, menu.description)
+            for menu in db.session.scalars(db.select(Menu))
+        }
+        return ingredients, {nom: sorted(versions) for nom, versions in recettes.items()}, menus
+
+
+def test_export_puis_import_a_l_identique(creer_app):
+    source = creer_app('source')
+    with source.app_context():
+        totaux = generer(nb_recettes=40, nb_ingredients=80, annees=1, graine=3)
+    export = source.test_client().get('/api/export')
+    assert export.status_code == 200
+    assert export.mimetype == 'application/x-ndjson'
+
+    cible = creer_app('cible')
+    reponse = cible.test_client().post('/api/import', data=export.get_data(),
+                                       content_type='application/x-ndjson')
+    assert reponse.status_code == 200
+    rapport = reponse.get_json()
+    assert rapport['nb_erreurs'] == 0, rapport['erreurs']
+    assert rapport['importes'] == {'ingredient': totaux['ingredients'], 'recette': totaux['recettes'],
+                                   'menu': totaux['menus']}
+    assert rapport['menus_fusionnes'] == 0
+    assert _contenu(cible) == _contenu(source)
+
+
+def test_import_signale_lignes_invalides_et_cases_en_double(app, client):
+    lignes = [
+        {'type': 'ingredient', 'nom': 'Riz', 'categorie': 'Céréales & Féculents', 'unite': 'g'},
+        {'type': 'ingredient', 'nom': 'Riz', 'categorie': 'Céréales & Féculents', 'unite': 'g'},
+        {'type': 'recette', 'id': 7, 'nom': 'Riz nature', 'ingredients': [{'nom': 'Riz', 'quantite': 80}]},
+        {'type': 'menu', 'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'recette_id': 7},
+        {'type': 'menu', 'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'description': 'Restes'},
+        {'type': 'menu', 'semaine': '2024-01-01', 'jour': 'samedi', 'moment': 'midi', 'recette_id': 7},
+        {'type': 'inconnu'},
+    ]
+    corps = '\n'.join(json.dumps(ligne) for ligne in lignes) + '\n{pas du json\n'
+    rapport = client.post('/api/import', data=corps.encode()).get_json()
+
+    assert rapport['importes'] == {'ingredient': 1, 'recette': 1, 'menu': 1}
+    assert rapport['existants'] == 1
+    assert rapport['menus_fusionnes'] == 1
+    assert [erreur['ligne'] for erreur in rapport['erreurs']] == [6, 7, 8]
+    assert rapport['nb_erreurs'] == 3
+    # La dernière ligne d'une case l'emporte
+    with app.app_context():
+        menu = db.session.scalars(db.select(Menu)).one()
+        assert (menu.recette_id, menu.description) == (None, 'Restes')
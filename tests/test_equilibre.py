@@ -0,0 +1,59 @@
+"""
+L'analyse par masque (app.equilibre) donne le même résultat que
+Menu.analyser_equilibre, y compris pour une base aux catégories héritées.
+"""
+from datetime import date
+
+from sqlalchemy import text
+
+from app import db, equilibre, migrations
+from app.models import Ingredient, Menu, Recette
+from benchmarks.generer import generer
+
+
+def _comparer(menus):
+    nouvelles = equilibre.analyser_menus([menu.id for menu in menus])
+    assert set(nouvelles) == {menu.id for menu in menus}
+    for menu in menus:
+        ancienne = menu.analyser_equilibre()
+        nouvelle = nouvelles[menu.id]
+        # L'ordre des catégories n'est pas défini dans l'ancienne analyse
+        assert sorted(nouvelle.pop('categories')) == sorted(ancienne.pop('categories'))
+        assert nouvelle == ancienne
+
+
+def test_analyses_identiques_sur_base_generee(app):
+    with app.app_context():
+        generer(nb_recettes=60, nb_ingredients=120, annees=1, graine=7)
+        _comparer(db.session.scalars(db.select(Menu)).all())
+
+
+def test_categories_heritees_normalisees_par_migration(app):
+    with app.app_context():
+        for nom, categorie in [('Poireau', 'légumes '), ('Riz', 'CEREALES & FECULENTS'),
+                               ('Poulet', 'Viandes'), ('Cèpe', 'Champignons')]:
+            db.session.add(Ingredient(nom=nom, categorie=categorie, unite='g'))
+        db.session.flush()
+        recette = Recette(nom='Poulet au riz')
+        db.session.add(recette)
+        db.session.flush()
+        recette.appliquer_ingredients([
+            {'ingredient_id': ingredient.id, 'quantite': 100, 'unite': 'g'}
+            for ingredient in db.session.scalars(db.select(Ingredient))
+        ])
+        lundi = date(2024, 1, 1)
+        db.session.add(Menu(semaine=lundi, jour='lundi', moment='midi', recette_id=recette.id))
+        db.session.add(Menu(semaine=lundi, jour='lundi', moment='soir', description='Restes'))
+        # Base d'avant la migration 7
+        db.session.execute(text('DELETE FROM schema_version WHERE version = 7'))
+        db.session.commit()
+
+        assert (7, migrations.MIGRATIONS[6][1]) in migrations.migrer()
+
+        categories = dict(db.session.execute(db.select(Ingredient.nom, Ingredient.categorie)).all())
+        assert categories == {'Poireau': 'Légumes', 'Riz': 'Céréales & Féculents',
+                              'Poulet': 'Viandes', 'Cèpe': 'Autre'}
+        db.session.expire_all()
+        menus = db.session.scalars(db.select(Menu)).all()
+        _comparer(menus)
+        assert equilibre.analyser_semaine(lundi)[menus[0].id]['niveau'] == 'equilibre'
@@ -0,0 +1,61 @@
+"""
+Migrations: une base aux menus en double n'est migrée qu'après
+dédoublonnage explicite (`flask migrer --dedoublonner`).
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app import db, migrations
+
+
+@pytest.fixture
+def base_en_double(app):
+    """Base d'avant la migration 3, avec deux menus dans une même case"""
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_menu_case'))
+        db.session.execute(text('DELETE FROM schema_version WHERE version = 3'))
+        db.session.execute(text('PRAGMA user_version = 0'))
+        for description in ('Premier', 'Doublon', 'Autre case'):
+            moment = 'soir' if description == 'Autre case' else 'midi'
+            db.session.execute(
+                text("INSERT INTO menu (semaine, jour, moment, description, version) "
+                     "VALUES (:semaine, 'lundi', :moment, :description, 1)"),
+                {'semaine': date(2024, 1, 1), 'moment': moment, 'description': description}
+            )
+        db.session.commit()
+    return app
+
+
+def _descriptions(app):
+    with app.app_context():
+        return db.session.scalars(text('SELECT description FROM menu ORDER BY id')).all()
+
+
+def test_migrer_refuse_les_menus_en_double(base_en_double):
+    resultat = base_en_double.test_cli_runner().invoke(args=['migrer'])
+    assert resultat.exit_code != 0
+    assert '1 menu(s) en double' in resultat.output
+    assert 'flask migrer --dedoublonner' in resultat.output
+    assert _descriptions(base_en_double) == ['Premier', 'Doublon', 'Autre case']
+    with base_en_double.app_context():
+        assert not migrations.schema_a_jour()
+
+
+def test_demarrage_refuse_sur_migration_en_echec(base_en_double, creer_app):
+    with pytest.raises(RuntimeError, match='menu\\(s\\) en double'):
+        creer_app()
+
+
+def test_migrer_dedoublonner_sauvegarde_puis_migre(base_en_double, tmp_path):
+    resultat = base_en_double.test_cli_runner().invoke(args=['migrer', '--dedoublonner'])
+    assert resultat.exit_code == 0, resultat.output
+    assert 'Migration 3' in resultat.output
+    # Le plus ancien menu de la case est gardé
+    assert _descriptions(base_en_double) == ['Premier', 'Autre case']
+    assert list((tmp_path / 'sauvegardes').iterdir())
+    with base_en_double.app_context():
+        assert migrations.schema_a_jour()
+        index = {ligne[1] for ligne in db.session.execute(text('PRAGMA index_list(menu)'))}
+        assert 'ix_menu_case' in index
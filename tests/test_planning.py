@@ -0,0 +1,148 @@
+"""
+API du planning: lots de menus, planification automatique et déplacement
+avec verrouillage optimiste.
+"""
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Menu, Recette
+
+LUNDI = date(2024, 1, 1)
+
+
+@pytest.fixture
+def recettes(app):
+    with app.app_context():
+        # Score d'équilibre non nul: la planification ne propose pas les autres
+        lignes = [Recette(nom=f'Recette {index}', temps_preparation=20, score_equilibre=1)
+                  for index in range(3)]
+        db.session.add_all(lignes)
+        db.session.commit()
+        return [recette.id for recette in lignes]
+
+
+def _menus(app):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count(Menu.id)))
+
+
+def test_lot_remplit_et_vide_des_cases(app, client, recettes):
+    reponse = client.post('/api/menus/batch', json={'menus': [
+        {'semaine': '2024-01-03', 'jour': 'lundi', 'moment': 'midi', 'recette_id': recettes[0]},
+        {'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'soir', 'description': '  Restes  '},
+        {'semaine': '2024-01-01', 'jour': 'mardi', 'moment': 'midi'},
+    ]})
+    assert reponse.status_code == 200
+    assert reponse.get_json() == {'success': True, 'remplis': 2, 'vides': 1}
+    with app.app_context():
+        soir = db.session.scalars(db.select(Menu).filter_by(moment='soir')).one()
+        assert soir.semaine == LUNDI and soir.description == 'Restes'
+
+
+@pytest.mark.parametrize('corps', [
+    [{'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi'}],
+    {'menus': {'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi'}},
+    {'menus': []},
+    {'menus': ['lundi']},
+    {'menus': [{'semaine': 20240101, 'jour': 'lundi', 'moment': 'midi', 'description': 'x'}]},
+    {'menus': [{'semaine': '2024-01-01', 'jour': ['lundi'], 'moment': 'midi', 'description': 'x'}]},
+    {'menus': [{'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'recette_id': '1'}]},
+    {'menus': [{'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'recette_id': True}]},
+    {'menus': [{'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'description': {'x': 1}}]},
+    {'menus': [{'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'recette_id': 999}]},
+])
+def test_lot_invalide_refuse_sans_ecriture(app, client, recettes, corps):
+    reponse = client.post('/api/menus/batch', json=corps)
+    assert reponse.status_code == 400
+    assert reponse.get_json()['success'] is False
+    assert _menus(app) == 0
+
+
+def test_lot_invalide_annule_les_operations_valides(app, client, recettes):
+    reponse = client.post('/api/menus/batch', json={'menus': [
+        {'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi', 'recette_id': recettes[0]},
+        {'semaine': '2024-01-01', 'jour': 'mardi', 'moment': 'midi', 'description': 42},
+    ]})
+    assert reponse.status_code == 400
+    assert reponse.get_json()['message'] == 'Opération 1: description invalide'
+    assert _menus(app) == 0
+
+
+def test_planification_automatique(app, client, recettes):
+    corps = {'semaine': '2024-01-03', 'graine': 'semaine-1', 'semaines_sans_repetition': 0}
+    apercu = client.post('/api/week/autoplan', json={**corps, 'appliquer': False})
+    assert apercu.status_code == 200
+    assert _menus(app) == 0
+    # Même graine, même proposition
+    reponse = client.post('/api/week/autoplan', json=corps)
+    assert reponse.status_code == 200
+    assert reponse.get_json()['propositions'] == apercu.get_json()['propositions']
+    assert _menus(app) == len(reponse.get_json()['propositions']) > 0
+
+
+@pytest.mark.parametrize('corps', [
+    ['2024-01-01'],
+    {'semaine': 20240101},
+    {'semaine': '01/01/2024'},
+    {'semaine': '2024-01-01', 'graine': [1]},
+    {'semaine': '2024-01-01', 'graine': 1.5},
+    {'semaine': '2024-01-01', 'graine': True},
+    {'semaine': '2024-01-01', 'semaines_sans_repetition': '2'},
+    {'semaine': '2024-01-01', 'semaines_sans_repetition': False},
+    {'semaine': '2024-01-01', 'temps_max': '30'},
+    {'semaine': '2024-01-01', 'temps_max': {'dimanche-midi': 30}},
+    {'semaine': '2024-01-01', 'temps_max': {'soir': -5}},
+])
+def test_planification_invalide_refusee(app, client, recettes, corps):
+    reponse = client.post('/api/week/autoplan', json=corps)
+    assert reponse.status_code == 400
+    assert reponse.get_json()['success'] is False
+    assert _menus(app) == 0
+
+
+@pytest.fixture
+def menus(app, recettes):
+    with app.app_context():
+        lignes = [Menu(semaine=LUNDI, jour='lundi', moment='midi', recette_id=recettes[0]),
+                  Menu(semaine=LUNDI, jour='mardi', moment='midi', recette_id=recettes[1])]
+        db.session.add_all(lignes)
+        db.session.commit()
+        return [(menu.id, menu.version) for menu in lignes]
+
+
+def test_deplacement_echange_les_cases(app, client, menus, recettes):
+    (lundi_id, version), (_, version_cible) = menus
+    reponse = client.put(f'/api/menu/{lundi_id}/move', json={
+        'jour': 'mardi', 'moment': 'midi', 'version': version, 'version_cible': version_cible})
+    assert reponse.status_code == 200
+    with app.app_context():
+        cases = {(menu.jour, menu.recette_id) for menu in db.session.scalars(db.select(Menu))}
+    assert cases == {('lundi', recettes[1]), ('mardi', recettes[0])}
+
+
+def test_deplacement_version_perimee_conflit(app, client, menus, recettes):
+    (lundi_id, version), _ = menus
+    # Écriture concurrente sur le menu déplacé
+    assert client.post('/api/menu', json={'semaine': '2024-01-01', 'jour': 'lundi', 'moment': 'midi',
+                                          'recette_id': recettes[2]}).status_code == 200
+
+    reponse = client.put(f'/api/menu/{lundi_id}/move', json={'jour': 'jeudi', 'moment': 'soir',
+                                                             'version': version})
+    assert reponse.status_code == 409
+    corps = reponse.get_json()
+    assert corps['conflit'] is True and corps['success'] is False
+    assert corps['cases']
+    with app.app_context():
+        menu = db.session.get(Menu, lundi_id)
+        assert (menu.jour, menu.moment, menu.recette_id) == ('lundi', 'midi', recettes[2])
+
+
+def test_deplacement_case_cible_occupee_entre_temps(app, client, menus):
+    (lundi_id, version), _ = menus
+    # Le client croyait la case du mardi vide
+    reponse = client.put(f'/api/menu/{lundi_id}/move', json={
+        'jour': 'mardi', 'moment': 'midi', 'version': version, 'version_cible': None})
+    assert reponse.status_code == 409
+    assert reponse.get_json()['conflit'] is True